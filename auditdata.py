@@ -1,10 +1,308 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-import xml.etree.cElementTree as ET
+from array import array
 from collections import defaultdict
+import os
 import pprint
 
+from osmstream import iter_tags
+from streetnames import (
+    DIRECTION_ABBRVS, DIRECTION_SUFFIX, EXPECTED_STREET_TYPES, SUITE_WORDS, 
+    street_directions, unexpected_street_type
+)
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    np = None
+    pd = None
+
+try:
+    import parquetdata
+except ImportError:
+    parquetdata = None
+
+
+STATE_KEYS = ["addr:state", "gnis:ST_alpha", "is_in:state_code"]
+
+COUNTRY_KEYS = ["is_in:country", "addr:country"]
+
+POSTAL_CODE_KEYS = [
+    "addr:postcode", "postal_code", "tiger:zip", 
+    "tiger:zip_left", "tiger:zip_left_1", 
+    "tiger:zip_left_2", "tiger:zip_left_3", 
+    "tiger:zip_left_4", "tiger:zip_left_5", 
+    "tiger:zip_right", "tiger:zip_right_1", 
+    "tiger:zip_right_2", "tiger:zip_right_3"
+]
+
+
+def audit_street_type(street_types, street_name):
+    """
+    Adds street_name to street_types under its street type 
+    if the street type is not expected.
+    """
+    street_type = unexpected_street_type(street_name)
+    if street_type is not None:
+        street_types[street_type].add(street_name)
+
+
+def audit_direction(direction_types, street_name):
+    """
+    Adds street_name to direction_types under its direction 
+    abbreviation if its prefix or suffix is abbreviated.
+    """
+    for direction in street_directions(street_name):
+        if direction is not None:
+            direction_types[direction].add(street_name)
+
+
+def count_value(counts, value):
+    """
+    Increments the count of value in the counts dict.
+    """
+    if value in counts.keys():
+        counts[value] += 1
+    else:
+        counts[value] = 1
+
+
+def add_value(values, value):
+    """
+    Adds value to the values set.
+    """
+    values.add(value)
+
+
+# Each registered auditor maps a name to the tag keys it audits, 
+# a function returning its empty result, and a function that 
+# audits a single tag value into that result. run_audits uses 
+# this registry to audit any number of them in one pass.
+
+AUDITORS = {
+    "streets": (["addr:street"], lambda: defaultdict(set), audit_street_type), 
+    "street_directions": (["addr:street"], lambda: defaultdict(set), audit_direction), 
+    "cities": (["addr:city"], dict, count_value), 
+    "states": (STATE_KEYS, dict, count_value), 
+    "county_names": (["gnis:county_name", "gnis:County"], set, add_value), 
+    "county_numbers": (["gnis:county_id", "gnis:County_num"], set, add_value), 
+    "countries": (COUNTRY_KEYS, dict, count_value), 
+    "postal_codes": (POSTAL_CODE_KEYS, dict, count_value), 
+    "max_speeds": (["maxspeed", "maxspeed:advisory"], set, add_value), 
+    "denominations": (["denomination"], set, add_value), 
+    "religions": (["religion"], set, add_value)
+}
+
+
+def run_audits(osm_file, auditors=None, parser="expat"):
+    """
+    Iterates through the osm_file once and passes each tag 
+    to only the registered auditors that audit its key.
+    
+    Input:    file name of the data file (string)
+              optional list of auditor names from AUDITORS 
+                  (all registered auditors by default)
+              optional parser for iter_tags
+    Returns:  a dict of auditor names with their results
+    
+    Running every audit this way costs a single parse of 
+    the data file rather than one parse per audit. The tags 
+    are streamed, so memory use stays bounded no matter 
+    the size of the data file.
+    """
+    if auditors is None:
+        auditors = AUDITORS.keys()
+    
+    results = {}
+    dispatch = defaultdict(list)
+    
+    for name in auditors:
+        keys, new_result, audit_value = AUDITORS[name]
+        results[name] = new_result()
+        for key in keys:
+            dispatch[key].append((audit_value, results[name]))
+    
+    for element_type, element_id, k, v in iter_tags(osm_file, parser):
+        for audit_value, result in dispatch.get(k, ()):
+            audit_value(result, v)
+    
+    return results
+
+
+def load_tag_table(source, parser="expat"):
+    """
+    Loads the key and value of every tag into a columnar 
+    tag table for run_table_audits.
+    
+    Input:    file name of the data file, or the output 
+                  directory of parquetdata.export_parquet (string)
+              optional parser for iter_tags
+    Returns:  a pandas DataFrame with categorical k and v 
+                  columns, one row per tag
+    
+    Parquet exports are memory mapped and only their k and v 
+    columns are read. Data files are streamed once, with each 
+    distinct key and value kept a single time.
+    """
+    if pd is None:
+        raise ImportError("pandas is needed to load a tag table")
+    
+    if os.path.isdir(source):
+        if parquetdata is None:
+            raise ImportError("pyarrow is needed to load a tag table from a Parquet export")
+        return parquetdata.load_table(source, "tags", columns=["k", "v"]).to_pandas()
+    
+    keys = {}
+    values = {}
+    key_codes = array('i')
+    value_codes = array('i')
+    
+    for element_type, element_id, k, v in iter_tags(source, parser):
+        key_codes.append(keys.setdefault(k, len(keys)))
+        value_codes.append(values.setdefault(v, len(values)))
+    
+    return pd.DataFrame({
+        "k": pd.Categorical.from_codes(np.frombuffer(key_codes, dtype=np.int32), categories=list(keys)), 
+        "v": pd.Categorical.from_codes(np.frombuffer(value_codes, dtype=np.int32), categories=list(values))
+    })
+
+
+def table_value_codes(tags, keys):
+    """
+    Returns the value codes of the tags in the tag table 
+    whose key is one of keys.
+    """
+    key_codes = tags.k.cat.categories.get_indexer(keys)
+    rows = np.isin(tags.k.cat.codes.to_numpy(), key_codes[key_codes >= 0])
+    return tags.v.cat.codes.to_numpy()[rows]
+
+
+def count_table_values(tags, keys):
+    """
+    Returns a dict of each value of the keys in the tag 
+    table with its count, like count_value.
+    """
+    categories = tags.v.cat.categories
+    counts = np.bincount(table_value_codes(tags, keys), minlength=len(categories))
+    present = np.flatnonzero(counts)
+    return dict(zip(categories[present].tolist(), counts[present].tolist()))
+
+
+def distinct_table_values(tags, keys):
+    """
+    Returns the set of values of the keys in the tag table, 
+    like add_value.
+    """
+    codes = np.unique(table_value_codes(tags, keys))
+    return set(tags.v.cat.categories[codes].tolist())
+
+
+def street_words(tags, keys):
+    """
+    Splits the distinct street names of the keys in the tag 
+    table into the words the street audits look at.
+    
+    Returns:  a DataFrame of the names with their first, 
+                  second to last (missing for one word names), 
+                  and last words
+    """
+    codes = np.unique(table_value_codes(tags, keys))
+    names = pd.Series(tags.v.cat.categories[codes].tolist(), dtype=object)
+    
+    # same words as splitting the names on single spaces
+    return pd.DataFrame({
+        "name": names, 
+        "first": names.str.extract(r'^([^ ]*)', expand=False), 
+        "second_to_last": names.str.extract(r'(?:^|.* )([^ ]*) [^ ]*$', expand=False), 
+        "last": names.str.extract(r'([^ ]*)$', expand=False)
+    })
+
+
+def group_names(groups, names):
+    """
+    Returns a defaultdict(set) of names grouped by groups 
+    (two aligned Series).
+    """
+    result = defaultdict(set)
+    result.update(names.groupby(groups.to_numpy()).agg(set).to_dict())
+    return result
+
+
+def table_street_types(tags, keys):
+    """
+    Returns the street names of the keys in the tag table 
+    whose street types are not expected, like 
+    audit_street_type.
+    """
+    words = street_words(tags, keys)
+    before_direction = words["last"].isin(list(DIRECTION_SUFFIX)) & words["second_to_last"].notna()
+    street_types = words["second_to_last"].where(before_direction, words["last"])
+    unexpected = ~street_types.isin(list(EXPECTED_STREET_TYPES))
+    return group_names(street_types[unexpected], words["name"][unexpected])
+
+
+def table_street_directions(tags, keys):
+    """
+    Returns the street names of the keys in the tag table 
+    with an abbreviated direction prefix or suffix, like 
+    audit_direction.
+    """
+    words = street_words(tags, keys)
+    abbreviations = list(DIRECTION_ABBRVS)
+    prefixed = words["first"].isin(abbreviations)
+    suffixed = (
+        words["last"].isin(abbreviations) & words["second_to_last"].notna() &
+        ~words["second_to_last"].isin(list(SUITE_WORDS))
+    )
+    directions = pd.concat([words["first"][prefixed], words["last"][suffixed]], ignore_index=True)
+    names = pd.concat([words["name"][prefixed], words["name"][suffixed]], ignore_index=True)
+    return group_names(directions, names)
+
+
+# The vectorized version of each audit function in AUDITORS, 
+# which audits all the values of the auditor's keys at once
+
+TABLE_AUDITS = {
+    count_value: count_table_values, 
+    add_value: distinct_table_values, 
+    audit_street_type: table_street_types, 
+    audit_direction: table_street_directions
+}
+
+
+def run_table_audits(tags, auditors=None):
+    """
+    Runs the registered auditors over a tag table with 
+    vectorized operations on its categorical codes.
+    
+    Input:    tag table from load_tag_table (DataFrame)
+              optional list of auditor names from AUDITORS 
+                  (all registered auditors by default)
+    Returns:  a dict of auditor names with their results, 
+                  equal to the results of run_audits
+    
+    Counts and distinct sets work on the integer codes of the 
+    values, and the street audits split each distinct street 
+    name once. Auditors without a vectorized version in 
+    TABLE_AUDITS audit the values of their keys one by one.
+    """
+    if auditors is None:
+        auditors = AUDITORS.keys()
+    
+    results = {}
+    for name in auditors:
+        keys, new_result, audit_value = AUDITORS[name]
+        if audit_value in TABLE_AUDITS:
+            results[name] = TABLE_AUDITS[audit_value](tags, keys)
+        else:
+            results[name] = new_result()
+            for value in tags.v.cat.categories[table_value_codes(tags, keys)]:
+                audit_value(results[name], value)
+    
+    return results
+
 
 def show_all_tags(osm_file):
     """
@@ -22,9 +320,8 @@ def show_all_tags(osm_file):
     """
     tag_types = defaultdict(set)
     
-    for event, element in ET.iterparse(osm_file, events=('start',)):
-        for tag in element.iter("tag"):
-            tag_types[tag.attrib['k']].add(tag.attrib['v'])
+    for element_type, element_id, k, v in iter_tags(osm_file):
+        tag_types[k].add(v)
             
     pprint.pprint(dict(tag_types))
 
@@ -44,72 +341,7 @@ def audit_streets(osm_file):
     in order to replace the unexpected ones during 
     the data cleaning process.
     """
-    street_types = defaultdict(set)
-    
-    # Valid street suffixes and abbreviation mappings sourced from:
-    # USPS - C1 Street Suffix Abbreviations
-    # https://pe.usps.com/text/pub28/28apc_002.htm
-    
-    USPS_expected = [
-        "Alley", "Anex", "Arcade", "Avenue", "Bayou", "Beach", "Bend", "Bluff", "Bluffs", "Bottom", "Boulevard", "Branch", 
-        "Bridge", "Brook", "Brooks", "Burg", "Burgs", "Bypass", "Camp", "Canyon", "Cape", "Causeway", "Center", "Centers", 
-        "Circle", "Cliff", "Cliffs", "Club", "Common", "Commons", "Corner", "Corners", "Course", "Court", "Courts", 
-        "Cove", "Coves", "Creek", "Crescent", "Crest", "Crossing", "Crossroad", "Crossroads", "Curve", "Dale", "Dam", 
-        "Divide", "Drive", "Drives", "Estate", "Estates", "Expressway", "Extension", "Extensions", "Falls", "Ferry", 
-        "Field", "Fields", "Flat", "Flats", "Ford", "Fords", "Forest", "Forge", "Forges", "Fork", "Forks", "Fort", 
-        "Freeway", "Garden", "Gateway", "Glen", "Glens", "Green", "Greens", "Grove", "Groves", "Harbor", "Harbors", "Haven", 
-        "Heights", "Highway", "Hill", "Hills", "Hollow", "Inlet", "Island", "Islands", "Isle", "Junction", "Junctions", 
-        "Key", "Keys", "Knoll", "Knolls", "Lake", "Lakes", "Landing", "Lane", "Light", "Lights", "Loaf", "Lock", "Locks", 
-        "Lodge", "Loop", "Manor", "Manors", "Meadows", "Mill", "Mills", "Mission", "Motorway", "Mount", "Mountain", 
-        "Mountains", "Neck", "Orchard", "Oval", "Overpass", "Park", "Parks", "Parkway", "Parkways", "Passage", "Path", 
-        "Pike", "Pine", "Pines", "Place", "Plain", "Plains", "Plaza", "Point", "Points", "Port", "Ports", "Prairie", 
-        "Radial", "Ranch", "Rapid", "Rapids", "Rest", "Ridge", "Ridges", "River", "Road", "Roads", "Route", "Shoal", "Shoals", 
-        "Shore", "Shores", "Skyway", "Spring", "Square", "Squares", "Station", "Stravenue", "Stream", "Street", "Streets", 
-        "Summit", "Terrace", "Throughway", "Trace", "Track", "Trafficway", "Trail", "Trailer", "Tunnel", "Turnpike", 
-        "Underpass", "Union", "Unions", "Valley", "Valleys", "Viaduct", "View", "Views", "Village", "Villages", "Ville", 
-        "Vista", "Way", "Well", "Wells"
-    ]
-    
-    # These additional expected street suffixes are assumed 
-    # to be acceptable for data cleaning purposes
-    
-    addl_expected = [
-        "Arsenal", "Cary", "Chase", "Cloisters", "Close", "Conn", "Concourse", 
-        "Driveway", "Farm", "Greene", "James", "Level", "Mews", "Needle", 
-        "Oaks", "Overlook", "Pass", "Pathway", "Ramon", "Row", "Run", 
-        "Sage", "Slip", "Trek", "Turn", "Walk", "Waye"
-    ]
-    
-    # The direction suffix allows the audit to look at the 
-    # second to the last string in the addr:street value 
-    # for any unexpected street types
-    
-    direction_suffix = [
-        "N", "N.", "N*", "North", 
-        "S", "S.", "S*", "South", 
-        "E", "E.", "E*", "East", 
-        "W", "W.", "W*", "West"
-    ]
-    
-    def audit_street_type(street_types, street_name):
-        words = street_name.split(" ")
-        if words[-1] in direction_suffix:
-            if words[-2] not in [*USPS_expected, *addl_expected]:
-                street_types[words[-2]].add(street_name)
-        else:
-            if words[-1] not in [*USPS_expected, *addl_expected]:
-                street_types[words[-1]].add(street_name)
-                
-    def is_street_name(elem):
-        return (elem.attrib['k'] == "addr:street")
-    
-    for event, elem in ET.iterparse(osm_file, events=("start",)):
-        if elem.tag in ("node", "way", "relation"):
-            for tag in elem.iter("tag"):
-                if is_street_name(tag):
-                    audit_street_type(street_types, tag.attrib['v'])
-    
-    return street_types
+    return run_audits(osm_file, ["streets"])["streets"]
 
 
 def audit_street_direction(osm_file):
@@ -128,34 +360,7 @@ def audit_street_direction(osm_file):
     to replace the abbreviations during the data cleaning 
     process.
     """
-    direction_types = defaultdict(set)
-    
-    direction_abbrvs = [
-        "N", "N.", "N*", 
-        "S", "S.", "S*", 
-        "E", "E.", "E*", 
-        "W", "W.", "W*"
-    ]
-    
-    def audit_direction(direction_types, street_name):
-        words = street_name.split(" ")
-        if words[0] in direction_abbrvs:
-            direction_types[words[0]].add(street_name)
-        if words[-1] in direction_abbrvs and words[-2] not in ["Suite", "Ste", "Ste."]:
-            # skips those where the second to the last word 
-            # is an iteration of 'Suite', ex. 'Suite E'
-            direction_types[words[-1]].add(street_name)
-                
-    def is_street_name(elem):
-        return (elem.attrib['k'] == "addr:street")
-    
-    for event, elem in ET.iterparse(osm_file, events=("start",)):
-        if elem.tag in ("node", "way", "relation"):
-            for tag in elem.iter("tag"):
-                if is_street_name(tag):
-                    audit_direction(direction_types, tag.attrib['v'])
-    
-    return direction_types
+    return run_audits(osm_file, ["street_directions"])["street_directions"]
 
 
 def audit_cities(osm_file):
@@ -171,24 +376,7 @@ def audit_cities(osm_file):
     whether the lowest counts should be excluded from 
     the dataset.
     """
-    cities = {}
-    
-    def audit_city(cities, city):
-        if city in cities.keys():
-            cities[city] += 1
-        else:
-            cities[city] = 1
-    
-    def is_city(elem):
-        return (elem.attrib['k'] == "addr:city")
-    
-    for event, elem in ET.iterparse(osm_file, events=("start",)):
-        if elem.tag in ("node", "way", "relation"):
-            for tag in elem.iter("tag"):
-                if is_city(tag):
-                    audit_city(cities, tag.attrib['v'])
-    
-    return cities
+    return run_audits(osm_file, ["cities"])["cities"]
 
 
 def audit_states(osm_file):
@@ -207,24 +395,7 @@ def audit_states(osm_file):
        valid state values consistent, for example 
        'Virginia' vs 'VA'
     """
-    states = {}
-    
-    def audit_state(states, state):
-        if state in states.keys():
-            states[state] += 1
-        else:
-            states[state] = 1
-    
-    def is_state(elem):
-        return (elem.attrib['k'] in ["addr:state", "gnis:ST_alpha", "is_in:state_code"])
-    
-    for event, elem in ET.iterparse(osm_file, events=("start",)):
-        if elem.tag in ("node", "way", "relation"):
-            for tag in elem.iter("tag"):
-                if is_state(tag):
-                    audit_state(states, tag.attrib['v'])
-    
-    return states
+    return run_audits(osm_file, ["states"])["states"]
 
 
 def audit_county_names(osm_file):
@@ -239,18 +410,7 @@ def audit_county_names(osm_file):
     The user can hone in on the county names and research 
     whether any should be excluded from the dataset.
     """
-    counties = set()
-    
-    def is_county_name(elem):
-        return (elem.attrib['k'] in ["gnis:county_name", "gnis:County"])
-    
-    for event, elem in ET.iterparse(osm_file, events=("start",)):
-        if elem.tag in ("node", "way", "relation"):
-            for tag in elem.iter("tag"):
-                if is_county_name(tag):
-                    counties.add(tag.attrib['v'])
-    
-    return counties
+    return run_audits(osm_file, ["county_names"])["county_names"]
 
 
 def audit_county_numbers(osm_file):
@@ -265,18 +425,7 @@ def audit_county_numbers(osm_file):
     The user can hone in on the county numbers and research 
     whether any should be excluded from the dataset.
     """
-    counties = set()
-    
-    def is_county_num(elem):
-        return (elem.attrib['k'] in ["gnis:county_id", "gnis:County_num"])
-    
-    for event, elem in ET.iterparse(osm_file, events=("start",)):
-        if elem.tag in ("node", "way", "relation"):
-            for tag in elem.iter("tag"):
-                if is_county_num(tag):
-                    counties.add(tag.attrib['v'])
-    
-    return counties
+    return run_audits(osm_file, ["county_numbers"])["county_numbers"]
 
 
 def audit_countries(osm_file):
@@ -295,24 +444,7 @@ def audit_countries(osm_file):
        valid country values consistent, for example 
        'United States' vs 'US'
     """
-    countries = {}
-    
-    def audit_country(countries, country):
-        if country in countries.keys():
-            countries[country] += 1
-        else:
-            countries[country] = 1
-    
-    def is_country(elem):
-        return (elem.attrib['k'] in ["is_in:country", "addr:country"])
-    
-    for event, elem in ET.iterparse(osm_file, events=("start",)):
-        if elem.tag in ("node", "way", "relation"):
-            for tag in elem.iter("tag"):
-                if is_country(tag):
-                    audit_country(countries, tag.attrib['v'])
-    
-    return countries
+    return run_audits(osm_file, ["countries"])["countries"]
 
 
 def audit_postal_codes(osm_file):
@@ -331,32 +463,7 @@ def audit_postal_codes(osm_file):
        valid postal code values consistent, for example 
        some values may consist of multiples like '23111;23112'
     """
-    postal_codes = {}
-    
-    def audit_postal_code(postal_codes, postal_code):
-        if postal_code in postal_codes.keys():
-            postal_codes[postal_code] += 1
-        else:
-            postal_codes[postal_code] = 1
-    
-    def is_postal_code(elem):
-        postal_code_keys = [
-            "addr:postcode", "postal_code", "tiger:zip", 
-            "tiger:zip_left", "tiger:zip_left_1", 
-            "tiger:zip_left_2", "tiger:zip_left_3", 
-            "tiger:zip_left_4", "tiger:zip_left_5", 
-            "tiger:zip_right", "tiger:zip_right_1", 
-            "tiger:zip_right_2", "tiger:zip_right_3"
-        ]
-        return (elem.attrib['k'] in postal_code_keys)
-    
-    for event, elem in ET.iterparse(osm_file, events=("start",)):
-        if elem.tag in ("node", "way", "relation"):
-            for tag in elem.iter("tag"):
-                if is_postal_code(tag):
-                    audit_postal_code(postal_codes, tag.attrib['v'])
-    
-    return postal_codes
+    return run_audits(osm_file, ["postal_codes"])["postal_codes"]
 
 
 def audit_max_speeds(osm_file):
@@ -371,18 +478,7 @@ def audit_max_speeds(osm_file):
     Lists out all values of max speed within the dataset 
     for the purposes of consistency ('20 mph' vs '20').
     """
-    max_speeds = set()
-    
-    def is_max_speed(elem):
-        return (elem.attrib['k'] in ["maxspeed", "maxspeed:advisory"])
-    
-    for event, elem in ET.iterparse(osm_file, events=("start",)):
-        if elem.tag in ("node", "way", "relation"):
-            for tag in elem.iter("tag"):
-                if is_max_speed(tag):
-                    max_speeds.add(tag.attrib['v'])
-    
-    return max_speeds
+    return run_audits(osm_file, ["max_speeds"])["max_speeds"]
 
 
 def audit_denominations(osm_file):
@@ -398,18 +494,7 @@ def audit_denominations(osm_file):
     dataset for the purposes of consistency 
     ('none' vs 'nondenominational').
     """
-    denominations = set()
-    
-    def is_denomination(elem):
-        return (elem.attrib['k'] == "denomination")
-    
-    for event, elem in ET.iterparse(osm_file, events=("start",)):
-        if elem.tag in ("node", "way", "relation"):
-            for tag in elem.iter("tag"):
-                if is_denomination(tag):
-                    denominations.add(tag.attrib['v'])
-    
-    return denominations
+    return run_audits(osm_file, ["denominations"])["denominations"]
 
 
 def audit_religions(osm_file):
@@ -423,16 +508,4 @@ def audit_religions(osm_file):
     Lists out all values of religions within the dataset 
     for the purposes of consistency ('Christian' vs 'christian').
     """
-    religions = set()
-    
-    def is_religion(elem):
-        return (elem.attrib['k'] == "religion")
-    
-    for event, elem in ET.iterparse(osm_file, events=("start",)):
-        if elem.tag in ("node", "way", "relation"):
-            for tag in elem.iter("tag"):
-                if is_religion(tag):
-                    religions.add(tag.attrib['v'])
-    
-    return religions
-
+    return run_audits(osm_file, ["religions"])["religions"]
@@ -1,7 +1,22 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-import xml.etree.cElementTree as ET
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+
+from osmpbf import get_pbf_element, is_pbf_file
+from osmstream import get_element, get_element_range, split_element_ranges, tostring
+from streetnames import update_direction, update_street_type
+
+try:
+    import numpy as np
+    import osmindex
+except ImportError:
+    np = osmindex = None
 
 
 def update_street(element):
@@ -13,269 +28,11 @@ def update_street(element):
     Returns:  cElementTree element (updated)
     
     This function makes the street types consistent:
-        St. -> Street
-        Rd -> Road
+        St. -> Street 
+        Rd -> Road 
         ...
     """
     
-    # Valid street suffixes and abbreviation mappings sourced from:
-    # USPS - C1 Street Suffix Abbreviations
-    # https://pe.usps.com/text/pub28/28apc_002.htm
-    
-    USPS_expected = [
-        "Alley", "Anex", "Arcade", "Avenue", "Bayou", "Beach", "Bend", "Bluff", "Bluffs", "Bottom", "Boulevard", "Branch", 
-        "Bridge", "Brook", "Brooks", "Burg", "Burgs", "Bypass", "Camp", "Canyon", "Cape", "Causeway", "Center", "Centers", 
-        "Circle", "Cliff", "Cliffs", "Club", "Common", "Commons", "Corner", "Corners", "Course", "Court", "Courts", 
-        "Cove", "Coves", "Creek", "Crescent", "Crest", "Crossing", "Crossroad", "Crossroads", "Curve", "Dale", "Dam", 
-        "Divide", "Drive", "Drives", "Estate", "Estates", "Expressway", "Extension", "Extensions", "Falls", "Ferry", 
-        "Field", "Fields", "Flat", "Flats", "Ford", "Fords", "Forest", "Forge", "Forges", "Fork", "Forks", "Fort", 
-        "Freeway", "Garden", "Gateway", "Glen", "Glens", "Green", "Greens", "Grove", "Groves", "Harbor", "Harbors", "Haven", 
-        "Heights", "Highway", "Hill", "Hills", "Hollow", "Inlet", "Island", "Islands", "Isle", "Junction", "Junctions", 
-        "Key", "Keys", "Knoll", "Knolls", "Lake", "Lakes", "Landing", "Lane", "Light", "Lights", "Loaf", "Lock", "Locks", 
-        "Lodge", "Loop", "Manor", "Manors", "Meadows", "Mill", "Mills", "Mission", "Motorway", "Mount", "Mountain", 
-        "Mountains", "Neck", "Orchard", "Oval", "Overpass", "Park", "Parks", "Parkway", "Parkways", "Passage", "Path", 
-        "Pike", "Pine", "Pines", "Place", "Plain", "Plains", "Plaza", "Point", "Points", "Port", "Ports", "Prairie", 
-        "Radial", "Ranch", "Rapid", "Rapids", "Rest", "Ridge", "Ridges", "River", "Road", "Roads", "Route", "Shoal", "Shoals", 
-        "Shore", "Shores", "Skyway", "Spring", "Square", "Squares", "Station", "Stravenue", "Stream", "Street", "Streets", 
-        "Summit", "Terrace", "Throughway", "Trace", "Track", "Trafficway", "Trail", "Trailer", "Tunnel", "Turnpike", 
-        "Underpass", "Union", "Unions", "Valley", "Valleys", "Viaduct", "View", "Views", "Village", "Villages", "Ville", 
-        "Vista", "Way", "Well", "Wells"
-    ]
-    
-    # These additional expected street suffixes are assumed 
-    # to be acceptable for data cleaning purposes
-    
-    addl_expected = [
-        "Arsenal", "Cary", "Chase", "Cloisters", "Close", "Conn", "Concourse", 
-        "Driveway", "Farm", "Greene", "James", "Level", "Mews", "Needle", 
-        "Oaks", "Overlook", "Pass", "Pathway", "Ramon", "Row", "Run", 
-        "Sage", "Slip", "Trek", "Turn", "Walk", "Waye"
-    ]
-    
-    mapping = {
-        "Allee": "Alley", "Ally": "Alley", "Aly": "Alley", "Allee.": "Alley", "Ally.": "Alley", "Aly.": "Alley", 
-        "Annex": "Anex", "Annx": "Anex", "Anx": "Anex", "Annex.": "Anex", "Annx.": "Anex", "Anx.": "Anex", 
-        "Arc": "Arcade", "Arc.": "Arcade", 
-        "Av": "Avenue", "Ave": "Avenue", "Aven": "Avenue", "Avenu": "Avenue", "Avn": "Avenue", "Avnue": "Avenue", 
-        "Av.": "Avenue", "Ave.": "Avenue", "Aven.": "Avenue", "Avenu.": "Avenue", "Avn.": "Avenue", "Avnue.": "Avenue", 
-        "Bayoo": "Bayou", "Byu": "Bayou", "Bayoo.": "Bayou", "Byu.": "Bayou", 
-        "Bch": "Beach", "Bch.": "Beach", 
-        "Bnd": "Bend", "Bnd.": "Bend", 
-        "Blf": "Bluff", "Bluf": "Bluff", "Blfs": "Bluffs", "Blfs.": "Bluffs", 
-        "Bot": "Bottom", "Btm": "Bottom", "Bottm": "Bottom", "Bot.": "Bottom", "Btm.": "Bottom", "Bottm.": "Bottom", 
-        "Blvd": "Boulevard", "Boul": "Boulevard", "Boulv": "Boulevard", 
-        "Blvd.": "Boulevard", "Boul.": "Boulevard", "Boulv.": "Boulevard", 
-        "Br": "Branch", "Brnch": "Branch", "Br.": "Branch", "Brnch.": "Branch", 
-        "Brdge": "Bridge", "Brg": "Bridge", "Brdge.": "Bridge", "Brg.": "Bridge", 
-        "Brk": "Brook", "Brk.": "Brook", "Brks": "Brooks", "Brks.": "Brooks", 
-        "Bg": "Burg", "Bg.": "Burg", "Bgs": "Burgs", "Bgs.": "Burgs", 
-        "Byp": "Bypass", "Bypa": "Bypass", "Bypas": "Bypass", "Byps": "Bypass", 
-        "Byp.": "Bypass", "Bypa.": "Bypass", "Bypas.": "Bypass", "Byps.": "Bypass", 
-        "Cp": "Camp", "Cmp": "Camp", "Cp.": "Camp", "Cmp.": "Camp", 
-        "Canyn": "Canyon", "Cnyn": "Canyon", "Cyn": "Canyon", "Canyn.": "Canyon", "Cnyn.": "Canyon", "Cyn.": "Canyon", 
-        "Cpe": "Cape", "Cpe.": "Cape", 
-        "Causwa": "Causeway", "Cswy": "Causeway", 
-        "Cen": "Center", "Cent": "Center", "Centr": "Center", "Centre": "Center", 
-        "Cnter": "Center", "Cntr": "Center", "Ctr": "Center", 
-        "Cen.": "Center", "Cent.": "Center", "Centr.": "Center", "Centre.": "Center", 
-        "Cnter.": "Center", "Cntr.": "Center", "Ctr.": "Center", "Ctrs": "Centers", "Ctrs.": "Centers", 
-        "Cir": "Circle", "Circ": "Circle", "Circl": "Circle", "Crcl": "Circle", "Crcle": "Circle", 
-        "Cir.": "Circle", "Circ.": "Circle", "Circl.": "Circle", "Crcl.": "Circle", "Crcle.": "Circle", 
-        "Cirs": "Circle", "Cirs.": "Circle", 
-        "Clf": "Cliff", "Clf.": "Cliff", "Clfs": "Cliffs", "Clfs.": "Cliffs", 
-        "Clb": "Club", "Clb.": "Club", 
-        "Cmn": "Common", "Cmn.": "Common", "Cmns": "Commons", "Cmns.": "Commons", 
-        "Cor": "Corner", "Cor.": "Corner", "Cors": "Corners", "Cors.": "Corners", 
-        "Crse": "Course", "Crse.": "Course", 
-        "Ct": "Court", "Ct.": "Court", "Cts": "Courts", "Cts.": "Courts", 
-        "Cv": "Cove", "Cv.": "Cove", "Cvs": "Coves", "Cvs.": "Coves", 
-        "Crk": "Creek", "Crk.": "Creek", 
-        "Cres": "Crescent", "Crsent": "Crescent", "Crsnt": "Crescent", 
-        "Cres.": "Crescent", "Crsent.": "Crescent", "Crsnt.": "Crescent", 
-        "Crst": "Crest", "Crst.": "Crest", 
-        "Crssng": "Crossing", "Xing": "Crossing", "Crssng.": "Crossing", "Xing.": "Crossing", 
-        "Xrd": "Crossroad", "Xrd.": "Crossroad", "Xrds": "Crossroads", "Xrds.": "Crossroads", 
-        "Curv": "Curve", "Curv.": "Curve", 
-        "Dl": "Dale", "Dl.": "Dale", 
-        "Dm": "Dam", "Dm.": "Dam", 
-        "Div": "Divide", "Dv": "Divide", "Dvd": "Divide", "Div.": "Divide", "Dv.": "Divide", "Dvd.": "Divide", 
-        "Dr": "Drive", "Driv": "Drive", "Drv": "Drive", "Dr.": "Drive", "Driv.": "Drive", "Drv.": "Drive", 
-        "Drs": "Drives", "Drs.": "Drives", 
-        "Est": "Estate", "Est.": "Estate", "Ests": "Estates", "Ests.": "Estates", 
-        "Exp": "Expressway", "Expr": "Expressway", "Express": "Expressway", "Expw": "Expressway", "Expy": "Expressway", 
-        "Exp.": "Expressway", "Expr.": "Expressway", "Express.": "Expressway", "Expw.": "Expressway", "Expy.": "Expressway", 
-        "Ext": "Extension", "Extn": "Extension", "Extnsn": "Extension", 
-        "Ext.": "Extension", "Extn.": "Extension", "Extnsn.": "Extension", 
-        "Exts": "Extensions", "Exts.": "Extensions", 
-        "Fls": "Falls", "Fls.": "Falls", 
-        "Fry": "Ferry", "Frry": "Ferry", "Fry.": "Ferry", "Frry.": "Ferry", 
-        "Fld": "Field", "Fld.": "Field", "Flds": "Fields", "Flds.": "Fields", 
-        "Flt": "Flat", "Flt.": "Flat", "Flts": "Flats", "Flts.": "Flats", 
-        "Frd": "Ford", "Frd.": "Ford", "Frds": "Fords", "Frds.": "Fords", 
-        "Forests": "Forest", "Frst": "Forest", "Forests.": "Forest", "Frst.": "Forest", 
-        "Forg": "Forge", "Frg": "Forge", "Forg.": "Forge", "Frg.": "Forge", "Frgs": "Forges", "Frgs.": "Forges", 
-        "Frk": "Fork", "Frk.": "Fork", "Frks.": "Forks", "Frks.": "Forks", 
-        "Frt": "Fort", "Ft": "Fort", "Frt.": "Fort", "Ft.": "Fort", 
-        "Freewy": "Freeway", "Frway": "Freeway", "Frwy": "Freeway", "Fwy": "Freeway", 
-        "Freewy.": "Freeway", "Frway.": "Freeway", "Frwy.": "Freeway", "Fwy.": "Freeway", 
-        "Gardn": "Garden", "Grden": "Garden", "Grdn": "Garden", "Gdn": "Garden", 
-        "Gardn.": "Garden", "Grden.": "Garden", "Grdn.": "Garden", "Gdn.": "Garden", 
-        "Gdns": "Garden", "Grdns": "Garden", "Gdns.": "Garden", "Grdns.": "Garden", 
-        "Gatewy": "Gateway", "Gatway": "Gateway", "Gtway": "Gateway", "Gtwy": "Gateway", 
-        "Gatewy.": "Gateway", "Gatway.": "Gateway", "Gtway.": "Gateway", "Gtwy.": "Gateway", 
-        "Gln": "Glen", "Gln.": "Glen", "Glns": "Glens", "Glns.": "Glens", 
-        "Grn": "Green", "Grn.": "Green", "Grns": "Greens", "Grns.": "Greens", 
-        "Grov": "Grove", "Grv": "Grove", "Grov.": "Grove", "Grv.": "Grove", "Grvs": "Groves", "Grvs.": "Groves", 
-        "Harb": "Harbor", "Harbr": "Harbor", "Hbr": "Harbor", "Hrbor": "Harbor", 
-        "Harb.": "Harbor", "Harbr.": "Harbor", "Hbr.": "Harbor", "Hrbor.": "Harbor", "Hbrs": "Harbors", "Hbrs.": "Harbors", 
-        "Hvn": "Haven", "Hvn.": "Haven", 
-        "Ht": "Heights", "Hts": "Heights", "Ht.": "Heights", "Hts.": "Heights", 
-        "Highwy": "Highway", "Hiway": "Highway", "Hiwy": "Highway", "Hway": "Highway", "Hwy": "Highway", 
-        "Highwy.": "Highway", "Hiway.": "Highway", "Hiwy.": "Highway", "Hway.": "Highway", "Hwy.": "Highway", 
-        "Hl": "Hill", "Hl.": "Hill", "Hls": "Hills", "Hls.": "Hills", 
-        "Hllw": "Hollow", "Hollows": "Hollow", "Holw": "Hollow", "Holws": "Hollow", 
-        "Hllw.": "Hollow", "Hollows.": "Hollow", "Holw.": "Hollow", "Holws.": "Hollow", 
-        "Inlt": "Inlet", "Inlt.": "Inlet", 
-        "Is": "Island", "Islnd": "Island", "Is.": "Island", "Islnd.": "Island", 
-        "Iss": "Islands", "Islnds": "Islands", "Iss.": "Islands", "Islnds.": "Islands", 
-        "Isles": "Isle", "Isles.": "Isle", 
-        "Jct": "Junction", "Jction": "Junction", "Jctn": "Junction", "Junctn": "Junction", "Juncton": "Junction", 
-        "Jct.": "Junction", "Jction.": "Junction", "Jctn.": "Junction", "Junctn.": "Junction", "Juncton.": "Junction", 
-        "Jctns": "Junctions", "Jcts": "Junctions", "Jctns.": "Junctions", "Jcts.": "Junctions", 
-        "Ky": "Key", "Ky.": "Key", "Kys": "Keys", "Kys.": "Keys", 
-        "Knl": "Knoll", "Knol": "Knoll", "Knl.": "Knoll", "Knol.": "Knoll", "Knls": "Knolls", "Knls.": "Knolls", 
-        "Lk": "Lake", "Lk.": "Lake", "Lks": "Lakes", "Lks.": "Lakes", 
-        "Lndg": "Landing", "Lndng": "Landing", "Lndg.": "Landing", "Lndng.": "Landing", 
-        "Ln": "Lane", "Ln.": "Lane", 
-        "Lgt": "Light", "Lgt.": "Light", "Lgts": "Lights", "Lgts.": "Lights", 
-        "Lf": "Loaf", "Lf.": "Loaf", 
-        "Lck": "Lock", "Lck.": "Lock", "Lcks": "Locks", "Lcks.": "Locks", 
-        "Ldg": "Lodge", "Ldge": "Lodge", "Lodg": "Lodge", "Ldg.": "Lodge", "Ldge.": "Lodge", "Lodg.": "Lodge", 
-        "Loops": "Loop", "Loops.": "Loop", 
-        "Mnr": "Manor", "Mnr.": "Manor", "Mnrs": "Manors", "Mnrs.": "Manors", 
-        "Mdw": "Meadows", "Mdws": "Meadows", "Medows": "Meadows", "Mdw.": "Meadows", "Mdws.": "Meadows", "Medows.": "Meadows", 
-        "Ml": "Mill", "Ml.": "Mill", "Mls": "Mills", "Mls.": "Mills", 
-        "Missn": "Mission", "Mssn": "Mission", "Msn": "Mission", "Missn.": "Mission", "Mssn.": "Mission", "Msn.": "Mission", 
-        "Mtwy": "Motorway", "Mtwy.": "Motorway", 
-        "Mnt": "Mount", "Mt": "Mount", "Mnt.": "Mount", "Mt.": "Mount", 
-        "Mntain": "Mountain", "Mntn": "Mountain", "Mountin": "Mountain", "Mtin": "Mountain", "Mtn": "Mountain", 
-        "Mntain.": "Mountain", "Mntn.": "Mountain", "Mountin.": "Mountain", "Mtin.": "Mountain", "Mtn.": "Mountain", 
-        "Mntns": "Mountains", "Mtns": "Mountains", "Mntns.": "Mountains", "Mtns.": "Mountains", 
-        "Nck": "Neck", "Nck.": "Neck", 
-        "Orch": "Orchard", "Orchrd": "Orchard", "Orch.": "Orchard", "Orchrd.": "Orchard", 
-        "Ovl": "Oval", "Ovl.": "Oval", 
-        "Opas": "Overpass", "Opas.": "Overpass", 
-        "Prk": "Park", "Prk.": "Park", "Prks": "Parks", "Prks.": "Parks", 
-        "Parkwy": "Parkway", "Pkway": "Parkway", "Pkwy": "Parkway", "Pky": "Parkway", 
-        "Parkwy.": "Parkway", "Pkway.": "Parkway", "Pkwy.": "Parkway", "Pky.": "Parkway", 
-        "Pkwys": "Parkways", "Pkwys.": "Parkways", 
-        "Psge": "Passage", "Psge.": "Passage", 
-        "Paths": "Path", "Paths.": "Path", 
-        "Pikes": "Pike", "Pikes.": "Pike", 
-        "Pne": "Pine", "Pne.": "Pine", "Pnes": "Pines", "Pnes.": "Pines", 
-        "Pl": "Place", "Pl.": "Place", 
-        "Pln": "Plain", "Pln.": "Plain", "Plns": "Plains", "Plns.": "Plains", 
-        "Plz": "Plaza", "Plza": "Plaza", "Plz.": "Plaza", "Plza.": "Plaza", 
-        "Pt": "Point", "Pt.": "Point", "Pts": "Points", "Pts.": "Points", 
-        "Prt": "Port", "Prt.": "Port", "Prts": "Ports", "Prts.": "Ports", 
-        "Pr": "Prairie", "Prr": "Prairie", "Pr.": "Prairie", "Prr.": "Prairie", 
-        "Rad": "Radial", "Radiel": "Radial", "Radl": "Radial", "Rad.": "Radial", "Radiel.": "Radial", "Radl.": "Radial", 
-        "Ranches": "Ranch", "Rnch": "Ranch", "Rnchs": "Ranch", "Ranches.": "Ranch", "Rnch.": "Ranch", "Rnchs.": "Ranch", 
-        "Rpd": "Rapid", "Rpd.": "Rapid", "Rpds": "Rapids", "Rpds.": "Rapids", 
-        "Rst": "Rest", "Rst.": "Rest", 
-        "Rdg": "Ridge", "Rdge": "Ridge", "Rdg.": "Ridge", "Rdge.": "Ridge", 
-        "Rdgs": "Ridges", "Rdges": "Ridges", "Rdgs.": "Ridge", "Rdges.": "Ridges", 
-        "Riv": "River", "Rvr": "River", "Rivr": "River", "Riv.": "River", "Rvr.": "River", "Rivr.": "River", 
-        "Rd": "Road", "Rd.": "Road", "Rds": "Roads", "Rds.": "Roads", 
-        "Rte": "Route", "Rte.": "Route", 
-        "Shl": "Shoal", "Shl.": "Shoal", "Shls": "Shoals", "Shls.": "Shoals", 
-        "Shoar": "Shore", "Shr": "Shore", "Shoar.": "Shore", "Shr.": "Shore", 
-        "Shoars": "Shores", "Shrs": "Shores", "Shoars.": "Shores", "Shrs.": "Shores", 
-        "Skwy": "Skyway", "Skwy.": "Skyway", 
-        "Spg": "Spring", "Spng": "Spring", "Sprng": "Spring", "Spg.": "Spring", "Spng.": "Spring", "Sprng.": "Spring", 
-        "Spgs": "Spring", "Spngs": "Spring", "Sprngs": "Spring", "Spgs.": "Spring", "Spngs.": "Spring", "Sprngs.": "Spring", 
-        "Sq": "Square", "Sqr": "Square", "Sqre": "Square", "Squ": "Square", 
-        "Sq.": "Square", "Sqr.": "Square", "Sqre.": "Square", "Squ.": "Square", 
-        "Sqs": "Squares", "Sqrs": "Squares", "Sqs.": "Squares", "Sqrs.": "Squares", 
-        "Sta": "Station", "Statn": "Station", "Stn": "Station", "Sta.": "Station", "Statn.": "Station", "Stn.": "Station", 
-        "Stra": "Stravenue", "Strav": "Stravenue", "Straven": "Stravenue", 
-        "Stravn": "Stravenue", "Strvn": "Stravenue", "Strvnue": "Stravenue", 
-        "Stra.": "Stravenue", "Strav.": "Stravenue", "Straven.": "Stravenue", 
-        "Stravn.": "Stravenue", "Strvn.": "Stravenue", "Strvnue.": "Stravenue", 
-        "Streme": "Stream", "Strm": "Stream", "Streme.": "Stream", "Strm.": "Stream", 
-        "St": "Street", "Strt": "Street", "Str": "Street", "St.": "Street", "Strt.": "Street", "Str.": "Street", 
-        "Sts": "Streets", "Sts.": "Streets", 
-        "Smt": "Summit", "Sumit": "Summit", "Sumitt": "Summit", "Smt.": "Summit", "Sumit.": "Summit", "Sumitt.": "Summit", 
-        "Ter": "Terrace", "Terr": "Terrace", "Ter.": "Terrace", "Terr.": "Terrace", 
-        "Trwy": "Throughway", "Trwy.": "Throughway", 
-        "Trce": "Trace", "Traces": "Trace", "Trce.": "Trace", "Traces.": "Trace", 
-        "Tracks": "Track", "Trak": "Track", "Trk": "Track", "Trks": "Track", 
-        "Tracks.": "Track", "Trak.": "Track", "Trk.": "Track", "Trks.": "Track", 
-        "Trfy": "Trafficway", "Trfy.": "Trafficway", 
-        "Trails": "Trail", "Trl": "Trail", "Trls": "Trail", "Trails.": "Trail", "Trl.": "Trail", "Trls.": "Trail", 
-        "Trlr": "Trailer", "Trlrs": "Trailer", "Trlr.": "Trailer", "Trlrs.": "Trailer", 
-        "Tunel": "Tunnel", "Tunl": "Tunnel", "Tunls": "Tunnel", "Tunnels": "Tunnel", "Tunnl": "Tunnel", 
-        "Tunel.": "Tunnel", "Tunl.": "Tunnel", "Tunls.": "Tunnel", "Tunnels.": "Tunnel", "Tunnl.": "Tunnel", 
-        "Trnpk": "Turnpike", "Turnpk": "Turnpike", "Tpke": "Turnpike", 
-        "Trnpk.": "Turnpike", "Turnpk.": "Turnpike", "Tpke.": "Turnpike", 
-        "Upas": "Underpass", "Upas.": "Underpass", 
-        "Un": "Union", "Un.": "Union", "Uns": "Unions", "Uns.": "Unions", 
-        "Vally": "Valley", "Vlly": "Valley", "Vly": "Valley", "Vally.": "Valley", "Vlly.": "Valley", "Vly.": "Valley", 
-        "Vallys": "Valleys", "Vllys": "Valleys", "Vlys": "Valleys", 
-        "Vallys.": "Valleys", "Vllys.": "Valleys", "Vlys.": "Valleys", 
-        "Vdct": "Viaduct", "Via": "Viaduct", "Viadct": "Viaduct", "Vdct.": "Viaduct", "Via.": "Viaduct", "Viadct.": "Viaduct", 
-        "Vw": "View", "Vw.": "View", "Vws": "Views", "Vws.": "Views", 
-        "Vill": "Village", "Villag": "Village", "Villg": "Village", "Villiage": "Village", "Vlg": "Village", 
-        "Vill.": "Village", "Villag.": "Village", "Villg.": "Village", "Villiage.": "Village", "Vlg.": "Village", 
-        "Vills": "Villages", "Villags": "Villages", "Villgs": "Villages", "Villiages": "Villages", "Vlgs": "Villages", 
-        "Vills.": "Villages", "Villags.": "Villages", "Villgs.": "Villages", "Villiages.": "Villages", "Vlgs.": "Villages", 
-        "Vl": "Ville", "Vl.": "Ville", 
-        "Vis": "Vista", "Vist": "Vista", "Vst": "Vista", "Vsta": "Vista", 
-        "Vis.": "Vista", "Vist.": "Vista", "Vst.": "Vista", "Vsta.": "Vista", 
-        "Wy": "Way", "Wy.": "Way", 
-        "Wl": "Well", "Wl.": "Well", "Wls": "Wells", "Wls.": "Wells"
-    }
-    
-    # While mapping can be applied to any US address 
-    # from the OpenStreetMap database, addl_mapping 
-    # applies specifically to certain data cleaning 
-    # purposes within this dataset
-    
-    addl_mapping = {
-        "I-95" : "Interstate 95", "Roademergency=yes" : "Road"
-    }
-    
-    # The direction suffix allows the cleaning to look at the 
-    # second to the last string in the addr:street value 
-    # for any unexpected street types to clean
-    
-    direction_suffix = [
-        "N", "N.", "N*", "North", 
-        "S", "S.", "S*", "South", 
-        "E", "E.", "E*", "East", 
-        "W", "W.", "W*", "West"
-    ]
-    
-    def update_street_type(street_name):
-        words = street_name.split(' ')
-        
-        if words[-1] in direction_suffix:
-            if words[-2] not in [*USPS_expected, *addl_expected]:
-                if words[-2] in mapping.keys():
-                    words[-2] = mapping[words[-2]]
-                elif words[-2] in addl_mapping.keys():
-                    words[-2] = addl_mapping[words[-2]]
-        else:
-            if words[-1] not in [*USPS_expected, *addl_expected]:
-                if words[-1] in mapping.keys():
-                    words[-1] = mapping[words[-1]]
-                elif words[-1] in addl_mapping.keys():
-                    words[-1] = addl_mapping[words[-1]]
-                    
-        words = " ".join(words)
-        
-        return words
-    
     def is_street_name(elem):
         return (elem.attrib['k'] == "addr:street")
     
@@ -302,28 +59,6 @@ def update_street_direction(element):
         ...
     """
     
-    mapping = {
-        "N" : "North", "N." : "North", "N*" : "North", 
-        "S" : "South", "S." : "South", "S*" : "South", 
-        "E" : "East", "E." : "East", "E*" : "East", 
-        "W" : "West", "W." : "West", "W*" : "West"
-    }
-    
-    def update_direction(street_name):
-        words = street_name.split(" ")
-        
-        if words[0] in mapping.keys():
-            words[0] = mapping[words[0]]
-        if words[-1] in mapping.keys() and words[-2] not in ["Suite", "Ste", "Ste."]:
-            # update the direction only if the suffix 
-            # does not follow the word or abbreviation 
-            # for "Suite"
-            words[-1] = mapping[words[-1]]
-            
-        words = " ".join(words)
-        
-        return words
-    
     def is_street_name(elem):
         return (elem.attrib['k'] == "addr:street")
     
@@ -334,6 +69,24 @@ def update_street_direction(element):
     return element
 
 
+CITY_MAPPING = {
+    "Manakin Sabot" : "Manakin-Sabot", 
+    "Midolthian" : "Midlothian", 
+    "Richmond City" : "Richmond", 
+    "richmond" : "Richmond", 
+    "glen Allen" : "Glen Allen"
+}
+
+
+def update_city_name(city):
+    """
+    Returns city corrected based on CITY_MAPPING.
+    """
+    if city in CITY_MAPPING.keys():
+        city = CITY_MAPPING[city]
+    return city
+
+
 def update_city(element):
     """
     Updates the city names for consistency and 
@@ -344,19 +97,6 @@ def update_city(element):
     Returns:  cElementTree element (updated)
     """
     
-    mapping = {
-        "Manakin Sabot" : "Manakin-Sabot", 
-        "Midolthian" : "Midlothian", 
-        "Richmond City" : "Richmond", 
-        "richmond" : "Richmond", 
-        "glen Allen" : "Glen Allen"
-    }
-    
-    def update_city_name(city):
-        if city in mapping.keys():
-            city = mapping[city]
-        return city
-    
     def is_city(elem):
         return (elem.attrib['k'] == "addr:city")
     
@@ -367,6 +107,24 @@ def update_city(element):
     return element
 
 
+STATE_KEYS = ["addr:state", "gnis:ST_alpha", "is_in:state_code"]
+
+STATE_MAPPING = {
+    "Virginia" : "VA", 
+    "Va" : "VA", 
+    "va" : "VA"
+}
+
+
+def update_state_name(state):
+    """
+    Returns state made consistent based on STATE_MAPPING.
+    """
+    if state in STATE_MAPPING.keys():
+        state = STATE_MAPPING[state]
+    return state
+
+
 def update_state(element):
     """
     Updates the states for consistency for tags 
@@ -377,19 +135,8 @@ def update_state(element):
     Returns:  cElementTree element (updated)
     """
     
-    mapping = {
-        "Virginia" : "VA", 
-        "Va" : "VA", 
-        "va" : "VA"
-    }
-    
-    def update_state_name(state):
-        if state in mapping.keys():
-            state = mapping[state]
-        return state
-    
     def is_state(elem):
-        return (elem.attrib['k'] in ["addr:state", "gnis:ST_alpha", "is_in:state_code"])
+        return (elem.attrib['k'] in STATE_KEYS)
     
     for tag in element.iter("tag"):
         if is_state(tag):
@@ -398,6 +145,13 @@ def update_state(element):
     return element
 
 
+def is_included_state(state):
+    """
+    Returns False for any state value that is not 'VA'.
+    """
+    return state == "VA"
+
+
 def state_include(element):
     """
     Sets a boolean flag to false for state 
@@ -412,20 +166,70 @@ def state_include(element):
     flag = True
     
     def is_state(elem):
-        return (elem.attrib['k'] in ["addr:state", "gnis:ST_alpha", "is_in:state_code"])
+        return (elem.attrib['k'] in STATE_KEYS)
     
     for tag in element.iter("tag"):
-        if is_state(tag) and tag.attrib['v'] != "VA":
+        if is_state(tag) and not is_included_state(tag.attrib['v']):
             flag = False
     
     return flag
 
 
+COUNTY_NAMES = {
+    "036" : "Charles City", 
+    "041" : "Chesterfield", 
+    "075" : "Goochland", 
+    "085" : "Hanover", 
+    "087" : "Henrico", 
+    "095" : "James City", 
+    "101" : "King William", 
+    "127" : "New Kent", 
+    "145" : "Powhatan", 
+    "149" : "Prince George", 
+    "159" : "Richmond", 
+    "760" : "Richmond (city)"
+}
+
+COUNTY_NUMBERS = {name : number for number, name in COUNTY_NAMES.items()}
+
+
+def gnis_county_name_tag(county_num):
+    """
+    Returns the key and value of the 'gnis:county_name' 
+    tag for a 'gnis:county_id' value.
+    """
+    return ('gnis:county_name', COUNTY_NAMES[county_num])
+
+
+def gnis_county_tag(county_num):
+    """
+    Returns the key and value of the 'gnis:County' 
+    tag for a 'gnis:County_num' value.
+    """
+    return ('gnis:County', COUNTY_NAMES[county_num])
+
+
+def gnis_county_id_tag(county_name):
+    """
+    Returns the key and value of the 'gnis:county_id' 
+    tag for a 'gnis:county_name' value.
+    """
+    return ('gnis:county_id', COUNTY_NUMBERS[county_name])
+
+
+def gnis_county_num_tag(county_name):
+    """
+    Returns the key and value of the 'gnis:County_num' 
+    tag for a 'gnis:County' value.
+    """
+    return ('gnis:County_num', COUNTY_NUMBERS[county_name])
+
+
 def add_county_name(element):
     """
     Adds a tag for the county name to the element 
     that contains a county number tag based on 
-    mapping_names.
+    COUNTY_NAMES.
     
     Input:    cElementTree element
     Returns:  cElementTree element (updated)
@@ -437,26 +241,9 @@ def add_county_name(element):
     then a tag with key 'gnis:County' is created.
     """
     
-    mapping_names = {
-        "036" : "Charles City", 
-        "041" : "Chesterfield", 
-        "075" : "Goochland", 
-        "085" : "Hanover", 
-        "087" : "Henrico", 
-        "095" : "James City", 
-        "101" : "King William", 
-        "127" : "New Kent", 
-        "145" : "Powhatan", 
-        "149" : "Prince George", 
-        "159" : "Richmond", 
-        "760" : "Richmond (city)"
-    }
-    
-    def add_gnis_county_name(element, county_num, idx):
-        element.insert(idx, ET.Element("tag", {'k':'gnis:county_name', 'v':mapping_names[county_num]}))
-    
-    def add_gnis_county(element, county_num, idx):
-        element.insert(idx, ET.Element("tag", {'k':'gnis:County', 'v':mapping_names[county_num]}))
+    def add_tag(element, key_value, idx):
+        k, v = key_value
+        element.insert(idx, element.makeelement("tag", {'k':k, 'v':v}))
     
     def is_county_id(elem):
         return (elem.attrib['k'] == "gnis:county_id")
@@ -468,9 +255,9 @@ def add_county_name(element):
     for tag in element.iter():
         if tag.tag == "tag":
             if is_county_id(tag):
-                add_gnis_county_name(element, tag.attrib['v'], idx)
+                add_tag(element, gnis_county_name_tag(tag.attrib['v']), idx)
             if is_county_num(tag):
-                add_gnis_county(element, tag.attrib['v'], idx)
+                add_tag(element, gnis_county_tag(tag.attrib['v']), idx)
         idx += 1
     
     return element
@@ -480,7 +267,7 @@ def add_county_number(element):
     """
     Adds a tag for the county number to the element 
     that contains a county name tag based on 
-    mapping_names.
+    COUNTY_NUMBERS.
     
     Input:    cElementTree element
     Returns:  cElementTree element (updated)
@@ -492,26 +279,9 @@ def add_county_number(element):
     then a tag with key 'gnis:County_num' is created.
     """
     
-    mapping_names = {
-        "Charles City" : "036", 
-        "Chesterfield" : "041", 
-        "Goochland" : "075", 
-        "Hanover" : "085", 
-        "Henrico" : "087", 
-        "James City" : "095", 
-        "King William" : "101", 
-        "New Kent" : "127", 
-        "Powhatan" : "145", 
-        "Prince George" : "149", 
-        "Richmond" : "159", 
-        "Richmond (city)" : "760"
-    }
-    
-    def add_gnis_county_id(element, county_name, idx):
-        element.insert(idx, ET.Element("tag", {'k':'gnis:county_id', 'v':mapping_names[county_name]}))
-    
-    def add_gnis_county_num(element, county_name, idx):
-        element.insert(idx, ET.Element("tag", {'k':'gnis:County_num', 'v':mapping_names[county_name]}))
+    def add_tag(element, key_value, idx):
+        k, v = key_value
+        element.insert(idx, element.makeelement("tag", {'k':k, 'v':v}))
     
     def is_county_name(elem):
         return (elem.attrib['k'] == "gnis:county_name")
@@ -523,14 +293,32 @@ def add_county_number(element):
     for tag in element.iter():
         if tag.tag == "tag":
             if is_county_name(tag):
-                add_gnis_county_id(element, tag.attrib['v'], idx)
+                add_tag(element, gnis_county_id_tag(tag.attrib['v']), idx)
             if is_county(tag):
-                add_gnis_county_num(element, tag.attrib['v'], idx)
+                add_tag(element, gnis_county_num_tag(tag.attrib['v']), idx)
         idx += 1
     
     return element
 
 
+COUNTRY_KEYS = ["is_in:country", "addr:country"]
+
+COUNTRY_MAPPING = {
+    "USA" : "US", 
+    "United States" : "US", 
+    "United States of America" : "US"
+}
+
+
+def update_country_name(country):
+    """
+    Returns country made consistent based on COUNTRY_MAPPING.
+    """
+    if country in COUNTRY_MAPPING.keys():
+        country = COUNTRY_MAPPING[country]
+    return country
+
+
 def update_country(element):
     """
     Updates the country for consistency for tags 
@@ -541,19 +329,8 @@ def update_country(element):
     Returns:  cElementTree element (updated)
     """
     
-    mapping = {
-        "USA" : "US", 
-        "United States" : "US", 
-        "United States of America" : "US"
-    }
-    
-    def update_country_name(country):
-        if country in mapping.keys():
-            country = mapping[country]
-        return country
-    
     def is_country(elem):
-        return (elem.attrib['k'] in ["is_in:country", "addr:country"])
+        return (elem.attrib['k'] in COUNTRY_KEYS)
     
     for tag in element.iter("tag"):
         if is_country(tag):
@@ -562,6 +339,13 @@ def update_country(element):
     return element
 
 
+def is_included_country(country):
+    """
+    Returns False for any country value that is not 'US'.
+    """
+    return country == "US"
+
+
 def country_include(element):
     """
     Sets a boolean flag to false for country 
@@ -575,15 +359,34 @@ def country_include(element):
     flag = True
     
     def is_country(elem):
-        return (elem.attrib['k'] in ["is_in:country", "addr:country"])
+        return (elem.attrib['k'] in COUNTRY_KEYS)
     
     for tag in element.iter("tag"):
-        if is_country(tag) and tag.attrib['v'] != "US":
+        if is_country(tag) and not is_included_country(tag.attrib['v']):
             flag = False
     
     return flag
 
 
+POSTAL_CODE_KEYS = [
+    "addr:postcode", "postal_code", "tiger:zip", 
+    "tiger:zip_left", "tiger:zip_left_1", 
+    "tiger:zip_left_2", "tiger:zip_left_3", 
+    "tiger:zip_left_4", "tiger:zip_left_5", 
+    "tiger:zip_right", "tiger:zip_right_1", 
+    "tiger:zip_right_2", "tiger:zip_right_3"
+]
+
+
+def update_postal_code_value(postal_code):
+    """
+    Returns the first 5 digits of postal_code.
+    """
+    if len(postal_code) > 5:
+        postal_code = postal_code[:5]
+    return postal_code
+
+
 def update_postal_code(element):
     """
     Updates the postal/zip code for consistency 
@@ -601,23 +404,26 @@ def update_postal_code(element):
     """
     
     def is_postal_code(elem):
-        postal_code_keys = [
-            "addr:postcode", "postal_code", "tiger:zip", 
-            "tiger:zip_left", "tiger:zip_left_1", 
-            "tiger:zip_left_2", "tiger:zip_left_3", 
-            "tiger:zip_left_4", "tiger:zip_left_5", 
-            "tiger:zip_right", "tiger:zip_right_1", 
-            "tiger:zip_right_2", "tiger:zip_right_3"
-        ]
-        return (elem.attrib['k'] in postal_code_keys)
+        return (elem.attrib['k'] in POSTAL_CODE_KEYS)
     
     for tag in element.iter("tag"):
-        if is_postal_code(tag) and len(tag.attrib['v']) > 5:
-            tag.attrib['v'] = tag.attrib['v'][:5]
+        if is_postal_code(tag):
+            tag.attrib['v'] = update_postal_code_value(tag.attrib['v'])
     
     return element
 
 
+INCLUDED_POSTAL_CODE_KEYS = ["addr:postcode", "postal_code", "tiger:zip"]
+
+
+def is_included_postal_code(postal_code):
+    """
+    Returns False for any postal code that does not begin 
+    with '230', '231', '232', or '238'.
+    """
+    return postal_code[:3] in ["230", "231", "232", "238"]
+
+
 def postal_code_include(element):
     """
     Sets a boolean flag to false for postal code 
@@ -636,15 +442,24 @@ def postal_code_include(element):
     flag = True
     
     def is_postal_code(elem):
-        return (elem.attrib['k'] in ["addr:postcode", "postal_code", "tiger:zip"])
+        return (elem.attrib['k'] in INCLUDED_POSTAL_CODE_KEYS)
     
     for tag in element.iter("tag"):
-        if is_postal_code(tag) and tag.attrib['v'][:3] not in ["230", "231", "232", "238"]:
+        if is_postal_code(tag) and not is_included_postal_code(tag.attrib['v']):
             flag = False
     
     return flag
 
 
+def update_speed(speed):
+    """
+    Returns the number of speed followed by 'mph'.
+    """
+    words = speed.split(' ')
+    words = ' '.join([words[0], "mph"])
+    return words
+
+
 def update_max_speed(element):
     """
     Updates the max speed values for consistency 
@@ -659,11 +474,6 @@ def update_max_speed(element):
     For example, '30' becomes '30 mph'.
     """
     
-    def update_speed(speed):
-        words = speed.split(' ')
-        words = ' '.join([words[0], "mph"])
-        return words
-    
     def is_max_speed(elem):
         return (elem.attrib['k'] in ["maxspeed", "maxspeed:advisory"])
     
@@ -674,6 +484,24 @@ def update_max_speed(element):
     return element
 
 
+DENOMINATION_MAPPING = {
+    "nondenominational" : "none", 
+    "None" : "none", 
+    "presbyterian_church_in_america" : "presbyterian", 
+    "united_methodist" : "methodist"
+}
+
+
+def update_denom(denomination):
+    """
+    Returns denomination made consistent based on 
+    DENOMINATION_MAPPING.
+    """
+    if denomination in DENOMINATION_MAPPING.keys():
+        denomination = DENOMINATION_MAPPING[denomination]
+    return denomination
+
+
 def update_denomination(element):
     """
     Updates the denominations for consistency for 
@@ -683,18 +511,6 @@ def update_denomination(element):
     Returns:  cElementTree element (updated)
     """
     
-    mapping = {
-        "nondenominational" : "none", 
-        "None" : "none", 
-        "presbyterian_church_in_america" : "presbyterian", 
-        "united_methodist" : "methodist"
-    }
-    
-    def update_denom(denomination):
-        if denomination in mapping.keys():
-            denomination = mapping[denomination]
-        return denomination
-    
     def is_denomination(elem):
         return (elem.attrib['k'] == "denomination")
     
@@ -725,7 +541,181 @@ def update_religion(element):
     return element
 
 
-def clean_data(osm_file, clean_file):
+# The cleaning rules in the order clean_data applies them. 
+# Each rule lists the tag keys it applies to, an action, and 
+# a function of the tag value: 
+#     "update"  -> returns the updated value 
+#     "add"     -> returns the key and value of a new tag 
+#                  to add directly after the tag 
+#     "include" -> returns False if the element should be 
+#                  excluded from the clean file
+
+CLEANING_RULES = [
+    (["addr:street"], "update", update_street_type), 
+    (["addr:street"], "update", update_direction), 
+    (["addr:city"], "update", update_city_name), 
+    (STATE_KEYS, "update", update_state_name), 
+    (["gnis:county_id"], "add", gnis_county_name_tag), 
+    (["gnis:County_num"], "add", gnis_county_tag), 
+    (["gnis:county_name"], "add", gnis_county_id_tag), 
+    (["gnis:County"], "add", gnis_county_num_tag), 
+    (COUNTRY_KEYS, "update", update_country_name), 
+    (POSTAL_CODE_KEYS, "update", update_postal_code_value), 
+    (["maxspeed", "maxspeed:advisory"], "update", update_speed), 
+    (["denomination"], "update", update_denom), 
+    (["religion"], "update", str.lower), 
+    (STATE_KEYS, "include", is_included_state), 
+    (COUNTRY_KEYS, "include", is_included_country), 
+    (INCLUDED_POSTAL_CODE_KEYS, "include", is_included_postal_code)
+]
+
+
+def compile_cleaning_rules(rules):
+    """
+    Compiles a list of cleaning rules into a dict of tag 
+    keys with the rules that apply to each key.
+    
+    Input:    list of (keys, action, function) rules
+    Returns:  a dict of tag keys with lists of
+                  (position, action, function) rules
+    
+    The position of each rule in rules is kept so that a 
+    tag added by an "add" rule only goes through the rules 
+    that come after the one that added it.
+    """
+    compiled = defaultdict(list)
+    
+    for position, (keys, action, func) in enumerate(rules):
+        for key in keys:
+            compiled[key].append((position, action, func))
+    
+    return dict(compiled)
+
+
+COMPILED_CLEANING_RULES = compile_cleaning_rules(CLEANING_RULES)
+
+
+def apply_cleaning_rules(element, compiled_rules=COMPILED_CLEANING_RULES):
+    """
+    Cleans the tags of the element in a single pass using 
+    the compiled cleaning rules for each tag's key.
+    
+    Input:    cElementTree element
+              optional compiled rules from compile_cleaning_rules
+    Returns:  a boolean value (False if the element should
+                  be excluded from the clean file)
+    
+    The element is updated in place exactly as running each 
+    of the update/add functions and then each of the include 
+    functions over the element would update it.
+    """
+    
+    flag = True
+    
+    idx = 0
+    start = 0
+    while idx < len(element):
+        tag = element[idx]
+        idx += 1
+        next_start = 0
+        
+        if tag.tag == "tag":
+            for position, action, func in compiled_rules.get(tag.attrib['k'], ()):
+                if position < start:
+                    continue
+                if action == "update":
+                    tag.attrib['v'] = func(tag.attrib['v'])
+                elif action == "add":
+                    k, v = func(tag.attrib['v'])
+                    element.insert(idx, element.makeelement("tag", {'k':k, 'v':v}))
+                    next_start = position + 1
+                elif not func(tag.attrib['v']):
+                    flag = False
+        
+        start = next_start
+    
+    return flag
+
+
+def write_clean_elements(elements, output):
+    """
+    Cleans each of the elements and writes the ones that 
+    are included to the open binary output file.
+    
+    Input:    iterable of cElementTree elements
+              output file opened in binary mode
+    Returns:  (none)
+    
+    Every element is written with the same trailing 
+    whitespace, so the output does not depend on where 
+    the parser's read buffer happened to end.
+    """
+    for element in elements:
+    
+        # cleans the street, street direction, city, state, 
+        # country, postal/zip code, max speed, denomination, 
+        # and religion tags, adds county name/number tags, 
+        # and checks the state, country, and postal code tags
+        if apply_cleaning_rules(element):
+            # if the element passes the state, country, and postal code tests, 
+            # then the element will be written to the clean_data file
+            element.tail = "\n  "
+            output.write(tostring(element))
+
+
+def clean_element_range(osm_file, start, end, part_file):
+    """
+    Cleans the elements between the start and end byte 
+    offsets of the osm_file and writes them to part_file.
+    
+    Input:    file name of the OSM data file (string)
+              start and end byte offsets (int) 
+              file name of the part file to write (string)
+    Returns:  file name of the part file (string)
+    """
+    with open(part_file, "wb") as output:
+        write_clean_elements(get_element_range(osm_file, start, end), output)
+    
+    return part_file
+
+
+def write_clean_elements_parallel(osm_file, output, workers):
+    """
+    Splits the osm_file into element-aligned byte ranges, 
+    cleans the ranges in a pool of worker processes, and 
+    writes the cleaned ranges to output in file order.
+    
+    Input:    file name of the OSM data file (string)
+              output file opened in binary mode 
+              number of worker processes (int)
+    Returns:  (none)
+    
+    Each range is cleaned into a temporary part file next 
+    to the output file, which is appended to output and 
+    removed as soon as every range before it is written.
+    """
+    ranges = split_element_ranges(osm_file, workers * 4)
+    part_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output.name)))
+    
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    clean_element_range, osm_file, start, end, 
+                    os.path.join(part_dir, "part-{0}".format(i))
+                )
+                for i, (start, end) in enumerate(ranges)
+            ]
+            for future in futures:
+                part_file = future.result()
+                with open(part_file, "rb") as part:
+                    shutil.copyfileobj(part, output, 1 << 20)
+                os.remove(part_file)
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+
+
+def clean_data(osm_file, clean_file, workers=1, parser="stdlib"):
     """
     Iterates through the elements of the osm_file, 
     cleans or excludes each element based on the 
@@ -733,41 +723,199 @@ def clean_data(osm_file, clean_file):
     to the clean_file in xml format.
     
     Input:    file name of the OSM data file (string)
+              optional number of worker processes (int)
+              optional parser for get_element, "stdlib" or "lxml"
     Returns:  file name of the cleaned data file (string)
-    """
     
-    def get_element(osm_file, tags=('node', 'way', 'relation')):
-        context = iter(ET.iterparse(osm_file, events=('start', 'end')))
-        _, root = next(context)
-        for event, elem in context:
-            if event == 'end' and elem.tag in tags:
-                yield elem
-                root.clear()
+    With more than one worker, the osm_file is split into 
+    byte ranges on top level element boundaries and the 
+    ranges are cleaned in parallel. The clean_file is 
+    identical to the one a single worker writes with the 
+    stdlib parser, which the workers always use. The lxml 
+    parser writes the same elements, but without the space 
+    before '/>' in empty tags.
+    
+    A .pbf osm_file is decoded by osmpbf with the given 
+    number of workers instead of being split into ranges.
+    """
     
     print("Writing cleaned elements to clean file...")
     
     with open(clean_file, "wb") as output:
         output.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
         output.write(b'<osm>\n  ')
-        for i, element in enumerate(get_element(osm_file)):
-            
-            # cleans the street, street direction, city, and state tags
-            element = update_state(update_city(update_street_direction(update_street(element))))
-            # adds county name/number tags
-            element = add_county_number(add_county_name(element))
-            # cleans the country, postal/zip code, and max speed tags
-            element = update_max_speed(update_postal_code(update_country(element)))
-            # cleans the denomination and religion tags
-            element = update_religion(update_denomination(element))
-            
-            if state_include(element) and country_include(element) and postal_code_include(element):
-                # if the element passes the state, country, and postal code tests, 
-                # then the element will be written to the clean_data file
-                output.write(ET.tostring(element, encoding='utf-8'))
-            
+        if is_pbf_file(osm_file):
+            write_clean_elements(get_pbf_element(osm_file, workers=workers), output)
+        elif workers > 1:
+            write_clean_elements_parallel(osm_file, output, workers)
+        else:
+            write_clean_elements(get_element(osm_file, parser=parser), output)
         output.write(b'</osm>')
     
     print("Cleaned file created.")
     
     return clean_file
 
+
+def read_change_file(osc_file):
+    """
+    Reads the created, modified, and deleted elements of an 
+    OSM change file (.osc).
+    
+    Input:    file name of the change file (string)
+    Returns:  a dict of osmindex keys with the new element, 
+                  or None for deleted elements
+    
+    When an element changes more than once, the last change 
+    in the file wins.
+    """
+    changes = {}
+    action = None
+    
+    for event, elem in ET.iterparse(osc_file, events=('start', 'end')):
+        if elem.tag in ('create', 'modify', 'delete'):
+            action = elem.tag if event == 'start' else None
+        elif event == 'end' and action is not None and elem.tag in ('node', 'way', 'relation'):
+            key = osmindex.element_key(elem.tag, elem.attrib['id'])
+            changes[key] = None if action == 'delete' else elem
+    
+    return changes
+
+
+def snapshot_changes(previous_clean, snapshot):
+    """
+    Compares a new snapshot with the previous clean file by 
+    (type, id, version) and reads the elements that changed.
+    
+    Input:    file name of the previous clean file (string)
+              file name of the new OSM XML snapshot (string)
+    Returns:  a dict of osmindex keys with the new element, 
+                  or None for deleted elements
+    
+    Both files are only scanned for their start tags, and 
+    just the new or changed elements of the snapshot are 
+    parsed. Elements that the previous cleaning excluded 
+    are missing from the clean file, so they are always 
+    cleaned again.
+    """
+    old_keys, old_versions, old_offsets, old_lengths = osmindex.scan_element_versions(previous_clean)
+    keys, versions, offsets, lengths = osmindex.scan_element_versions(snapshot)
+    
+    changes = {}
+    if len(old_keys):
+        positions = np.minimum(np.searchsorted(old_keys, keys), len(old_keys) - 1)
+        unchanged = (old_keys[positions] == keys) & (old_versions[positions] == versions)
+        deleted = old_keys[~np.isin(old_keys, keys)]
+        changes.update((int(key), None) for key in deleted)
+    else:
+        unchanged = np.zeros(len(keys), dtype=bool)
+    
+    with open(snapshot, 'rb') as f:
+        for key, offset, length in zip(keys[~unchanged], offsets[~unchanged], lengths[~unchanged]):
+            f.seek(int(offset))
+            changes[int(key)] = ET.fromstring(f.read(int(length)))
+    
+    return changes
+
+
+def copy_byte_range(source, output, start, end, block_size=1 << 20):
+    """
+    Copies the bytes from start to end of the open binary 
+    source file to the open binary output file.
+    """
+    source.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        block = source.read(min(block_size, remaining))
+        if not block:
+            break
+        output.write(block)
+        remaining -= len(block)
+
+
+def update_clean_file(previous_clean, changes, clean_file):
+    """
+    Writes clean_file as previous_clean with the changes 
+    applied, cleaning only the created and modified elements.
+    
+    Input:    file name of the previous clean file (string)
+              dict of changes from read_change_file or 
+                  snapshot_changes
+              file name of the updated clean file (string)
+    Returns:  file name of the updated clean file (string)
+    
+    The byte offset index of previous_clean locates each 
+    changed element, and the unchanged bytes between them 
+    are copied without being parsed. previous_clean must be 
+    in type and id order, as clean_data writes it, and it 
+    may be the same file as clean_file.
+    """
+    index = osmindex.load_index(previous_clean)
+    keys = np.asarray(index.keys)
+    offsets = np.asarray(index.offsets)
+    lengths = np.asarray(index.lengths)
+    if np.any(np.diff(offsets) <= 0):
+        raise ValueError("{0} is not in type and id order".format(previous_clean))
+    
+    if len(keys):
+        position = int(offsets[0])
+        data_end = int(offsets[-1] + lengths[-1])
+    else:
+        position = data_end = 0
+    
+    part_file = clean_file + ".part"
+    with open(previous_clean, "rb") as source, open(part_file, "wb") as output:
+        output.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+        output.write(b'<osm>\n  ')
+        for key in sorted(changes):
+            i = int(np.searchsorted(keys, key))
+            next_offset = int(offsets[i]) if i < len(keys) else data_end
+            copy_byte_range(source, output, position, next_offset)
+            position = next_offset
+            if i < len(keys) and keys[i] == key:
+                # skips the previous version of the element
+                position += int(lengths[i])
+            if changes[key] is not None:
+                write_clean_elements([changes[key]], output)
+        copy_byte_range(source, output, position, data_end)
+        output.write(b'</osm>')
+    
+    os.replace(part_file, clean_file)
+    
+    return clean_file
+
+
+def clean_data_incremental(previous_clean, clean_file, osc_file=None, snapshot=None):
+    """
+    Updates a previous clean_data output from an OSM change 
+    file or a new snapshot instead of cleaning the whole 
+    extract again.
+    
+    Input:    file name of the previous clean file (string)
+              file name of the updated clean file (string) 
+              file name of an OSM change file (.osc), or 
+              file name of a new OSM XML snapshot
+    Returns:  file name of the updated clean file (string)
+    
+    Only created and modified elements are cleaned, deleted 
+    elements are dropped, and everything else is copied from 
+    previous_clean as is. The result is identical to running 
+    clean_data over the updated extract.
+    """
+    if (osc_file is None) == (snapshot is None):
+        raise ValueError("Pass either an osc_file or a snapshot")
+    
+    print("Reading changes...")
+    
+    if osc_file is not None:
+        changes = read_change_file(osc_file)
+    else:
+        changes = snapshot_changes(previous_clean, snapshot)
+    
+    print("Applying {0} changes to clean file...".format(len(changes)))
+    
+    update_clean_file(previous_clean, changes, clean_file)
+    
+    print("Cleaned file updated.")
+    
+    return clean_file
@@ -1,30 +1,532 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-import overpy
-import xml.etree.cElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import xml.etree.ElementTree as ET
 
+try:
+    import overpy
+except ImportError:
+    overpy = None
 
-def download_xml_data(min_lat=37.3729, min_lon=-77.5999, max_lat=37.7039, max_lon=-77.2689):
+from osmpbf import is_pbf_file
+from osmstream import find_data_end, find_element_start, get_element, get_element_range, tostring
+
+
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+
+# HTTP status codes Overpass returns when it is overloaded or 
+# rate limiting, which are worth retrying after a backoff
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Overpass still answers 200 when a query times out or runs out 
+# of memory, ending the partial results with this remark
+
+OVERPASS_RUNTIME_ERROR = re.compile(rb'<remark>\s*runtime error')
+
+ELEMENT_TYPE_ORDER = {'node': 0, 'way': 1, 'relation': 2}
+
+# Downloaded query results are kept gzipped in the download 
+# cache, up to DOWNLOAD_CACHE_MAX_SIZE compressed bytes
+
+DOWNLOAD_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "osm_downloads")
+
+DOWNLOAD_CACHE_MAX_SIZE = 4 << 30
+
+BBOX_FILTER = re.compile(r"\((-?[\d.]+(?:,-?[\d.]+){3})\)")
+
+cache_lock = threading.Lock()
+
+
+def stream_overpass_query(query_str, output_file, url=OVERPASS_URL, chunk_size=1 << 20, 
+                          report_every=50 << 20, timeout=600):
+    """
+    Posts query_str to the Overpass API and streams the raw 
+    response body to output_file in chunks.
+    
+    Input:    Overpass QL query (string)
+              file name to save the response to (string) 
+              optional Overpass API endpoint (string) 
+              optional number of bytes per chunk (int) 
+              optional number of bytes between progress 
+                  reports (int)
+              optional socket timeout in seconds
+    Returns:  number of bytes written (int)
+    
+    Only one chunk is held in memory at a time, however large 
+    the response is. The body is written to a '.part' file that 
+    replaces output_file once the download completes, so a 
+    failed download never leaves a truncated output_file behind.
+    """
+    data = urllib.parse.urlencode({"data": query_str}).encode("utf-8")
+    part_file = output_file + ".part"
+    written = 0
+    reported = 0
+    start = time.time()
+    
+    def report():
+        elapsed = max(time.time() - start, 1e-9)
+        print("{0:.1f} MB downloaded ({1:.1f} MB/second)".format(
+            written / 1e6, written / 1e6 / elapsed))
+    
+    try:
+        with urllib.request.urlopen(url, data=data, timeout=timeout) as response:
+            with open(part_file, "wb") as output:
+                while True:
+                    chunk = response.read(chunk_size)
+                    if not chunk:
+                        break
+                    output.write(chunk)
+                    written += len(chunk)
+                    if written - reported >= report_every:
+                        report()
+                        reported = written
+        os.replace(part_file, output_file)
+    finally:
+        if os.path.exists(part_file):
+            os.remove(part_file)
+    
+    report()
+    
+    return written
+
+
+def fetch_overpass_query(query_str, output_file, url=OVERPASS_URL, retries=3, backoff=5.0):
+    """
+    Streams the results of query_str to output_file with 
+    stream_overpass_query, retrying failed requests.
+    
+    Input:    Overpass QL query (string)
+              file name to save the response to (string) 
+              optional Overpass API endpoint (string) 
+              optional number of retries (int) 
+              optional seconds to wait before the first retry
+    Returns:  number of bytes written (int)
+    
+    Connection errors, timeouts, and the status codes in 
+    RETRY_STATUS_CODES are retried with exponential backoff 
+    and random jitter. Any other error is raised at once.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return stream_overpass_query(query_str, output_file, url)
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRY_STATUS_CODES or attempt == retries:
+                raise
+        except OSError:
+            if attempt == retries:
+                raise
+        
+        delay = backoff * 2 ** attempt + random.uniform(0, backoff)
+        print("Query failed, retrying in {0:.1f} seconds...".format(delay))
+        time.sleep(delay)
+
+
+def normalize_query(query_str):
+    """
+    Returns query_str without insignificant whitespace and 
+    with the coordinates of its bounding box filters rounded 
+    to 7 decimal places, so equivalent queries match.
+    """
+    query_str = re.sub(r"\s*([,;:()\[\]])\s*", r"\1", query_str.strip())
+    
+    def round_bbox(match):
+        coordinates = ["{0:.7f}".format(float(c)) for c in match.group(1).split(",")]
+        return "(" + ",".join(coordinates) + ")"
+    
+    return BBOX_FILTER.sub(round_bbox, query_str)
+
+
+def cache_key(query_str, url=OVERPASS_URL):
+    """
+    Returns the download cache key (a SHA-256 hex digest) of 
+    a query sent to the url.
+    """
+    return hashlib.sha256("\n".join([url, normalize_query(query_str)]).encode("utf-8")).hexdigest()
+
+
+def cache_paths(cache_dir, key):
+    """
+    Returns the data file and metadata file names of the 
+    cache entry with the key.
+    """
+    return (os.path.join(cache_dir, key + ".osm.gz"), os.path.join(cache_dir, key + ".json"))
+
+
+def write_metadata(metadata_file, metadata):
+    """
+    Writes the metadata dict of a cache entry to metadata_file, 
+    replacing it in one step.
+    """
+    with open(metadata_file + ".part", "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(metadata_file + ".part", metadata_file)
+
+
+def remove_cache_entry(cache_dir, key):
+    """
+    Removes the data and metadata files of a cache entry.
+    """
+    for path in cache_paths(cache_dir, key):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def read_cached_query(key, output_file, cache_dir=DOWNLOAD_CACHE_DIR):
+    """
+    Decompresses the cache entry with the key to output_file.
+    
+    Input:    cache key (string)
+              file name to save the results to (string) 
+              optional download cache directory (string)
+    Returns:  True if the entry was found and intact, 
+                  otherwise False
+    
+    The SHA-256 of the decompressed data is checked against 
+    the entry's metadata, and a corrupt entry is removed so 
+    the query is downloaded again.
+    """
+    data_file, metadata_file = cache_paths(cache_dir, key)
+    if not os.path.exists(metadata_file):
+        return False
+    
+    part_file = output_file + ".part"
+    digest = hashlib.sha256()
+    try:
+        with open(metadata_file) as f:
+            metadata = json.load(f)
+        with gzip.open(data_file, "rb") as cached, open(part_file, "wb") as output:
+            for chunk in iter(lambda: cached.read(1 << 20), b''):
+                digest.update(chunk)
+                output.write(chunk)
+        intact = digest.hexdigest() == metadata["sha256"]
+    except (OSError, EOFError, ValueError, KeyError):
+        intact = False
+    
+    if not intact:
+        if os.path.exists(part_file):
+            os.remove(part_file)
+        remove_cache_entry(cache_dir, key)
+        return False
+    
+    os.replace(part_file, output_file)
+    metadata["last_used"] = time.time()
+    write_metadata(metadata_file, metadata)
+    
+    return True
+
+
+def write_cached_query(key, query_str, url, osm_file, cache_dir=DOWNLOAD_CACHE_DIR, 
+                       max_size=DOWNLOAD_CACHE_MAX_SIZE):
+    """
+    Stores a gzipped copy of osm_file in the download cache 
+    under the key, along with its metadata (query, url, 
+    timestamps, sizes, and SHA-256), then evicts the least 
+    recently used entries if the cache is over max_size.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    data_file, metadata_file = cache_paths(cache_dir, key)
+    digest = hashlib.sha256()
+    size = 0
+    
+    with open(osm_file, "rb") as source, gzip.open(data_file + ".part", "wb") as cached:
+        for chunk in iter(lambda: source.read(1 << 20), b''):
+            digest.update(chunk)
+            size += len(chunk)
+            cached.write(chunk)
+    os.replace(data_file + ".part", data_file)
+    
+    now = time.time()
+    write_metadata(metadata_file, {
+        "query": query_str, 
+        "url": url, 
+        "created": now, 
+        "last_used": now, 
+        "size": size, 
+        "stored_size": os.path.getsize(data_file), 
+        "sha256": digest.hexdigest()
+    })
+    
+    evict_cache(cache_dir, max_size, keep=key)
+
+
+def evict_cache(cache_dir=DOWNLOAD_CACHE_DIR, max_size=DOWNLOAD_CACHE_MAX_SIZE, keep=None):
+    """
+    Removes the least recently used entries of the download 
+    cache until its stored size is at most max_size bytes, 
+    never removing the entry with the key keep.
+    
+    Returns:  number of entries removed (int)
+    """
+    with cache_lock:
+        entries = []
+        for name in os.listdir(cache_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(cache_dir, name)) as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                continue
+            entries.append((metadata.get("last_used", 0), name[:-len(".json")], metadata.get("stored_size", 0)))
+        
+        total = sum(stored_size for last_used, key, stored_size in entries)
+        removed = 0
+        for last_used, key, stored_size in sorted(entries):
+            if total <= max_size:
+                break
+            if key == keep:
+                continue
+            remove_cache_entry(cache_dir, key)
+            total -= stored_size
+            removed += 1
+    
+    return removed
+
+
+def has_runtime_error(osm_file, tail_size=1 << 16):
+    """
+    Returns True if the Overpass results in osm_file end with 
+    a runtime error remark, ex. a timeout or running out of 
+    memory, which means they are incomplete.
+    
+    Overpass writes the remark after the elements it output 
+    before the error, so only the end of the file is read.
+    """
+    with open(osm_file, "rb") as f:
+        f.seek(max(0, os.path.getsize(osm_file) - tail_size))
+        return OVERPASS_RUNTIME_ERROR.search(f.read()) is not None
+
+
+def fetch_cached_query(query_str, output_file, url=OVERPASS_URL, retries=3, backoff=5.0, 
+                       cache_dir=DOWNLOAD_CACHE_DIR, max_size=DOWNLOAD_CACHE_MAX_SIZE):
+    """
+    Saves the results of query_str to output_file from the 
+    download cache, or downloads them with fetch_overpass_query 
+    and adds them to the cache.
+    
+    Input:    Overpass QL query (string)
+              file name to save the results to (string) 
+              optional Overpass API endpoint (string) 
+              optional number of retries and backoff 
+              optional download cache directory (string), 
+                  or None to always download
+              optional maximum cache size in bytes (int)
+    Returns:  True if the results were read from the cache
+    
+    Results that end in an Overpass runtime error are 
+    incomplete, so they are saved but never cached.
+    """
+    if cache_dir is None:
+        fetch_overpass_query(query_str, output_file, url, retries, backoff)
+        return False
+    
+    key = cache_key(query_str, url)
+    if read_cached_query(key, output_file, cache_dir):
+        print("Read query results from the download cache.")
+        return True
+    
+    fetch_overpass_query(query_str, output_file, url, retries, backoff)
+    if has_runtime_error(output_file):
+        print("Overpass reported a runtime error, so the results are incomplete and were not cached.")
+        return False
+    write_cached_query(key, query_str, url, output_file, cache_dir, max_size)
+    
+    return False
+
+
+def node_query(min_lat, min_lon, max_lat, max_lon):
+    """
+    Returns the Overpass QL query for every node in the 
+    bounding box, with metadata, in XML format.
+    """
+    bounding_box = ", ".join("{0:.7f}".format(c) for c in (min_lat, min_lon, max_lat, max_lon))
+    return "".join(["[out:xml];node(", bounding_box, ");out meta;"])
+
+
+def split_bbox(min_lat, min_lon, max_lat, max_lon, tiles):
+    """
+    Splits the bounding box into a tiles x tiles grid and 
+    returns the (min_lat, min_lon, max_lat, max_lon) of each 
+    tile, row by row. Neighbouring tiles share their edges.
+    """
+    lats = [min_lat + (max_lat - min_lat) * i / tiles for i in range(tiles)] + [max_lat]
+    lons = [min_lon + (max_lon - min_lon) * i / tiles for i in range(tiles)] + [max_lon]
+    return [
+        (lats[i], lons[j], lats[i + 1], lons[j + 1])
+        for i in range(tiles) for j in range(tiles)
+    ]
+
+
+def element_key(element):
+    """
+    Returns the (type, id) sort key of a top level element, 
+    in the node, way, relation order Overpass writes them.
+    """
+    return (ELEMENT_TYPE_ORDER[element.tag], int(element.attrib['id']))
+
+
+def merge_osm_files(osm_files, output_file):
+    """
+    Merges the osm_files into one OSM XML file, writing each 
+    element found in more than one file only once.
+    
+    Input:    list of file names of the OSM files to merge
+              file name of the merged file (string)
+    Returns:  number of elements written (int)
+    
+    Overpass sorts its output by type and then id, so the 
+    files are merged as sorted streams and duplicates (such 
+    as the nodes on a shared tile edge) arrive next to each 
+    other. Only one element per file is held in memory.
+    """
+    written = 0
+    last_key = None
+    streams = [get_element(osm_file) for osm_file in osm_files]
+    
+    with open(output_file, "wb") as output:
+        output.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+        output.write(b'<osm>\n  ')
+        for element in heapq.merge(*streams, key=element_key):
+            key = element_key(element)
+            if key == last_key:
+                continue
+            last_key = key
+            element.tail = "\n  "
+            output.write(tostring(element))
+            written += 1
+        output.write(b'</osm>')
+    
+    return written
+
+
+def download_tiles(min_lat, min_lon, max_lat, max_lon, output_file, tiles=4, workers=4, 
+                   url=OVERPASS_URL, retries=3, backoff=5.0, cache_dir=DOWNLOAD_CACHE_DIR, 
+                   cache_max_size=DOWNLOAD_CACHE_MAX_SIZE):
+    """
+    Downloads the bounding box as a grid of tiles, fetching 
+    up to workers tiles at a time, and merges the tiles into 
+    output_file.
+    
+    Input:    bounding box (floats)
+              file name of the merged file (string) 
+              optional number of tiles per side of the grid (int) 
+              optional number of concurrent downloads (int) 
+              optional Overpass API endpoint (string) 
+              optional retries and backoff for each tile
+              optional download cache directory and size
+    Returns:  file name of the merged file (string)
+    
+    Each tile is a much smaller query than the whole bounding 
+    box, so tiles rarely time out and a failed tile is retried 
+    on its own. Each tile is also cached on its own, so only 
+    the tiles missing from the cache are downloaded again. 
+    The tile files are kept in a temporary directory next 
+    to output_file until they have been merged.
+    """
+    tile_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_file)))
+    try:
+        tile_files = [
+            os.path.join(tile_dir, "tile{0}.osm".format(i))
+            for i in range(tiles * tiles)
+        ]
+        queries = [node_query(*bbox) for bbox in split_bbox(min_lat, min_lon, max_lat, max_lon, tiles)]
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(fetch_cached_query, query_str, tile_file, url, retries, backoff, 
+                                cache_dir, cache_max_size)
+                for query_str, tile_file in zip(queries, tile_files)
+            ]
+            for future in futures:
+                future.result()
+        
+        print("Merging tiles...")
+        merge_osm_files(tile_files, output_file)
+    finally:
+        shutil.rmtree(tile_dir, ignore_errors=True)
+    
+    return output_file
+
+
+def download_xml_data(min_lat=37.3729, min_lon=-77.5999, max_lat=37.7039, max_lon=-77.2689, 
+                      stream=True, url=OVERPASS_URL, tiles=1, workers=4, output_file="map", 
+                      cache_dir=DOWNLOAD_CACHE_DIR, cache_max_size=DOWNLOAD_CACHE_MAX_SIZE):
     """
     Queries the OpenStreetMap database using the Overpass API, 
-    saves the results to a file (data.osm) in XML format, and 
-    returns the saved file name.
+    saves the results to a file (output_file) in XML format, 
+    and returns the saved file name.
     
     Parameters:
-        min_lat : minimum latitude (float)
-        min_lon : minimum longitude (float)
-        max_lat : maximum latitude (float)
-        max_lon : maximum longitude (float)
+        min_lat        : minimum latitude (float)
+        min_lon        : minimum longitude (float)
+        max_lat        : maximum latitude (float)
+        max_lon        : maximum longitude (float)
+        stream         : stream the raw response to disk (bool)
+        url            : Overpass API endpoint (string)
+        tiles          : number of tiles per side of the grid (int)
+        workers        : number of concurrent tile downloads (int)
+        output_file    : file name to save the results to (string)
+        cache_dir      : download cache directory (string), or 
+                         None to always download
+        cache_max_size : maximum download cache size in bytes (int)
     
     The default parameters represent a bounding box in 
     Richmond, VA in the United States. Downloaded file 
     size is ~897 MB as of Jan 1, 2020.
+    
+    By default the response is streamed straight to the file 
+    with stream_overpass_query, so memory use stays bounded. 
+    With stream=False, the results are loaded with overpy 
+    and written element by element instead. With more than 
+    one tile, the bounding box is downloaded with 
+    download_tiles, which always streams.
+    
+    Streamed results are kept in a gzipped download cache 
+    keyed by the query, so downloading the same bounding box 
+    again only reads the cached copy.
     """
-    OSM_FILE = "map"
-    api = overpy.Overpass()
-    bounding_box = ", ".join([str(min_lat), str(min_lon), str(max_lat), str(max_lon)])
-    query_str = "".join(["[out:xml];node(", bounding_box, ");out meta;"])
+    OSM_FILE = output_file
+    query_str = node_query(min_lat, min_lon, max_lat, max_lon)
+    
+    if stream or tiles > 1:
+        try:
+            print("Querying Overpass...")
+            if tiles > 1:
+                download_tiles(min_lat, min_lon, max_lat, max_lon, OSM_FILE, tiles, workers, url, 
+                               cache_dir=cache_dir, cache_max_size=cache_max_size)
+            else:
+                fetch_cached_query(query_str, OSM_FILE, url, cache_dir=cache_dir, 
+                                   max_size=cache_max_size)
+        except (urllib.error.URLError, OSError):
+            print("Unable to return query results.")
+            print("Try passing in different parameters for ")
+            print("the bounding box into the function.")
+            return
+        
+        print("Download complete.")
+        
+        return OSM_FILE
+    
+    if overpy is None:
+        raise ImportError("overpy is needed to download with stream=False")
+    
+    api = overpy.Overpass(url=url)
     
     try:
         print("Querying Overpass...")
@@ -36,7 +538,7 @@ def download_xml_data(min_lat=37.3729, min_lon=-77.5999, max_lat=37.7039, max_lo
         return
     
     print("Results retrieved from Overpass.")
-    print("Writing results to map file...")
+    print("Writing results to output file...")
     
     with open(OSM_FILE, "wb") as output:
         output.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
@@ -50,31 +552,247 @@ def download_xml_data(min_lat=37.3729, min_lon=-77.5999, max_lat=37.7039, max_lo
     return OSM_FILE
 
 
-def create_sample_file(input_file, output_file, k=1):
+def write_osm_elements(elements, output_file):
+    """
+    Writes the top level elements to output_file in OSM XML 
+    format, one per line, and returns the number written.
+    """
+    written = 0
+    with open(output_file, "wb") as output:
+        output.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+        output.write(b'<osm>\n  ')
+        for element in elements:
+            element.tail = "\n  "
+            output.write(tostring(element))
+            written += 1
+        output.write(b'</osm>')
+    
+    return written
+
+
+def add_referenced_nodes(sample_file, input_file):
+    """
+    Adds the nodes from input_file that the ways in sample_file 
+    reference, but that are missing from the sample, so every 
+    way in the sample can be resolved to coordinates.
+    
+    Input:    file name of the sample file (string)
+              file name of the file it was sampled from (string)
+    Returns:  number of nodes added (int)
+    
+    The sample is read twice and input_file once, up to its 
+    first way. Nodes are written in input_file order, followed 
+    by the sample's ways and relations.
+    """
+    node_ids = set()
+    refs = set()
+    for element in get_element(sample_file):
+        if element.tag == 'node':
+            node_ids.add(element.attrib['id'])
+        elif element.tag == 'way':
+            refs.update(nd.attrib['ref'] for nd in element.iter('nd'))
+    missing = refs - node_ids
+    
+    def closed_elements():
+        for element in get_element(input_file):
+            if element.tag != 'node':
+                break
+            if element.attrib['id'] in node_ids or element.attrib['id'] in missing:
+                yield element
+        yield from get_element(sample_file, ('way', 'relation'))
+    
+    closed_file = sample_file + ".part"
+    write_osm_elements(closed_elements(), closed_file)
+    os.replace(closed_file, sample_file)
+    
+    return len(missing)
+
+
+def create_sample_file(input_file, output_file, k=1, parser="stdlib", closure=False):
     """
     Writes every k-th top level element from input_file to a 
-    new file (output_file) and returns the new file name.
+    new file (output_file) and returns the new file name. With 
+    closure, the nodes referenced by the sampled ways are 
+    added with add_referenced_nodes.
+    """
+    
+    print("Writing elements to sample file...")
+    
+    elements = get_element(input_file, parser=parser)
+    write_osm_elements((element for i, element in enumerate(elements) if i % k == 0), output_file)
+    if closure:
+        add_referenced_nodes(output_file, input_file)
+    
+    print("Sample file created.")
+    
+    return output_file
+
+
+def create_sample_files(input_file, sample_files, parser="stdlib"):
+    """
+    Writes several stride samples of input_file in a single 
+    pass over it.
+    
+    Input:    file name of the data file (string)
+              dict of k values with the file name of the 
+                  sample of every k-th element 
+                  (ex. {10: "sample10.osm", 100: "sample100.osm"})
+              optional parser for get_element
+    Returns:  the sample_files dict
+    
+    Each sample is identical to the one create_sample_file 
+    writes with the same k.
+    """
+    print("Writing elements to sample files...")
+    
+    outputs = {k: open(sample_file, "wb") for k, sample_file in sample_files.items()}
+    try:
+        for output in outputs.values():
+            output.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+            output.write(b'<osm>\n  ')
+        for i, element in enumerate(get_element(input_file, parser=parser)):
+            element.tail = "\n  "
+            data = None
+            for k, output in outputs.items():
+                if i % k == 0:
+                    if data is None:
+                        data = tostring(element)
+                    output.write(data)
+        for output in outputs.values():
+            output.write(b'</osm>')
+    finally:
+        for output in outputs.values():
+            output.close()
+    
+    print("Sample files created.")
+    
+    return sample_files
+
+
+def random_element_ranges(input_file, fraction, window=1 << 14, seed=None):
+    """
+    Picks a random fraction of the fixed size byte windows of 
+    input_file and returns the byte range of the top level 
+    elements that start inside each picked window.
+    
+    Input:    file name of the OSM XML file (string)
+              fraction of windows to pick (float) 
+              optional window size in bytes (int) 
+              optional random seed
+    Returns:  a list of (start, end) byte offsets in file order
+    
+    Every element starts in exactly one window, so each one 
+    is sampled with probability fraction no matter its size. 
+    Only the picked windows are read, by seeking to them and 
+    resyncing on the next element boundary.
+    """
+    rng = random.Random(seed)
+    ranges = []
+    
+    with open(input_file, 'rb') as f:
+        first = find_element_start(f, 0)
+        if first is None:
+            return ranges
+        data_end = find_data_end(f)
+        windows = (data_end - first + window - 1) // window
+        
+        for i in sorted(rng.sample(range(windows), round(windows * fraction))):
+            low = first + i * window
+            high = min(low + window, data_end)
+            start = find_element_start(f, low)
+            if start is None or start >= high:
+                continue
+            end = find_element_start(f, high)
+            ranges.append((start, data_end if end is None else min(end, data_end)))
+    
+    return ranges
+
+
+def create_random_sample_file(input_file, output_file, fraction=0.01, seed=None, 
+                              window=1 << 14, closure=False):
+    """
+    Writes a random sample of about fraction of the top level 
+    elements of input_file to output_file without parsing the 
+    rest of the file, and returns the new file name.
+    
+    Input:    file name of the OSM XML file (string)
+              file name of the sample file (string) 
+              optional fraction of elements to sample (float) 
+              optional random seed 
+              optional window size in bytes (int) 
+              optional closure (bool), see add_referenced_nodes
+    Returns:  file name of the sample file (string)
+    
+    The sample is made of the windows picked by 
+    random_element_ranges, so elements that are close in the 
+    file are sampled together. Smaller windows give a less 
+    clustered sample at the cost of more seeks. Closure reads 
+    the nodes of input_file again in full.
+    """
+    if is_pbf_file(input_file):
+        raise ValueError("Seek based sampling needs an OSM XML file")
+    
+    print("Writing elements to sample file...")
+    
+    def sampled_elements():
+        for start, end in random_element_ranges(input_file, fraction, window, seed):
+            yield from get_element_range(input_file, start, end)
+    
+    write_osm_elements(sampled_elements(), output_file)
+    if closure:
+        add_referenced_nodes(output_file, input_file)
+    
+    print("Sample file created.")
+    
+    return output_file
+
+
+def create_reservoir_sample_file(input_file, output_file, size, seed=None, parser="stdlib", 
+                                 closure=False):
     """
+    Writes a uniform random sample of exactly size top level 
+    elements (or all of them, if there are fewer) from 
+    input_file to output_file in one pass, and returns the 
+    new file name.
+    
+    Input:    file name of the data file (string)
+              file name of the sample file (string) 
+              number of elements to sample (int) 
+              optional random seed 
+              optional parser for get_element 
+              optional closure (bool), see add_referenced_nodes
+    Returns:  file name of the sample file (string)
     
-    def get_element(input_file, tags=('node', 'way', 'relation')):
-        context = iter(ET.iterparse(input_file, events=('start', 'end')))
-        _, root = next(context)
-        for event, elem in context:
-            if event == 'end' and elem.tag in tags:
-                yield elem
-                root.clear()
+    Only the size elements in the reservoir are kept in 
+    memory, as XML bytes, and they are written in file order.
+    """
+    rng = random.Random(seed)
+    reservoir = []
     
     print("Writing elements to sample file...")
     
+    for i, element in enumerate(get_element(input_file, parser=parser)):
+        if i < size:
+            j = i
+        else:
+            j = rng.randrange(i + 1)
+            if j >= size:
+                continue
+        element.tail = "\n  "
+        if j == len(reservoir):
+            reservoir.append((i, tostring(element)))
+        else:
+            reservoir[j] = (i, tostring(element))
+    
     with open(output_file, "wb") as output:
         output.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
         output.write(b'<osm>\n  ')
-        for i, element in enumerate(get_element(input_file)):
-            if i % k == 0:
-                output.write(ET.tostring(element, encoding='utf-8'))
+        for i, data in sorted(reservoir):
+            output.write(data)
         output.write(b'</osm>')
+    if closure:
+        add_referenced_nodes(output_file, input_file)
     
     print("Sample file created.")
     
     return output_file
-
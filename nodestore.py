@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from array import array
+from collections import namedtuple
+import json
+import os
+
+import numpy as np
+
+from osmindex import iter_start_tags
+from osmpbf import is_pbf_file, iter_blocks
+from osmspatial import COORDINATE_SCALE, NODE_ATTRIBUTE, NODE_START
+
+
+# The store keeps 16 bytes per node: an int64 id and int32 
+# fixed point lat and lon, each column in its own file
+
+STORE_COLUMNS = (("ids", np.int64), ("lats", np.int32), ("lons", np.int32))
+
+NodeStore = namedtuple("NodeStore", ["ids", "lats", "lons"])
+
+
+def store_dir_name(osm_file):
+    """
+    Returns the name of the directory the node store of the 
+    osm_file is kept in (ex. 'map.nodes').
+    """
+    return osm_file + ".nodes"
+
+
+def iter_node_chunks(osm_file, chunk_size=1 << 20):
+    """
+    Reads the id, lat, and lon of every node in the osm_file 
+    and yields them in chunks of up to chunk_size nodes.
+    
+    Input:    file name of the OSM XML or PBF file (string)
+              optional number of nodes per chunk (int)
+    Returns:  generator of (ids, lats, lons) arrays, with
+                  fixed point lats and lons
+    
+    XML files are scanned for node start tags without being 
+    parsed. PBF blocks are decoded with osmpbf.
+    """
+    ids = array('q')
+    lats = array('i')
+    lons = array('i')
+    
+    def chunk():
+        return (
+            np.array(ids, dtype=np.int64), 
+            np.array(lats, dtype=np.int32), 
+            np.array(lons, dtype=np.int32)
+        )
+    
+    if is_pbf_file(osm_file):
+        nodes = (
+            (attrib['id'], attrib['lat'], attrib['lon'])
+            for elements in iter_blocks(osm_file)
+            for element_type, attrib, children in elements
+            if element_type == 'node'
+        )
+    else:
+        nodes = (
+            (attrib.get(b'id'), attrib.get(b'lat'), attrib.get(b'lon'))
+            for attrib in (
+                dict(NODE_ATTRIBUTE.findall(match.group(1)))
+                for offset, match in iter_start_tags(osm_file, NODE_START)
+            )
+        )
+    
+    for node_id, lat, lon in nodes:
+        if lat is None or lon is None:
+            continue
+        ids.append(int(node_id))
+        lats.append(round(float(lat) * COORDINATE_SCALE))
+        lons.append(round(float(lon) * COORDINATE_SCALE))
+        if len(ids) == chunk_size:
+            yield chunk()
+            del ids[:], lats[:], lons[:]
+    
+    if ids:
+        yield chunk()
+
+
+def sort_store_columns(store_dir, count, chunk_size=1 << 20):
+    """
+    Sorts the columns of a node store by id, for files whose 
+    nodes are not already in id order.
+    """
+    paths = {name: os.path.join(store_dir, name + ".bin") for name, dtype in STORE_COLUMNS}
+    ids = np.memmap(paths["ids"], dtype=np.int64, mode='r', shape=(count,))
+    order = np.argsort(ids, kind='stable')
+    del ids
+    
+    for name, dtype in STORE_COLUMNS:
+        column = np.memmap(paths[name], dtype=dtype, mode='r', shape=(count,))
+        sorted_column = np.memmap(paths[name] + ".part", dtype=dtype, mode='w+', shape=(count,))
+        for start in range(0, count, chunk_size):
+            sorted_column[start:start + chunk_size] = column[order[start:start + chunk_size]]
+        sorted_column.flush()
+        del column, sorted_column
+        os.replace(paths[name] + ".part", paths[name])
+
+
+def build_node_store(osm_file, chunk_size=1 << 20):
+    """
+    Writes the id and location of every node in the osm_file 
+    to a node store in one pass.
+    
+    Input:    file name of the OSM XML or PBF file (string)
+              optional number of nodes written at a time (int)
+    Returns:  the node store (NodeStore of memory mapped arrays)
+    
+    Only one chunk of nodes is held in memory while the store 
+    is written. OSM files list nodes in id order, in which case 
+    the store needs no sorting; otherwise the columns are 
+    sorted afterwards, which takes 8 bytes of memory per node.
+    """
+    store_dir = store_dir_name(osm_file)
+    os.makedirs(store_dir, exist_ok=True)
+    files = {name: open(os.path.join(store_dir, name + ".bin"), "wb") for name, dtype in STORE_COLUMNS}
+    
+    count = 0
+    last_id = None
+    in_order = True
+    try:
+        for ids, lats, lons in iter_node_chunks(osm_file, chunk_size):
+            if in_order:
+                in_order = bool(np.all(ids[1:] > ids[:-1])) and (last_id is None or ids[0] > last_id)
+            last_id = ids[-1]
+            files["ids"].write(ids.tobytes())
+            files["lats"].write(lats.tobytes())
+            files["lons"].write(lons.tobytes())
+            count += len(ids)
+    finally:
+        for f in files.values():
+            f.close()
+    
+    if not in_order:
+        sort_store_columns(store_dir, count, chunk_size)
+    
+    stat = os.stat(osm_file)
+    with open(os.path.join(store_dir, "meta.json"), "w") as f:
+        json.dump({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "nodes": count}, f)
+    
+    return load_node_store(osm_file, build=False)
+
+
+def load_node_store(osm_file, build=True):
+    """
+    Memory maps the node store of the osm_file.
+    
+    Input:    file name of the OSM XML or PBF file (string)
+              optional build (bool), to build the store if it
+                  is missing or older than the osm_file
+    Returns:  the node store (NodeStore)
+    """
+    store_dir = store_dir_name(osm_file)
+    try:
+        with open(os.path.join(store_dir, "meta.json")) as f:
+            meta = json.load(f)
+        stat = os.stat(osm_file)
+        current = meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns
+    except (OSError, ValueError, KeyError):
+        current = False
+    
+    if not current:
+        if build:
+            return build_node_store(osm_file)
+        raise ValueError("The node store of {0} is missing or out of date".format(osm_file))
+    
+    count = meta["nodes"]
+    if count == 0:
+        return NodeStore(*(np.empty(0, dtype=dtype) for name, dtype in STORE_COLUMNS))
+    return NodeStore(*(
+        np.memmap(os.path.join(store_dir, name + ".bin"), dtype=dtype, mode='r', shape=(count,))
+        for name, dtype in STORE_COLUMNS
+    ))
+
+
+def node_locations(store, refs):
+    """
+    Looks up the locations of the nodes with the ids in refs.
+    
+    Input:    the node store (NodeStore)
+              node ids (ints or strings)
+    Returns:  lats and lons in degrees (float arrays, NaN for
+                  ids missing from the store) and a boolean 
+                  array of which ids were found
+    """
+    refs = np.asarray(refs, dtype=np.int64)
+    if len(store.ids) == 0:
+        missing = np.full(len(refs), np.nan)
+        return missing, missing.copy(), np.zeros(len(refs), dtype=bool)
+    
+    positions = np.minimum(np.searchsorted(store.ids, refs), len(store.ids) - 1)
+    found = store.ids[positions] == refs
+    lats = store.lats[positions] / COORDINATE_SCALE
+    lons = store.lons[positions] / COORDINATE_SCALE
+    lats[~found] = np.nan
+    lons[~found] = np.nan
+    return lats, lons, found
+
+
+def resolve_ways(store, ways_refs):
+    """
+    Resolves the node refs of many ways at once.
+    
+    Input:    the node store (NodeStore)
+              list of the node ref lists of the ways
+    Returns:  list of (lats, lons) arrays, one per way
+    
+    All the refs are looked up with a single vectorized 
+    search, which is much faster than one search per way.
+    """
+    if not ways_refs:
+        return []
+    
+    lengths = [len(refs) for refs in ways_refs]
+    all_refs = np.fromiter((int(ref) for refs in ways_refs for ref in refs), dtype=np.int64)
+    lats, lons, found = node_locations(store, all_refs)
+    splits = np.cumsum(lengths)[:-1]
+    return list(zip(np.split(lats, splits), np.split(lons, splits)))
+
+
+def way_geometry(store, refs):
+    """
+    Returns the [lat, lon] of each node ref of a way, in the 
+    order of the refs, with None for refs missing from the 
+    store.
+    """
+    lats, lons, found = node_locations(store, refs)
+    return [
+        [lat, lon] if ok else None
+        for lat, lon, ok in zip(lats.tolist(), lons.tolist(), found.tolist())
+    ]
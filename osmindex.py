@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from array import array
+from collections import namedtuple
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from osmpbf import is_pbf_file
+from osmstream import find_data_end
+
+
+# Each indexed element is keyed by its type code in the top 
+# bits and its id plus ID_OFFSET in the rest, so sorting the 
+# keys sorts the elements by type and then id, including the 
+# negative ids of locally edited files
+
+ELEMENT_TYPES = ("node", "way", "relation")
+
+TYPE_SHIFT = 60
+
+ID_OFFSET = 1 << (TYPE_SHIFT - 1)
+
+ID_MASK = (1 << TYPE_SHIFT) - 1
+
+# Saved with each index, so indexes with older keys are rebuilt
+
+KEY_FORMAT = 2
+
+INDEXED_START = re.compile(rb'<(node|way|relation)\s(?:[^>]*?\s)?id="(-?\d+)"')
+
+ELEMENT_TAG = re.compile(rb'<(node|way|relation)\s([^>]*)>')
+
+VERSIONED_ATTRIBUTE = re.compile(rb'\b(id|version)="([^"]*)"')
+
+OsmIndex = namedtuple("OsmIndex", ["keys", "offsets", "lengths"])
+
+
+def element_key(element_type, element_id):
+    """
+    Returns the index key of the element with the type 
+    ('node', 'way', or 'relation') and id.
+    """
+    element_id = int(element_id)
+    if not -ID_OFFSET <= element_id < ID_OFFSET:
+        raise ValueError("Element id {0} is out of range".format(element_id))
+    return (ELEMENT_TYPES.index(element_type) << TYPE_SHIFT) | (element_id + ID_OFFSET)
+
+
+def split_key(key):
+    """
+    Returns the element type and id (int) of an index key, 
+    undoing element_key.
+    """
+    key = int(key)
+    return ELEMENT_TYPES[key >> TYPE_SHIFT], (key & ID_MASK) - ID_OFFSET
+
+
+def index_dir_name(osm_file):
+    """
+    Returns the name of the directory the index of the 
+    osm_file is stored in (ex. 'map.index').
+    """
+    return osm_file + ".index"
+
+
+def iter_start_tags(osm_file, pattern=INDEXED_START, block_size=1 << 24):
+    """
+    Scans the raw bytes of the osm_file for the start tags 
+    matching pattern and yields the byte offset and regex 
+    match of each one, in file order.
+    
+    No XML is parsed, which makes the scan several times 
+    faster than iterating through the file with get_element. 
+    Like osmstream.ELEMENT_START, it relies on '<' always 
+    being escaped inside attribute values.
+    """
+    with open(osm_file, 'rb') as f:
+        position = 0
+        carry = b''
+        while True:
+            block = f.read(block_size)
+            data = carry + block
+            consumed = 0
+            for match in pattern.finditer(data):
+                yield position + match.start(), match
+                consumed = match.end()
+            if not block:
+                break
+            # keeps the end of the data in case a start tag is 
+            # split across two blocks
+            consumed = max(consumed, len(data) - 4096)
+            position += consumed
+            carry = data[consumed:]
+
+
+def scan_element_offsets(osm_file):
+    """
+    Scans the osm_file for the start tags of its top level 
+    nodes, ways, and relations.
+    
+    Input:    file name of the OSM XML file (string)
+    Returns:  keys and byte offsets of the elements in file 
+                  order (arrays of int64)
+    """
+    type_codes = {name.encode(): i << TYPE_SHIFT for i, name in enumerate(ELEMENT_TYPES)}
+    keys = array('q')
+    offsets = array('q')
+    
+    for offset, match in iter_start_tags(osm_file):
+        keys.append(type_codes[match.group(1)] | (int(match.group(2)) + ID_OFFSET))
+        offsets.append(offset)
+    
+    return np.frombuffer(keys, dtype=np.int64), np.frombuffer(offsets, dtype=np.int64)
+
+
+def scan_element_versions(osm_file):
+    """
+    Scans the osm_file for the start tags of its top level 
+    nodes, ways, and relations, including their versions.
+    
+    Input:    file name of the OSM XML file (string)
+    Returns:  keys, versions (-1 where missing), byte offsets, 
+                  and byte lengths of the elements, sorted by key 
+                  (arrays of int64)
+    """
+    type_codes = {name.encode(): i << TYPE_SHIFT for i, name in enumerate(ELEMENT_TYPES)}
+    keys = array('q')
+    versions = array('q')
+    offsets = array('q')
+    
+    for offset, match in iter_start_tags(osm_file, ELEMENT_TAG):
+        attrib = dict(VERSIONED_ATTRIBUTE.findall(match.group(2)))
+        keys.append(type_codes[match.group(1)] | (int(attrib[b'id']) + ID_OFFSET))
+        versions.append(int(attrib.get(b'version', -1)))
+        offsets.append(offset)
+    
+    keys = np.frombuffer(keys, dtype=np.int64)
+    offsets = np.frombuffer(offsets, dtype=np.int64)
+    with open(osm_file, 'rb') as f:
+        lengths = np.diff(offsets, append=find_data_end(f))
+    
+    order = np.argsort(keys, kind='stable')
+    return keys[order], np.frombuffer(versions, dtype=np.int64)[order], offsets[order], lengths[order]
+
+
+def build_index(osm_file):
+    """
+    Builds the byte offset index of every top level node, way, 
+    and relation in the osm_file and saves it next to the file.
+    
+    Input:    file name of the OSM XML file (string)
+    Returns:  the index (OsmIndex of memory mapped arrays)
+    
+    The index is stored as three .npy arrays sorted by key:
+    the keys (int64), byte offsets (int64), and byte lengths 
+    (int32) of the elements, which take 20 bytes per element. 
+    Each length runs up to the start of the next element, so 
+    any element can be read back on its own.
+    """
+    if is_pbf_file(osm_file):
+        raise ValueError("Byte offset indexes need an OSM XML file")
+    
+    keys, offsets = scan_element_offsets(osm_file)
+    with open(osm_file, 'rb') as f:
+        data_end = find_data_end(f)
+    lengths = np.diff(offsets, append=data_end).astype(np.int32)
+    
+    order = np.argsort(keys, kind='stable')
+    index_dir = index_dir_name(osm_file)
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, "keys.npy"), keys[order])
+    np.save(os.path.join(index_dir, "offsets.npy"), offsets[order])
+    np.save(os.path.join(index_dir, "lengths.npy"), lengths[order])
+    
+    stat = os.stat(osm_file)
+    with open(os.path.join(index_dir, "meta.json"), "w") as f:
+        json.dump({
+            "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "elements": len(keys), "key_format": KEY_FORMAT
+        }, f)
+    
+    return load_index(osm_file, build=False)
+
+
+def load_index(osm_file, build=True):
+    """
+    Memory maps the index of the osm_file.
+    
+    Input:    file name of the OSM XML file (string)
+              optional build (bool), to build the index if it
+                  is missing or older than the osm_file
+    Returns:  the index (OsmIndex of memory mapped arrays)
+    """
+    index_dir = index_dir_name(osm_file)
+    try:
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            meta = json.load(f)
+        stat = os.stat(osm_file)
+        current = (
+            meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns and
+            meta.get("key_format") == KEY_FORMAT
+        )
+    except (OSError, ValueError, KeyError):
+        current = False
+    
+    if not current:
+        if build:
+            return build_index(osm_file)
+        raise ValueError("The index of {0} is missing or out of date".format(osm_file))
+    
+    return OsmIndex(*(
+        np.load(os.path.join(index_dir, name + ".npy"), mmap_mode='r')
+        for name in OsmIndex._fields
+    ))
+
+
+def lookup(index, element_type, element_id):
+    """
+    Returns the (offset, length) of the element with the type 
+    and id in the index, or None if it is not indexed.
+    """
+    key = element_key(element_type, element_id)
+    i = int(np.searchsorted(index.keys, key))
+    if i == len(index.keys) or index.keys[i] != key:
+        return None
+    return int(index.offsets[i]), int(index.lengths[i])
+
+
+def get_element(osm_file, element_type, element_id, index=None):
+    """
+    Reads and parses only the element with the type and id 
+    from the osm_file.
+    
+    Input:    file name of the OSM XML file (string)
+              element type ('node', 'way', or 'relation') 
+              element id (int or string) 
+              optional index from load_index
+    Returns:  the ElementTree element, or None if the osm_file
+                  has no such element
+    
+    The index is loaded (and built, the first time) when it 
+    is not passed in. Pass it in when looking up many elements.
+    """
+    if index is None:
+        index = load_index(osm_file)
+    
+    location = lookup(index, element_type, element_id)
+    if location is None:
+        return None
+    
+    offset, length = location
+    with open(osm_file, 'rb') as f:
+        f.seek(offset)
+        return ET.fromstring(f.read(length))
+
+
+def index_ranges(index, n):
+    """
+    Splits the indexed file into at most n byte ranges with 
+    about the same number of bytes, each beginning at the 
+    start of a top level element.
+    
+    Input:    the index (OsmIndex)
+              number of ranges (int)
+    Returns:  a list of (start, end) byte offsets in file order,
+                  which osmstream.get_element_range can parse
+    
+    Unlike osmstream.split_element_ranges, this needs no reads 
+    of the file itself.
+    """
+    if len(index.offsets) == 0:
+        return []
+    
+    order = np.argsort(index.offsets)
+    offsets = np.asarray(index.offsets)[order]
+    data_end = int(offsets[-1] + index.lengths[order[-1]])
+    
+    targets = offsets[0] + (data_end - offsets[0]) * np.arange(n) // n
+    positions = np.minimum(np.searchsorted(offsets, targets), len(offsets) - 1)
+    starts = np.unique(offsets[positions])
+    ends = np.append(starts[1:], data_end)
+    
+    return [(int(start), int(end)) for start, end in zip(starts, ends)]
@@ -0,0 +1,482 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+import lzma
+import os
+import struct
+import time
+import xml.etree.ElementTree as ET
+import zlib
+
+
+# The OSMHeader features this reader can decode. A file 
+# that requires anything else is refused rather than 
+# silently misread.
+
+SUPPORTED_FEATURES = {"OsmSchema-V0.6", "DenseNodes", "HistoricalInformation"}
+
+MEMBER_TYPES = ("node", "way", "relation")
+
+
+def is_pbf_file(osm_file):
+    """
+    Returns True if the osm_file name has the .pbf extension 
+    (ex. 'richmond.osm.pbf').
+    """
+    return str(osm_file).lower().endswith(".pbf")
+
+
+def read_varint(buf, pos):
+    """
+    Decodes the protobuf varint that starts at pos in buf and 
+    returns it with the position just after it.
+    """
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def signed(value):
+    """
+    Returns the two's complement value of a varint decoded 
+    for an int32 or int64 field.
+    """
+    if value >= 1 << 63:
+        return value - (1 << 64)
+    return value
+
+
+def zigzag(value):
+    """
+    Returns the value of a varint decoded for a sint32 or 
+    sint64 field.
+    """
+    return (value >> 1) ^ -(value & 1)
+
+
+def iter_fields(buf):
+    """
+    Iterates through the protobuf message in buf and yields 
+    the field number and value of each field. Varints are 
+    yielded as ints, everything else as bytes.
+    """
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        key, pos = read_varint(buf, pos)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = read_varint(buf, pos)
+        elif wire_type == 2:
+            length, pos = read_varint(buf, pos)
+            value = buf[pos:pos + length]
+            pos += length
+        elif wire_type == 1:
+            value = buf[pos:pos + 8]
+            pos += 8
+        elif wire_type == 5:
+            value = buf[pos:pos + 4]
+            pos += 4
+        else:
+            raise ValueError("Unsupported protobuf wire type: {0}".format(wire_type))
+        yield number, value
+
+
+def packed_varints(buf):
+    """
+    Returns the list of varints in a packed repeated field.
+    """
+    # string ids and small deltas are mostly single byte 
+    # varints, which are just the bytes themselves
+    if not buf or max(buf) < 0x80:
+        return list(buf)
+    
+    values = []
+    value = 0
+    shift = 0
+    for byte in buf:
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            values.append(value)
+            value = 0
+            shift = 0
+        else:
+            shift += 7
+    return values
+
+
+def packed_deltas(buf):
+    """
+    Returns the running sums of a packed, delta coded 
+    sint32 or sint64 field.
+    """
+    return list(accumulate(zigzag(value) for value in packed_varints(buf)))
+
+
+def iter_blobs(osm_file):
+    """
+    Iterates through the fileblocks of the osm_file and yields 
+    the type, byte offset, and size of each blob without 
+    reading the blobs themselves.
+    """
+    with open(osm_file, 'rb') as f:
+        while True:
+            length = f.read(4)
+            if not length:
+                break
+            header = f.read(struct.unpack('>I', length)[0])
+            blob_type = None
+            size = 0
+            for number, value in iter_fields(header):
+                if number == 1:
+                    blob_type = value.decode('utf-8')
+                elif number == 3:
+                    size = value
+            offset = f.tell()
+            yield blob_type, offset, size
+            f.seek(offset + size)
+
+
+def read_blob(osm_file, offset, size):
+    """
+    Reads the blob at offset in the osm_file and returns its 
+    uncompressed data (bytes).
+    """
+    with open(osm_file, 'rb') as f:
+        f.seek(offset)
+        blob = f.read(size)
+    
+    for number, value in iter_fields(blob):
+        if number == 1:
+            return value
+        if number == 3:
+            return zlib.decompress(value)
+        if number == 4:
+            return lzma.decompress(value)
+        if number in (5, 6, 7):
+            raise ValueError("Unsupported PBF blob compression (field {0})".format(number))
+    return b''
+
+
+def check_header(osm_file, offset, size):
+    """
+    Raises a ValueError if the OSMHeader blob at offset requires 
+    a feature this reader does not support.
+    """
+    for number, value in iter_fields(read_blob(osm_file, offset, size)):
+        if number == 4:
+            feature = value.decode('utf-8')
+            if feature not in SUPPORTED_FEATURES:
+                raise ValueError("Unsupported PBF feature: {0}".format(feature))
+
+
+def format_coordinate(nanodegrees):
+    """
+    Formats a coordinate in nanodegrees with the 7 decimal 
+    places used by OSM XML (ex. '-77.2956150').
+    """
+    units = (nanodegrees + 50) // 100
+    sign = "-" if units < 0 else ""
+    units = abs(units)
+    return "{0}{1}.{2:07d}".format(sign, units // 10000000, units % 10000000)
+
+
+def format_timestamp(milliseconds):
+    """
+    Formats a timestamp in milliseconds since the epoch the 
+    way OSM XML does (ex. '2019-02-01T12:00:00Z').
+    """
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(milliseconds // 1000))
+
+
+def decode_info(buf, strings, date_granularity):
+    """
+    Returns the version, timestamp, changeset, uid, user, and 
+    visible attributes of an Info message as a dict.
+    """
+    fields = {}
+    for number, value in iter_fields(buf):
+        fields[number] = value
+    
+    attrib = {}
+    if 1 in fields:
+        attrib['version'] = str(signed(fields[1]))
+    if 2 in fields:
+        attrib['timestamp'] = format_timestamp(signed(fields[2]) * date_granularity)
+    if 3 in fields:
+        attrib['changeset'] = str(signed(fields[3]))
+    if fields.get(5):
+        attrib['uid'] = str(signed(fields[4]) if 4 in fields else 0)
+        attrib['user'] = strings[fields[5]]
+    if 6 in fields:
+        attrib['visible'] = 'true' if fields[6] else 'false'
+    return attrib
+
+
+def decode_tags(keys, vals, strings):
+    """
+    Returns the tag children of an element from its packed 
+    key and value string ids.
+    """
+    return [
+        ("tag", {'k': strings[k], 'v': strings[v]})
+        for k, v in zip(packed_varints(keys), packed_varints(vals))
+    ]
+
+
+def decode_dense_nodes(buf, strings, block):
+    """
+    Decodes a DenseNodes message into a list of node tuples.
+    """
+    fields = {}
+    for number, value in iter_fields(buf):
+        fields[number] = value
+    
+    ids = packed_deltas(fields.get(1, b''))
+    lats = packed_deltas(fields.get(8, b''))
+    lons = packed_deltas(fields.get(9, b''))
+    keys_vals = [signed(value) for value in packed_varints(fields.get(10, b''))]
+    
+    info = {}
+    for number, value in iter_fields(fields.get(5, b'')):
+        if number == 1:
+            info['version'] = [signed(v) for v in packed_varints(value)]
+        elif number in (2, 3, 4, 5):
+            info[number] = packed_deltas(value)
+        elif number == 6:
+            info['visible'] = packed_varints(value)
+    
+    nodes = []
+    position = 0
+    for i, node_id in enumerate(ids):
+        attrib = {
+            'id': str(node_id), 
+            'lat': format_coordinate(block['lat_offset'] + block['granularity'] * lats[i]), 
+            'lon': format_coordinate(block['lon_offset'] + block['granularity'] * lons[i])
+        }
+        if 'version' in info:
+            attrib['version'] = str(info['version'][i])
+        if 2 in info:
+            attrib['timestamp'] = format_timestamp(info[2][i] * block['date_granularity'])
+        if 3 in info:
+            attrib['changeset'] = str(info[3][i])
+        if 5 in info and info[5][i]:
+            attrib['uid'] = str(info[4][i]) if 4 in info else '0'
+            attrib['user'] = strings[info[5][i]]
+        if 'visible' in info:
+            attrib['visible'] = 'true' if info['visible'][i] else 'false'
+        
+        # the keys and values of all nodes are stored together, 
+        # with a 0 marking the end of each node's tags
+        tags = []
+        while position < len(keys_vals) and keys_vals[position] != 0:
+            tags.append(("tag", {
+                'k': strings[keys_vals[position]], 
+                'v': strings[keys_vals[position + 1]]
+            }))
+            position += 2
+        position += 1
+        
+        nodes.append(("node", attrib, tags))
+    return nodes
+
+
+def decode_node(buf, strings, block):
+    """
+    Decodes a (non-dense) Node message into a node tuple.
+    """
+    fields = {}
+    for number, value in iter_fields(buf):
+        fields[number] = value
+    
+    attrib = {
+        'id': str(zigzag(fields.get(1, 0))), 
+        'lat': format_coordinate(block['lat_offset'] + block['granularity'] * zigzag(fields.get(8, 0))), 
+        'lon': format_coordinate(block['lon_offset'] + block['granularity'] * zigzag(fields.get(9, 0)))
+    }
+    attrib.update(decode_info(fields.get(4, b''), strings, block['date_granularity']))
+    return ("node", attrib, decode_tags(fields.get(2, b''), fields.get(3, b''), strings))
+
+
+def decode_way(buf, strings, block):
+    """
+    Decodes a Way message into a way tuple.
+    """
+    fields = {}
+    for number, value in iter_fields(buf):
+        fields[number] = value
+    
+    attrib = {'id': str(signed(fields.get(1, 0)))}
+    attrib.update(decode_info(fields.get(4, b''), strings, block['date_granularity']))
+    children = [("nd", {'ref': str(ref)}) for ref in packed_deltas(fields.get(8, b''))]
+    children.extend(decode_tags(fields.get(2, b''), fields.get(3, b''), strings))
+    return ("way", attrib, children)
+
+
+def decode_relation(buf, strings, block):
+    """
+    Decodes a Relation message into a relation tuple.
+    """
+    fields = {}
+    for number, value in iter_fields(buf):
+        fields[number] = value
+    
+    attrib = {'id': str(signed(fields.get(1, 0)))}
+    attrib.update(decode_info(fields.get(4, b''), strings, block['date_granularity']))
+    roles = packed_varints(fields.get(8, b''))
+    refs = packed_deltas(fields.get(9, b''))
+    types = packed_varints(fields.get(10, b''))
+    children = [
+        ("member", {'type': MEMBER_TYPES[member_type], 'ref': str(ref), 'role': strings[role]})
+        for member_type, ref, role in zip(types, refs, roles)
+    ]
+    children.extend(decode_tags(fields.get(2, b''), fields.get(3, b''), strings))
+    return ("relation", attrib, children)
+
+
+def decode_block(osm_file, offset, size):
+    """
+    Reads and decodes the PrimitiveBlock blob at offset in 
+    the osm_file.
+    
+    Input:    file name of the PBF file (string)
+              byte offset and size of the blob (ints)
+    Returns:  a list of (element type, attributes, children)
+                  tuples in file order, where the children are 
+                  (child tag, attributes) tuples
+    
+    The tuples are plain Python objects, so they can be 
+    decoded in a worker process and sent back cheaply.
+    """
+    data = read_blob(osm_file, offset, size)
+    
+    strings = []
+    groups = []
+    block = {'granularity': 100, 'lat_offset': 0, 'lon_offset': 0, 'date_granularity': 1000}
+    for number, value in iter_fields(data):
+        if number == 1:
+            strings = [s.decode('utf-8') for n, s in iter_fields(value) if n == 1]
+        elif number == 2:
+            groups.append(value)
+        elif number == 17:
+            block['granularity'] = value
+        elif number == 18:
+            block['date_granularity'] = value
+        elif number == 19:
+            block['lat_offset'] = signed(value)
+        elif number == 20:
+            block['lon_offset'] = signed(value)
+    
+    decoders = {1: decode_node, 3: decode_way, 4: decode_relation}
+    elements = []
+    for group in groups:
+        for number, value in iter_fields(group):
+            if number == 2:
+                elements.extend(decode_dense_nodes(value, strings, block))
+            elif number in decoders:
+                elements.append(decoders[number](value, strings, block))
+    return elements
+
+
+def iter_data_blobs(osm_file):
+    """
+    Checks the OSMHeader of the osm_file and yields the byte 
+    offset and size of each OSMData blob.
+    """
+    for blob_type, offset, size in iter_blobs(osm_file):
+        if blob_type == "OSMHeader":
+            check_header(osm_file, offset, size)
+        elif blob_type == "OSMData":
+            yield offset, size
+
+
+def iter_blocks(osm_file, workers=None):
+    """
+    Decodes the blocks of the osm_file and yields each one's 
+    list of element tuples in file order.
+    
+    Input:    file name of the PBF file (string)
+              optional number of worker processes
+                  (the number of CPUs by default)
+    Returns:  generator of lists of element tuples
+    
+    With more than one worker, the blocks are decoded in 
+    parallel and at most two blocks per worker are in flight, 
+    so memory use stays bounded however large the file is.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    blobs = iter_data_blobs(osm_file)
+    
+    if workers <= 1:
+        for offset, size in blobs:
+            yield decode_block(osm_file, offset, size)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for offset, size in blobs:
+            pending.append(executor.submit(decode_block, osm_file, offset, size))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def build_element(element_type, attrib, children):
+    """
+    Builds an ElementTree element from an element tuple, 
+    indented the same way as the elements of an OSM XML file.
+    
+    The decoders put the attributes in the order of the 
+    Overpass XML (id, lat, lon, version, timestamp, 
+    changeset, uid, user), so an element written back out 
+    as XML is the same as in the downloaded file.
+    """
+    element = ET.Element(element_type, attrib)
+    if children:
+        element.text = "\n    "
+        for child_tag, child_attrib in children:
+            ET.SubElement(element, child_tag, child_attrib).tail = "\n    "
+        element[-1].tail = "\n  "
+    element.tail = "\n  "
+    return element
+
+
+def get_pbf_element(osm_file, tags=('node', 'way', 'relation'), workers=None):
+    """
+    Iterates through the PBF osm_file and yields each top level 
+    element whose tag is in tags as an ElementTree element, 
+    the same stream get_element yields for an XML file.
+    
+    Input:    file name of the PBF file (string)
+              optional tuple of top level tags to yield 
+              optional number of worker processes
+    Returns:  generator of ElementTree elements
+    """
+    for elements in iter_blocks(osm_file, workers):
+        for element_type, attrib, children in elements:
+            if element_type in tags:
+                yield build_element(element_type, attrib, children)
+
+
+def iter_pbf_tags(osm_file, workers=None):
+    """
+    Iterates through the PBF osm_file and yields the element 
+    type, element id, key, and value of every tag without 
+    building any elements.
+    """
+    for elements in iter_blocks(osm_file, workers):
+        for element_type, attrib, children in elements:
+            for child_tag, child_attrib in children:
+                if child_tag == "tag":
+                    yield (element_type, attrib['id'], child_attrib['k'], child_attrib['v'])
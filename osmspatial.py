@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from array import array
+from collections import namedtuple
+import json
+import math
+import os
+import re
+
+import numpy as np
+
+from osmindex import iter_start_tags
+from osmpbf import is_pbf_file
+
+
+# Coordinates are stored as fixed point int32 values in units 
+# of 1e-7 degrees, the precision of OSM XML
+
+COORDINATE_SCALE = 10 ** 7
+
+EARTH_RADIUS = 6371008.8
+
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+NODE_START = re.compile(rb'<node\s([^>]*)>')
+
+NODE_ATTRIBUTE = re.compile(rb'\b(id|lat|lon)="([^"]*)"')
+
+SpatialIndex = namedtuple("SpatialIndex", ["grid", "cell_starts", "ids", "lats", "lons", "offsets"])
+
+
+def spatial_dir_name(osm_file):
+    """
+    Returns the name of the directory the spatial index of 
+    the osm_file is stored in (ex. 'map.spatial').
+    """
+    return osm_file + ".spatial"
+
+
+def scan_node_locations(osm_file):
+    """
+    Scans the osm_file for the start tags of its nodes.
+    
+    Input:    file name of the OSM XML file (string)
+    Returns:  ids and byte offsets (arrays of int64) and fixed
+                  point lats and lons (arrays of int32) of the 
+                  nodes in file order
+    """
+    ids = array('q')
+    offsets = array('q')
+    lats = array('i')
+    lons = array('i')
+    
+    for offset, match in iter_start_tags(osm_file, NODE_START):
+        attrib = dict(NODE_ATTRIBUTE.findall(match.group(1)))
+        if b'lat' not in attrib or b'lon' not in attrib:
+            continue
+        ids.append(int(attrib[b'id']))
+        offsets.append(offset)
+        lats.append(round(float(attrib[b'lat']) * COORDINATE_SCALE))
+        lons.append(round(float(attrib[b'lon']) * COORDINATE_SCALE))
+    
+    return (
+        np.frombuffer(ids, dtype=np.int64), np.frombuffer(offsets, dtype=np.int64), 
+        np.frombuffer(lats, dtype=np.int32), np.frombuffer(lons, dtype=np.int32)
+    )
+
+
+def cell_ids(grid, lats, lons):
+    """
+    Returns the grid cell of each fixed point coordinate, 
+    numbered row by row from the grid's south west corner.
+    """
+    rows = (lats - grid["min_lat"]) // grid["cell_size"]
+    cols = (lons - grid["min_lon"]) // grid["cell_size"]
+    return rows * grid["cols"] + cols
+
+
+def build_spatial_index(osm_file, cell_size=0.01):
+    """
+    Buckets every node of the osm_file into a grid of square 
+    cells and saves the grid next to the file.
+    
+    Input:    file name of the (cleaned) OSM XML file (string)
+              optional cell size in degrees (float)
+    Returns:  the spatial index (SpatialIndex)
+    
+    The nodes are stored sorted by cell, with the start of 
+    each cell's nodes in cell_starts, so the nodes of a row 
+    of neighbouring cells are one contiguous slice. The 
+    default cells are about 1 km across.
+    """
+    if is_pbf_file(osm_file):
+        raise ValueError("Spatial indexes need an OSM XML file")
+    
+    ids, offsets, lats, lons = scan_node_locations(osm_file)
+    size = max(1, round(cell_size * COORDINATE_SCALE))
+    if len(ids):
+        min_lat, min_lon = int(lats.min()), int(lons.min())
+        rows = (int(lats.max()) - min_lat) // size + 1
+        cols = (int(lons.max()) - min_lon) // size + 1
+    else:
+        min_lat = min_lon = 0
+        rows = cols = 1
+    grid = {"min_lat": min_lat, "min_lon": min_lon, "cell_size": size, "rows": rows, "cols": cols}
+    
+    cells = cell_ids(grid, lats.astype(np.int64), lons.astype(np.int64))
+    order = np.argsort(cells, kind='stable')
+    cell_starts = np.searchsorted(cells[order], np.arange(rows * cols + 1)).astype(np.int64)
+    
+    spatial_dir = spatial_dir_name(osm_file)
+    os.makedirs(spatial_dir, exist_ok=True)
+    np.save(os.path.join(spatial_dir, "cell_starts.npy"), cell_starts)
+    np.save(os.path.join(spatial_dir, "ids.npy"), ids[order])
+    np.save(os.path.join(spatial_dir, "lats.npy"), lats[order])
+    np.save(os.path.join(spatial_dir, "lons.npy"), lons[order])
+    np.save(os.path.join(spatial_dir, "offsets.npy"), offsets[order])
+    
+    stat = os.stat(osm_file)
+    grid.update({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+    with open(os.path.join(spatial_dir, "grid.json"), "w") as f:
+        json.dump(grid, f)
+    
+    return load_spatial_index(osm_file, build=False)
+
+
+def load_spatial_index(osm_file, build=True, cell_size=0.01):
+    """
+    Memory maps the spatial index of the osm_file.
+    
+    Input:    file name of the OSM XML file (string)
+              optional build (bool), to build the index if it
+                  is missing or older than the osm_file
+              optional cell size in degrees for a new index
+    Returns:  the spatial index (SpatialIndex)
+    """
+    spatial_dir = spatial_dir_name(osm_file)
+    try:
+        with open(os.path.join(spatial_dir, "grid.json")) as f:
+            grid = json.load(f)
+        stat = os.stat(osm_file)
+        current = grid["size"] == stat.st_size and grid["mtime_ns"] == stat.st_mtime_ns
+    except (OSError, ValueError, KeyError):
+        current = False
+    
+    if not current:
+        if build:
+            return build_spatial_index(osm_file, cell_size)
+        raise ValueError("The spatial index of {0} is missing or out of date".format(osm_file))
+    
+    return SpatialIndex(grid, *(
+        np.load(os.path.join(spatial_dir, name + ".npy"), mmap_mode='r')
+        for name in SpatialIndex._fields[1:]
+    ))
+
+
+def bbox_positions(index, min_lat, min_lon, max_lat, max_lon):
+    """
+    Returns the positions in the index arrays of the nodes 
+    inside the bounding box (in degrees).
+    """
+    grid = index.grid
+    low = [round(min_lat * COORDINATE_SCALE), round(min_lon * COORDINATE_SCALE)]
+    high = [round(max_lat * COORDINATE_SCALE), round(max_lon * COORDINATE_SCALE)]
+    
+    first_row = max(0, (low[0] - grid["min_lat"]) // grid["cell_size"])
+    last_row = min(grid["rows"] - 1, (high[0] - grid["min_lat"]) // grid["cell_size"])
+    first_col = max(0, (low[1] - grid["min_lon"]) // grid["cell_size"])
+    last_col = min(grid["cols"] - 1, (high[1] - grid["min_lon"]) // grid["cell_size"])
+    if first_row > last_row or first_col > last_col:
+        return np.empty(0, dtype=np.int64)
+    
+    # the cells of each row of the box are one slice of the 
+    # sorted nodes, from the first cell's start to the end of 
+    # the last cell
+    slices = [
+        np.arange(index.cell_starts[row * grid["cols"] + first_col], 
+                  index.cell_starts[row * grid["cols"] + last_col + 1])
+        for row in range(first_row, last_row + 1)
+    ]
+    positions = np.concatenate(slices)
+    
+    lats = index.lats[positions]
+    lons = index.lons[positions]
+    inside = (lats >= low[0]) & (lats <= high[0]) & (lons >= low[1]) & (lons <= high[1])
+    return positions[inside]
+
+
+def distances(index, positions, lat, lon):
+    """
+    Returns the great circle distances in meters from 
+    (lat, lon) to the nodes at the positions.
+    """
+    lats = np.radians(index.lats[positions] / COORDINATE_SCALE)
+    lons = np.radians(index.lons[positions] / COORDINATE_SCALE)
+    lat, lon = math.radians(lat), math.radians(lon)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def radius_bbox(lat, lon, radius):
+    """
+    Returns the bounding box (in degrees) that contains the 
+    circle of radius meters around (lat, lon).
+    """
+    dlat = radius / METERS_PER_DEGREE
+    dlon = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-12))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+def query_bbox(index, min_lat, min_lon, max_lat, max_lon):
+    """
+    Finds the nodes inside the bounding box.
+    
+    Input:    the spatial index (SpatialIndex)
+              bounding box (floats)
+    Returns:  ids and byte offsets of the nodes (int64 arrays)
+    """
+    positions = bbox_positions(index, min_lat, min_lon, max_lat, max_lon)
+    return index.ids[positions], index.offsets[positions]
+
+
+def query_radius(index, lat, lon, radius):
+    """
+    Finds the nodes within radius meters of (lat, lon), 
+    nearest first.
+    
+    Input:    the spatial index (SpatialIndex)
+              latitude and longitude (floats) 
+              radius in meters (float)
+    Returns:  ids, byte offsets, and distances in meters of
+                  the nodes (arrays)
+    """
+    positions = bbox_positions(index, *radius_bbox(lat, lon, radius))
+    meters = distances(index, positions, lat, lon)
+    within = meters <= radius
+    positions, meters = positions[within], meters[within]
+    order = np.argsort(meters, kind='stable')
+    return index.ids[positions[order]], index.offsets[positions[order]], meters[order]
+
+
+def query_nearest(index, lat, lon, k=1):
+    """
+    Finds the k nodes nearest to (lat, lon).
+    
+    Input:    the spatial index (SpatialIndex)
+              latitude and longitude (floats) 
+              optional number of nodes (int)
+    Returns:  ids, byte offsets, and distances in meters of
+                  the nodes, nearest first (arrays)
+    
+    The search box grows until it holds k nodes and the k-th 
+    nearest of them is closer than any node outside the box 
+    could be. A k of 0 or less finds no nodes, the same empty 
+    arrays query_radius returns.
+    """
+    if k <= 0:
+        return index.ids[:0], index.offsets[:0], np.empty(0)
+    
+    grid = index.grid
+    cell = grid["cell_size"] / COORDINATE_SCALE
+    total = len(index.ids)
+    reach = cell
+    
+    while True:
+        bbox = (lat - reach, lon - reach, lat + reach, lon + reach)
+        positions = bbox_positions(index, *bbox)
+        covers_all = len(positions) == total
+        if len(positions) >= k or covers_all:
+            meters = distances(index, positions, lat, lon)
+            order = np.argsort(meters, kind='stable')[:k]
+            # any node outside the box is at least this far away
+            cleared = reach * METERS_PER_DEGREE * min(1, math.cos(math.radians(min(abs(lat) + reach, 90))))
+            if covers_all or meters[order[-1]] <= cleared:
+                positions = positions[order]
+                return index.ids[positions], index.offsets[positions], meters[order]
+        reach *= 2
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import re
+import xml.etree.ElementTree as ET
+from xml.parsers import expat
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+from osmpbf import get_pbf_element, is_pbf_file, iter_pbf_tags
+
+
+def get_element(osm_file, tags=('node', 'way', 'relation'), parser="stdlib"):
+    """
+    Iterates through the osm_file and yields each complete 
+    top level element whose tag is in tags.
+    
+    Input:    file name of the data file (string)
+              optional tuple of top level tags to yield
+              optional parser, "stdlib" or "lxml"
+    Returns:  generator of ElementTree (or lxml) elements
+    
+    Elements are yielded on their end event, so all of their 
+    child tags have been parsed no matter where the parser's 
+    read buffer happens to end. The root is cleared after each 
+    yielded element, so memory use stays bounded by the size 
+    of a single top level element rather than the whole file.
+    
+    A .pbf osm_file is always decoded by osmpbf, which yields 
+    the same ElementTree elements whatever the parser.
+    """
+    if is_pbf_file(osm_file):
+        yield from get_pbf_element(osm_file, tags)
+        return
+    if parser == "lxml":
+        yield from get_lxml_element(osm_file, tags)
+        return
+    if parser != "stdlib":
+        raise ValueError("Unknown element parser: {0}".format(parser))
+    
+    context = iter(ET.iterparse(osm_file, events=('start', 'end')))
+    _, root = next(context)
+    for event, elem in context:
+        if event == 'end' and elem.tag in tags:
+            yield elem
+            root.clear()
+
+
+def get_lxml_element(osm_file, tags=('node', 'way', 'relation')):
+    """
+    Iterates through the osm_file with lxml and yields each 
+    complete top level element whose tag is in tags.
+    
+    lxml only reports the end events of the requested tags, 
+    and each element is removed from the tree along with 
+    everything before it once it has been yielded.
+    """
+    if lxml_etree is None:
+        raise ImportError("lxml is not installed")
+    
+    for event, elem in lxml_etree.iterparse(osm_file, events=('end',), tag=tags):
+        yield elem
+        elem.clear(keep_tail=True)
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+def tostring(element):
+    """
+    Returns the UTF-8 XML bytes of an element yielded by 
+    get_element with either parser.
+    """
+    if isinstance(element, ET.Element):
+        return ET.tostring(element, encoding='utf-8')
+    return lxml_etree.tostring(element, encoding='utf-8', xml_declaration=False)
+
+
+def iter_tags(osm_file, parser="expat"):
+    """
+    Iterates through the osm_file and yields the element 
+    type, element id, key, and value of every tag of each 
+    top level node, way, and relation.
+    
+    Input:    file name of the data file (string)
+              optional parser, "expat", "stdlib", or "lxml"
+    Returns:  generator of (element type, id, k, v) tuples
+    
+    The expat parser never builds an element, which makes 
+    it the fastest choice for work that only reads tags, 
+    such as the audits. A .pbf osm_file is decoded by osmpbf 
+    without building elements either.
+    """
+    if is_pbf_file(osm_file):
+        yield from iter_pbf_tags(osm_file)
+        return
+    if parser == "expat":
+        yield from scan_tags(osm_file)
+        return
+    
+    for element in get_element(osm_file, parser=parser):
+        element_type = element.tag
+        element_id = element.attrib.get('id')
+        for tag in element.iter("tag"):
+            yield (element_type, element_id, tag.attrib['k'], tag.attrib['v'])
+
+
+def scan_tags(osm_file, block_size=1 << 16):
+    """
+    Scans the osm_file with pyexpat and yields an (element 
+    type, id, k, v) tuple for every tag of each top level 
+    node, way, and relation without building any elements.
+    """
+    scanner = expat.ParserCreate()
+    top_level = ('node', 'way', 'relation')
+    found = []
+    current = [None, None]
+    
+    def start_element(name, attrs):
+        if name == 'tag':
+            if current[0] is not None:
+                found.append((current[0], current[1], attrs['k'], attrs['v']))
+        elif name in top_level:
+            current[0] = name
+            current[1] = attrs.get('id')
+    
+    def end_element(name):
+        if name in top_level:
+            current[0] = None
+    
+    scanner.StartElementHandler = start_element
+    scanner.EndElementHandler = end_element
+    
+    with open(osm_file, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            scanner.Parse(block, not block)
+            yield from found
+            del found[:]
+            if not block:
+                break
+
+
+# A top level element starts wherever one of these start tags 
+# appears in the file, since '<' is always escaped inside 
+# attribute values
+
+ELEMENT_START = re.compile(rb'<(?:node|way|relation)[\s/>]')
+
+
+def find_element_start(f, offset, block_size=1 << 16):
+    """
+    Returns the byte offset of the first top level element 
+    that starts at or after offset in the open binary file f, 
+    or None if no element starts after offset.
+    """
+    f.seek(offset)
+    position = offset
+    overlap = b''
+    
+    while True:
+        block = f.read(block_size)
+        if not block:
+            return None
+        data = overlap + block
+        match = ELEMENT_START.search(data)
+        if match:
+            return position - len(overlap) + match.start()
+        # keeps enough of the block to match a start tag 
+        # split across two blocks
+        overlap = data[-10:]
+        position += len(block)
+
+
+def find_data_end(f):
+    """
+    Returns the byte offset of the closing </osm> tag in the 
+    open binary file f (or the file size if it is missing).
+    """
+    size = f.seek(0, os.SEEK_END)
+    f.seek(max(0, size - 4096))
+    position = f.read().rfind(b'</osm>')
+    if position == -1:
+        return size
+    return max(0, size - 4096) + position
+
+
+def split_element_ranges(osm_file, n):
+    """
+    Splits the osm_file into at most n byte ranges that each 
+    begin at the start of a top level element.
+    
+    Input:    file name of the data file (string)
+              number of ranges (int)
+    Returns:  a list of (start, end) byte offsets in file order
+    
+    Together the ranges cover every top level element once, 
+    so each range can be parsed with get_element_range 
+    independently of the others.
+    """
+    with open(osm_file, 'rb') as f:
+        first = find_element_start(f, 0)
+        if first is None:
+            return []
+        data_end = find_data_end(f)
+        
+        starts = [first]
+        for i in range(1, n):
+            start = find_element_start(f, max(first, data_end * i // n))
+            if start is None or start >= data_end:
+                break
+            if start > starts[-1]:
+                starts.append(start)
+    
+    return list(zip(starts, starts[1:] + [data_end]))
+
+
+def get_element_range(osm_file, start, end, tags=('node', 'way', 'relation'), block_size=1 << 16):
+    """
+    Parses only the bytes from start to end of the osm_file 
+    and yields each complete top level element whose tag is 
+    in tags, the same way get_element does for a whole file.
+    
+    Input:    file name of the data file (string)
+              start and end byte offsets from split_element_ranges 
+              optional tuple of top level tags to yield
+    Returns:  generator of cElementTree elements
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    parser.feed(b'<osm>')
+    root = None
+    
+    def read_elements():
+        nonlocal root
+        for event, elem in parser.read_events():
+            if root is None:
+                root = elem
+            elif event == 'end' and elem.tag in tags:
+                yield elem
+                root.clear()
+    
+    with open(osm_file, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            parser.feed(block)
+            yield from read_elements()
+    
+    parser.feed(b'</osm>')
+    parser.close()
+    yield from read_elements()
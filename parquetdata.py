@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import shutil
+import tempfile
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from osmstream import get_element
+
+
+# Keys, values, roles, and element types repeat constantly, 
+# so they are dictionary encoded both in memory and on disk
+
+DICTIONARY_STRING = pa.dictionary(pa.int32(), pa.string())
+
+TABLE_SCHEMAS = {
+    "nodes": pa.schema([
+        ("id", pa.int64()), ("lat", pa.float64()), ("lon", pa.float64()), 
+        ("version", pa.int32()), ("timestamp", pa.timestamp("s", tz="UTC"))
+    ]), 
+    "way_nodes": pa.schema([
+        ("way_id", pa.int64()), ("seq", pa.int32()), ("node_id", pa.int64())
+    ]), 
+    "relation_members": pa.schema([
+        ("relation_id", pa.int64()), ("seq", pa.int32()), ("member_type", DICTIONARY_STRING), 
+        ("member_id", pa.int64()), ("role", DICTIONARY_STRING)
+    ]), 
+    "tags": pa.schema([
+        ("id", pa.int64()), ("k", DICTIONARY_STRING), ("v", DICTIONARY_STRING)
+    ])
+}
+
+ELEMENT_TYPES = ("node", "way", "relation")
+
+
+def parse_int(value):
+    """
+    Returns value as an int, or None if it is missing.
+    """
+    return None if value is None else int(value)
+
+
+def to_batch(name, columns):
+    """
+    Builds a record batch of the table name from its buffered 
+    columns (a dict of lists).
+    """
+    schema = TABLE_SCHEMAS[name]
+    arrays = []
+    for field in schema:
+        values = columns[field.name]
+        if field.type == DICTIONARY_STRING:
+            arrays.append(pa.array(values, pa.string()).dictionary_encode())
+        elif pa.types.is_timestamp(field.type):
+            arrays.append(pc.strptime(pa.array(values, pa.string()), format="%Y-%m-%dT%H:%M:%SZ", unit="s")
+                          .cast(field.type))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def is_parquet_export(output_dir):
+    """
+    Returns True if output_dir is missing, empty, or holds 
+    only the datasets of an earlier export_parquet.
+    """
+    if not os.path.exists(output_dir):
+        return True
+    return os.path.isdir(output_dir) and set(os.listdir(output_dir)) <= set(TABLE_SCHEMAS)
+
+
+def export_parquet(osm_file, output_dir, batch_size=500000, parser="stdlib"):
+    """
+    Converts the osm_file into Parquet datasets in one pass.
+    
+    Input:    file name of the OSM XML or PBF file, or of a
+                  clean_data output (string)
+              name of the output directory (string) 
+              optional number of rows per row group (int) 
+              optional parser for get_element
+    Returns:  name of the output directory (string)
+    
+    The output directory gets one dataset per table:
+        nodes            : id, lat, lon, version, timestamp 
+        way_nodes        : way_id, seq, node_id 
+        relation_members : relation_id, seq, member_type,
+                           member_id, role
+        tags             : id, k, v, partitioned by
+                           element_type (ex. tags/element_type=way)
+    
+    Rows are buffered and written batch_size at a time, so 
+    memory use stays bounded however large the osm_file is. 
+    Read a dataset back with load_table.
+    
+    The datasets are written to a temporary directory next 
+    to output_dir, which then replaces any earlier export in 
+    output_dir. Any other non-empty output_dir raises a 
+    ValueError rather than being overwritten.
+    """
+    if not is_parquet_export(output_dir):
+        raise ValueError("{0} is not empty and is not an export_parquet output directory".format(output_dir))
+    
+    work_dir = tempfile.mkdtemp(prefix=".parquet-", dir=os.path.dirname(os.path.abspath(output_dir)))
+    
+    # each dataset part is written by its own writer, with 
+    # the tags partitioned into one part per element type
+    
+    parts = [("nodes", None), ("way_nodes", None), ("relation_members", None)]
+    parts.extend(("tags", element_type) for element_type in ELEMENT_TYPES)
+    buffers = {part: {field.name: [] for field in TABLE_SCHEMAS[part[0]]} for part in parts}
+    writers = {}
+    
+    def flush(part):
+        name, element_type = part
+        columns = buffers[part]
+        if not columns[TABLE_SCHEMAS[name][0].name]:
+            return
+        if part not in writers:
+            path = os.path.join(work_dir, name)
+            if element_type is not None:
+                path = os.path.join(path, "element_type=" + element_type)
+            os.makedirs(path, exist_ok=True)
+            writers[part] = pq.ParquetWriter(
+                os.path.join(path, "part-0.parquet"), TABLE_SCHEMAS[name], compression="zstd")
+        writers[part].write_batch(to_batch(name, columns))
+        for values in columns.values():
+            del values[:]
+    
+    def append(part, *row):
+        columns = buffers[part]
+        for values, value in zip(columns.values(), row):
+            values.append(value)
+        if len(columns[TABLE_SCHEMAS[part[0]][0].name]) >= batch_size:
+            flush(part)
+    
+    print("Writing Parquet datasets...")
+    
+    try:
+        for element in get_element(osm_file, parser=parser):
+            attrib = element.attrib
+            element_id = int(attrib['id'])
+            
+            if element.tag == "node":
+                append(("nodes", None), element_id, float(attrib['lat']), float(attrib['lon']), 
+                       parse_int(attrib.get('version')), attrib.get('timestamp'))
+            elif element.tag == "way":
+                for seq, nd in enumerate(element.iter("nd")):
+                    append(("way_nodes", None), element_id, seq, int(nd.attrib['ref']))
+            elif element.tag == "relation":
+                for seq, member in enumerate(element.iter("member")):
+                    append(("relation_members", None), element_id, seq, member.attrib['type'], 
+                           int(member.attrib['ref']), member.attrib.get('role', ''))
+            
+            for tag in element.iter("tag"):
+                append(("tags", element.tag), element_id, tag.attrib['k'], tag.attrib['v'])
+        
+        for part in parts:
+            flush(part)
+    except BaseException:
+        for writer in writers.values():
+            writer.close()
+        shutil.rmtree(work_dir)
+        raise
+    
+    for writer in writers.values():
+        writer.close()
+    
+    if os.path.exists(output_dir):
+        # the earlier export is moved aside before it is 
+        # removed, so output_dir is never left half written
+        old_dir = work_dir + ".old"
+        os.replace(output_dir, old_dir)
+        os.replace(work_dir, output_dir)
+        shutil.rmtree(old_dir)
+    else:
+        os.replace(work_dir, output_dir)
+    
+    print("Parquet datasets created.")
+    
+    return output_dir
+
+
+def load_table(output_dir, name, columns=None, filters=None):
+    """
+    Reads one of the datasets written by export_parquet.
+    
+    Input:    name of the export_parquet output directory
+              table name ('nodes', 'way_nodes',
+                  'relation_members', or 'tags')
+              optional list of columns to read 
+              optional pyarrow filters
+                  (ex. [("k", "in", ["addr:city"])])
+    Returns:  pyarrow Table (empty if the dataset is missing)
+    
+    The keys and values of the tags table stay dictionary 
+    encoded, so table.to_pandas() gives categorical columns.
+    """
+    path = os.path.join(output_dir, name)
+    if not os.path.exists(path):
+        schema = TABLE_SCHEMAS[name]
+        if name == "tags":
+            schema = schema.append(pa.field("element_type", DICTIONARY_STRING))
+        return schema.empty_table() if columns is None else schema.empty_table().select(columns)
+    
+    partitioning = "hive" if name == "tags" else None
+    return pq.read_table(path, columns=columns, filters=filters, partitioning=partitioning, memory_map=True)
@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from functools import lru_cache
+
+
+# Valid street suffixes and abbreviation mappings sourced from: 
+# USPS - C1 Street Suffix Abbreviations 
+# https://pe.usps.com/text/pub28/28apc_002.htm
+
+USPS_EXPECTED = frozenset([
+    "Alley", "Anex", "Arcade", "Avenue", "Bayou", "Beach", "Bend", "Bluff", "Bluffs", "Bottom", "Boulevard", "Branch", 
+    "Bridge", "Brook", "Brooks", "Burg", "Burgs", "Bypass", "Camp", "Canyon", "Cape", "Causeway", "Center", "Centers", 
+    "Circle", "Cliff", "Cliffs", "Club", "Common", "Commons", "Corner", "Corners", "Course", "Court", "Courts", 
+    "Cove", "Coves", "Creek", "Crescent", "Crest", "Crossing", "Crossroad", "Crossroads", "Curve", "Dale", "Dam", 
+    "Divide", "Drive", "Drives", "Estate", "Estates", "Expressway", "Extension", "Extensions", "Falls", "Ferry", 
+    "Field", "Fields", "Flat", "Flats", "Ford", "Fords", "Forest", "Forge", "Forges", "Fork", "Forks", "Fort", 
+    "Freeway", "Garden", "Gateway", "Glen", "Glens", "Green", "Greens", "Grove", "Groves", "Harbor", "Harbors", "Haven", 
+    "Heights", "Highway", "Hill", "Hills", "Hollow", "Inlet", "Island", "Islands", "Isle", "Junction", "Junctions", 
+    "Key", "Keys", "Knoll", "Knolls", "Lake", "Lakes", "Landing", "Lane", "Light", "Lights", "Loaf", "Lock", "Locks", 
+    "Lodge", "Loop", "Manor", "Manors", "Meadows", "Mill", "Mills", "Mission", "Motorway", "Mount", "Mountain", 
+    "Mountains", "Neck", "Orchard", "Oval", "Overpass", "Park", "Parks", "Parkway", "Parkways", "Passage", "Path", 
+    "Pike", "Pine", "Pines", "Place", "Plain", "Plains", "Plaza", "Point", "Points", "Port", "Ports", "Prairie", 
+    "Radial", "Ranch", "Rapid", "Rapids", "Rest", "Ridge", "Ridges", "River", "Road", "Roads", "Route", "Shoal", "Shoals", 
+    "Shore", "Shores", "Skyway", "Spring", "Square", "Squares", "Station", "Stravenue", "Stream", "Street", "Streets", 
+    "Summit", "Terrace", "Throughway", "Trace", "Track", "Trafficway", "Trail", "Trailer", "Tunnel", "Turnpike", 
+    "Underpass", "Union", "Unions", "Valley", "Valleys", "Viaduct", "View", "Views", "Village", "Villages", "Ville", 
+    "Vista", "Way", "Well", "Wells"
+])
+
+# These additional expected street suffixes are assumed 
+# to be acceptable for data cleaning purposes
+
+ADDL_EXPECTED = frozenset([
+    "Arsenal", "Cary", "Chase", "Cloisters", "Close", "Conn", "Concourse", 
+    "Driveway", "Farm", "Greene", "James", "Level", "Mews", "Needle", 
+    "Oaks", "Overlook", "Pass", "Pathway", "Ramon", "Row", "Run", 
+    "Sage", "Slip", "Trek", "Turn", "Walk", "Waye"
+])
+
+STREET_TYPE_MAPPING = {
+    "Allee": "Alley", "Ally": "Alley", "Aly": "Alley", "Allee.": "Alley", "Ally.": "Alley", "Aly.": "Alley", 
+    "Annex": "Anex", "Annx": "Anex", "Anx": "Anex", "Annex.": "Anex", "Annx.": "Anex", "Anx.": "Anex", 
+    "Arc": "Arcade", "Arc.": "Arcade", 
+    "Av": "Avenue", "Ave": "Avenue", "Aven": "Avenue", "Avenu": "Avenue", "Avn": "Avenue", "Avnue": "Avenue", 
+    "Av.": "Avenue", "Ave.": "Avenue", "Aven.": "Avenue", "Avenu.": "Avenue", "Avn.": "Avenue", "Avnue.": "Avenue", 
+    "Bayoo": "Bayou", "Byu": "Bayou", "Bayoo.": "Bayou", "Byu.": "Bayou", 
+    "Bch": "Beach", "Bch.": "Beach", 
+    "Bnd": "Bend", "Bnd.": "Bend", 
+    "Blf": "Bluff", "Bluf": "Bluff", "Blfs": "Bluffs", "Blfs.": "Bluffs", 
+    "Bot": "Bottom", "Btm": "Bottom", "Bottm": "Bottom", "Bot.": "Bottom", "Btm.": "Bottom", "Bottm.": "Bottom", 
+    "Blvd": "Boulevard", "Boul": "Boulevard", "Boulv": "Boulevard", 
+    "Blvd.": "Boulevard", "Boul.": "Boulevard", "Boulv.": "Boulevard", 
+    "Br": "Branch", "Brnch": "Branch", "Br.": "Branch", "Brnch.": "Branch", 
+    "Brdge": "Bridge", "Brg": "Bridge", "Brdge.": "Bridge", "Brg.": "Bridge", 
+    "Brk": "Brook", "Brk.": "Brook", "Brks": "Brooks", "Brks.": "Brooks", 
+    "Bg": "Burg", "Bg.": "Burg", "Bgs": "Burgs", "Bgs.": "Burgs", 
+    "Byp": "Bypass", "Bypa": "Bypass", "Bypas": "Bypass", "Byps": "Bypass", 
+    "Byp.": "Bypass", "Bypa.": "Bypass", "Bypas.": "Bypass", "Byps.": "Bypass", 
+    "Cp": "Camp", "Cmp": "Camp", "Cp.": "Camp", "Cmp.": "Camp", 
+    "Canyn": "Canyon", "Cnyn": "Canyon", "Cyn": "Canyon", "Canyn.": "Canyon", "Cnyn.": "Canyon", "Cyn.": "Canyon", 
+    "Cpe": "Cape", "Cpe.": "Cape", 
+    "Causwa": "Causeway", "Cswy": "Causeway", 
+    "Cen": "Center", "Cent": "Center", "Centr": "Center", "Centre": "Center", 
+    "Cnter": "Center", "Cntr": "Center", "Ctr": "Center", 
+    "Cen.": "Center", "Cent.": "Center", "Centr.": "Center", "Centre.": "Center", 
+    "Cnter.": "Center", "Cntr.": "Center", "Ctr.": "Center", "Ctrs": "Centers", "Ctrs.": "Centers", 
+    "Cir": "Circle", "Circ": "Circle", "Circl": "Circle", "Crcl": "Circle", "Crcle": "Circle", 
+    "Cir.": "Circle", "Circ.": "Circle", "Circl.": "Circle", "Crcl.": "Circle", "Crcle.": "Circle", 
+    "Cirs": "Circle", "Cirs.": "Circle", 
+    "Clf": "Cliff", "Clf.": "Cliff", "Clfs": "Cliffs", "Clfs.": "Cliffs", 
+    "Clb": "Club", "Clb.": "Club", 
+    "Cmn": "Common", "Cmn.": "Common", "Cmns": "Commons", "Cmns.": "Commons", 
+    "Cor": "Corner", "Cor.": "Corner", "Cors": "Corners", "Cors.": "Corners", 
+    "Crse": "Course", "Crse.": "Course", 
+    "Ct": "Court", "Ct.": "Court", "Cts": "Courts", "Cts.": "Courts", 
+    "Cv": "Cove", "Cv.": "Cove", "Cvs": "Coves", "Cvs.": "Coves", 
+    "Crk": "Creek", "Crk.": "Creek", 
+    "Cres": "Crescent", "Crsent": "Crescent", "Crsnt": "Crescent", 
+    "Cres.": "Crescent", "Crsent.": "Crescent", "Crsnt.": "Crescent", 
+    "Crst": "Crest", "Crst.": "Crest", 
+    "Crssng": "Crossing", "Xing": "Crossing", "Crssng.": "Crossing", "Xing.": "Crossing", 
+    "Xrd": "Crossroad", "Xrd.": "Crossroad", "Xrds": "Crossroads", "Xrds.": "Crossroads", 
+    "Curv": "Curve", "Curv.": "Curve", 
+    "Dl": "Dale", "Dl.": "Dale", 
+    "Dm": "Dam", "Dm.": "Dam", 
+    "Div": "Divide", "Dv": "Divide", "Dvd": "Divide", "Div.": "Divide", "Dv.": "Divide", "Dvd.": "Divide", 
+    "Dr": "Drive", "Driv": "Drive", "Drv": "Drive", "Dr.": "Drive", "Driv.": "Drive", "Drv.": "Drive", 
+    "Drs": "Drives", "Drs.": "Drives", 
+    "Est": "Estate", "Est.": "Estate", "Ests": "Estates", "Ests.": "Estates", 
+    "Exp": "Expressway", "Expr": "Expressway", "Express": "Expressway", "Expw": "Expressway", "Expy": "Expressway", 
+    "Exp.": "Expressway", "Expr.": "Expressway", "Express.": "Expressway", "Expw.": "Expressway", "Expy.": "Expressway", 
+    "Ext": "Extension", "Extn": "Extension", "Extnsn": "Extension", 
+    "Ext.": "Extension", "Extn.": "Extension", "Extnsn.": "Extension", 
+    "Exts": "Extensions", "Exts.": "Extensions", 
+    "Fls": "Falls", "Fls.": "Falls", 
+    "Fry": "Ferry", "Frry": "Ferry", "Fry.": "Ferry", "Frry.": "Ferry", 
+    "Fld": "Field", "Fld.": "Field", "Flds": "Fields", "Flds.": "Fields", 
+    "Flt": "Flat", "Flt.": "Flat", "Flts": "Flats", "Flts.": "Flats", 
+    "Frd": "Ford", "Frd.": "Ford", "Frds": "Fords", "Frds.": "Fords", 
+    "Forests": "Forest", "Frst": "Forest", "Forests.": "Forest", "Frst.": "Forest", 
+    "Forg": "Forge", "Frg": "Forge", "Forg.": "Forge", "Frg.": "Forge", "Frgs": "Forges", "Frgs.": "Forges", 
+    "Frk": "Fork", "Frk.": "Fork", "Frks.": "Forks", "Frks.": "Forks", 
+    "Frt": "Fort", "Ft": "Fort", "Frt.": "Fort", "Ft.": "Fort", 
+    "Freewy": "Freeway", "Frway": "Freeway", "Frwy": "Freeway", "Fwy": "Freeway", 
+    "Freewy.": "Freeway", "Frway.": "Freeway", "Frwy.": "Freeway", "Fwy.": "Freeway", 
+    "Gardn": "Garden", "Grden": "Garden", "Grdn": "Garden", "Gdn": "Garden", 
+    "Gardn.": "Garden", "Grden.": "Garden", "Grdn.": "Garden", "Gdn.": "Garden", 
+    "Gdns": "Garden", "Grdns": "Garden", "Gdns.": "Garden", "Grdns.": "Garden", 
+    "Gatewy": "Gateway", "Gatway": "Gateway", "Gtway": "Gateway", "Gtwy": "Gateway", 
+    "Gatewy.": "Gateway", "Gatway.": "Gateway", "Gtway.": "Gateway", "Gtwy.": "Gateway", 
+    "Gln": "Glen", "Gln.": "Glen", "Glns": "Glens", "Glns.": "Glens", 
+    "Grn": "Green", "Grn.": "Green", "Grns": "Greens", "Grns.": "Greens", 
+    "Grov": "Grove", "Grv": "Grove", "Grov.": "Grove", "Grv.": "Grove", "Grvs": "Groves", "Grvs.": "Groves", 
+    "Harb": "Harbor", "Harbr": "Harbor", "Hbr": "Harbor", "Hrbor": "Harbor", 
+    "Harb.": "Harbor", "Harbr.": "Harbor", "Hbr.": "Harbor", "Hrbor.": "Harbor", "Hbrs": "Harbors", "Hbrs.": "Harbors", 
+    "Hvn": "Haven", "Hvn.": "Haven", 
+    "Ht": "Heights", "Hts": "Heights", "Ht.": "Heights", "Hts.": "Heights", 
+    "Highwy": "Highway", "Hiway": "Highway", "Hiwy": "Highway", "Hway": "Highway", "Hwy": "Highway", 
+    "Highwy.": "Highway", "Hiway.": "Highway", "Hiwy.": "Highway", "Hway.": "Highway", "Hwy.": "Highway", 
+    "Hl": "Hill", "Hl.": "Hill", "Hls": "Hills", "Hls.": "Hills", 
+    "Hllw": "Hollow", "Hollows": "Hollow", "Holw": "Hollow", "Holws": "Hollow", 
+    "Hllw.": "Hollow", "Hollows.": "Hollow", "Holw.": "Hollow", "Holws.": "Hollow", 
+    "Inlt": "Inlet", "Inlt.": "Inlet", 
+    "Is": "Island", "Islnd": "Island", "Is.": "Island", "Islnd.": "Island", 
+    "Iss": "Islands", "Islnds": "Islands", "Iss.": "Islands", "Islnds.": "Islands", 
+    "Isles": "Isle", "Isles.": "Isle", 
+    "Jct": "Junction", "Jction": "Junction", "Jctn": "Junction", "Junctn": "Junction", "Juncton": "Junction", 
+    "Jct.": "Junction", "Jction.": "Junction", "Jctn.": "Junction", "Junctn.": "Junction", "Juncton.": "Junction", 
+    "Jctns": "Junctions", "Jcts": "Junctions", "Jctns.": "Junctions", "Jcts.": "Junctions", 
+    "Ky": "Key", "Ky.": "Key", "Kys": "Keys", "Kys.": "Keys", 
+    "Knl": "Knoll", "Knol": "Knoll", "Knl.": "Knoll", "Knol.": "Knoll", "Knls": "Knolls", "Knls.": "Knolls", 
+    "Lk": "Lake", "Lk.": "Lake", "Lks": "Lakes", "Lks.": "Lakes", 
+    "Lndg": "Landing", "Lndng": "Landing", "Lndg.": "Landing", "Lndng.": "Landing", 
+    "Ln": "Lane", "Ln.": "Lane", 
+    "Lgt": "Light", "Lgt.": "Light", "Lgts": "Lights", "Lgts.": "Lights", 
+    "Lf": "Loaf", "Lf.": "Loaf", 
+    "Lck": "Lock", "Lck.": "Lock", "Lcks": "Locks", "Lcks.": "Locks", 
+    "Ldg": "Lodge", "Ldge": "Lodge", "Lodg": "Lodge", "Ldg.": "Lodge", "Ldge.": "Lodge", "Lodg.": "Lodge", 
+    "Loops": "Loop", "Loops.": "Loop", 
+    "Mnr": "Manor", "Mnr.": "Manor", "Mnrs": "Manors", "Mnrs.": "Manors", 
+    "Mdw": "Meadows", "Mdws": "Meadows", "Medows": "Meadows", "Mdw.": "Meadows", "Mdws.": "Meadows", "Medows.": "Meadows", 
+    "Ml": "Mill", "Ml.": "Mill", "Mls": "Mills", "Mls.": "Mills", 
+    "Missn": "Mission", "Mssn": "Mission", "Msn": "Mission", "Missn.": "Mission", "Mssn.": "Mission", "Msn.": "Mission", 
+    "Mtwy": "Motorway", "Mtwy.": "Motorway", 
+    "Mnt": "Mount", "Mt": "Mount", "Mnt.": "Mount", "Mt.": "Mount", 
+    "Mntain": "Mountain", "Mntn": "Mountain", "Mountin": "Mountain", "Mtin": "Mountain", "Mtn": "Mountain", 
+    "Mntain.": "Mountain", "Mntn.": "Mountain", "Mountin.": "Mountain", "Mtin.": "Mountain", "Mtn.": "Mountain", 
+    "Mntns": "Mountains", "Mtns": "Mountains", "Mntns.": "Mountains", "Mtns.": "Mountains", 
+    "Nck": "Neck", "Nck.": "Neck", 
+    "Orch": "Orchard", "Orchrd": "Orchard", "Orch.": "Orchard", "Orchrd.": "Orchard", 
+    "Ovl": "Oval", "Ovl.": "Oval", 
+    "Opas": "Overpass", "Opas.": "Overpass", 
+    "Prk": "Park", "Prk.": "Park", "Prks": "Parks", "Prks.": "Parks", 
+    "Parkwy": "Parkway", "Pkway": "Parkway", "Pkwy": "Parkway", "Pky": "Parkway", 
+    "Parkwy.": "Parkway", "Pkway.": "Parkway", "Pkwy.": "Parkway", "Pky.": "Parkway", 
+    "Pkwys": "Parkways", "Pkwys.": "Parkways", 
+    "Psge": "Passage", "Psge.": "Passage", 
+    "Paths": "Path", "Paths.": "Path", 
+    "Pikes": "Pike", "Pikes.": "Pike", 
+    "Pne": "Pine", "Pne.": "Pine", "Pnes": "Pines", "Pnes.": "Pines", 
+    "Pl": "Place", "Pl.": "Place", 
+    "Pln": "Plain", "Pln.": "Plain", "Plns": "Plains", "Plns.": "Plains", 
+    "Plz": "Plaza", "Plza": "Plaza", "Plz.": "Plaza", "Plza.": "Plaza", 
+    "Pt": "Point", "Pt.": "Point", "Pts": "Points", "Pts.": "Points", 
+    "Prt": "Port", "Prt.": "Port", "Prts": "Ports", "Prts.": "Ports", 
+    "Pr": "Prairie", "Prr": "Prairie", "Pr.": "Prairie", "Prr.": "Prairie", 
+    "Rad": "Radial", "Radiel": "Radial", "Radl": "Radial", "Rad.": "Radial", "Radiel.": "Radial", "Radl.": "Radial", 
+    "Ranches": "Ranch", "Rnch": "Ranch", "Rnchs": "Ranch", "Ranches.": "Ranch", "Rnch.": "Ranch", "Rnchs.": "Ranch", 
+    "Rpd": "Rapid", "Rpd.": "Rapid", "Rpds": "Rapids", "Rpds.": "Rapids", 
+    "Rst": "Rest", "Rst.": "Rest", 
+    "Rdg": "Ridge", "Rdge": "Ridge", "Rdg.": "Ridge", "Rdge.": "Ridge", 
+    "Rdgs": "Ridges", "Rdges": "Ridges", "Rdgs.": "Ridge", "Rdges.": "Ridges", 
+    "Riv": "River", "Rvr": "River", "Rivr": "River", "Riv.": "River", "Rvr.": "River", "Rivr.": "River", 
+    "Rd": "Road", "Rd.": "Road", "Rds": "Roads", "Rds.": "Roads", 
+    "Rte": "Route", "Rte.": "Route", 
+    "Shl": "Shoal", "Shl.": "Shoal", "Shls": "Shoals", "Shls.": "Shoals", 
+    "Shoar": "Shore", "Shr": "Shore", "Shoar.": "Shore", "Shr.": "Shore", 
+    "Shoars": "Shores", "Shrs": "Shores", "Shoars.": "Shores", "Shrs.": "Shores", 
+    "Skwy": "Skyway", "Skwy.": "Skyway", 
+    "Spg": "Spring", "Spng": "Spring", "Sprng": "Spring", "Spg.": "Spring", "Spng.": "Spring", "Sprng.": "Spring", 
+    "Spgs": "Spring", "Spngs": "Spring", "Sprngs": "Spring", "Spgs.": "Spring", "Spngs.": "Spring", "Sprngs.": "Spring", 
+    "Sq": "Square", "Sqr": "Square", "Sqre": "Square", "Squ": "Square", 
+    "Sq.": "Square", "Sqr.": "Square", "Sqre.": "Square", "Squ.": "Square", 
+    "Sqs": "Squares", "Sqrs": "Squares", "Sqs.": "Squares", "Sqrs.": "Squares", 
+    "Sta": "Station", "Statn": "Station", "Stn": "Station", "Sta.": "Station", "Statn.": "Station", "Stn.": "Station", 
+    "Stra": "Stravenue", "Strav": "Stravenue", "Straven": "Stravenue", 
+    "Stravn": "Stravenue", "Strvn": "Stravenue", "Strvnue": "Stravenue", 
+    "Stra.": "Stravenue", "Strav.": "Stravenue", "Straven.": "Stravenue", 
+    "Stravn.": "Stravenue", "Strvn.": "Stravenue", "Strvnue.": "Stravenue", 
+    "Streme": "Stream", "Strm": "Stream", "Streme.": "Stream", "Strm.": "Stream", 
+    "St": "Street", "Strt": "Street", "Str": "Street", "St.": "Street", "Strt.": "Street", "Str.": "Street", 
+    "Sts": "Streets", "Sts.": "Streets", 
+    "Smt": "Summit", "Sumit": "Summit", "Sumitt": "Summit", "Smt.": "Summit", "Sumit.": "Summit", "Sumitt.": "Summit", 
+    "Ter": "Terrace", "Terr": "Terrace", "Ter.": "Terrace", "Terr.": "Terrace", 
+    "Trwy": "Throughway", "Trwy.": "Throughway", 
+    "Trce": "Trace", "Traces": "Trace", "Trce.": "Trace", "Traces.": "Trace", 
+    "Tracks": "Track", "Trak": "Track", "Trk": "Track", "Trks": "Track", 
+    "Tracks.": "Track", "Trak.": "Track", "Trk.": "Track", "Trks.": "Track", 
+    "Trfy": "Trafficway", "Trfy.": "Trafficway", 
+    "Trails": "Trail", "Trl": "Trail", "Trls": "Trail", "Trails.": "Trail", "Trl.": "Trail", "Trls.": "Trail", 
+    "Trlr": "Trailer", "Trlrs": "Trailer", "Trlr.": "Trailer", "Trlrs.": "Trailer", 
+    "Tunel": "Tunnel", "Tunl": "Tunnel", "Tunls": "Tunnel", "Tunnels": "Tunnel", "Tunnl": "Tunnel", 
+    "Tunel.": "Tunnel", "Tunl.": "Tunnel", "Tunls.": "Tunnel", "Tunnels.": "Tunnel", "Tunnl.": "Tunnel", 
+    "Trnpk": "Turnpike", "Turnpk": "Turnpike", "Tpke": "Turnpike", 
+    "Trnpk.": "Turnpike", "Turnpk.": "Turnpike", "Tpke.": "Turnpike", 
+    "Upas": "Underpass", "Upas.": "Underpass", 
+    "Un": "Union", "Un.": "Union", "Uns": "Unions", "Uns.": "Unions", 
+    "Vally": "Valley", "Vlly": "Valley", "Vly": "Valley", "Vally.": "Valley", "Vlly.": "Valley", "Vly.": "Valley", 
+    "Vallys": "Valleys", "Vllys": "Valleys", "Vlys": "Valleys", 
+    "Vallys.": "Valleys", "Vllys.": "Valleys", "Vlys.": "Valleys", 
+    "Vdct": "Viaduct", "Via": "Viaduct", "Viadct": "Viaduct", "Vdct.": "Viaduct", "Via.": "Viaduct", "Viadct.": "Viaduct", 
+    "Vw": "View", "Vw.": "View", "Vws": "Views", "Vws.": "Views", 
+    "Vill": "Village", "Villag": "Village", "Villg": "Village", "Villiage": "Village", "Vlg": "Village", 
+    "Vill.": "Village", "Villag.": "Village", "Villg.": "Village", "Villiage.": "Village", "Vlg.": "Village", 
+    "Vills": "Villages", "Villags": "Villages", "Villgs": "Villages", "Villiages": "Villages", "Vlgs": "Villages", 
+    "Vills.": "Villages", "Villags.": "Villages", "Villgs.": "Villages", "Villiages.": "Villages", "Vlgs.": "Villages", 
+    "Vl": "Ville", "Vl.": "Ville", 
+    "Vis": "Vista", "Vist": "Vista", "Vst": "Vista", "Vsta": "Vista", 
+    "Vis.": "Vista", "Vist.": "Vista", "Vst.": "Vista", "Vsta.": "Vista", 
+    "Wy": "Way", "Wy.": "Way", 
+    "Wl": "Well", "Wl.": "Well", "Wls": "Wells", "Wls.": "Wells"
+}
+
+# While STREET_TYPE_MAPPING can be applied to any US address 
+# from the OpenStreetMap database, ADDL_STREET_TYPE_MAPPING 
+# applies specifically to certain data cleaning 
+# purposes within this dataset
+
+ADDL_STREET_TYPE_MAPPING = {
+    "I-95" : "Interstate 95", "Roademergency=yes" : "Road"
+}
+
+# The direction suffix allows the audit and cleaning to look at the 
+# second to the last string in the addr:street value 
+# for any unexpected street types to clean
+
+DIRECTION_SUFFIX = frozenset([
+    "N", "N.", "N*", "North", 
+    "S", "S.", "S*", "South", 
+    "E", "E.", "E*", "East", 
+    "W", "W.", "W*", "West"
+])
+
+EXPECTED_STREET_TYPES = USPS_EXPECTED | ADDL_EXPECTED
+
+# Direction abbreviations found as the prefix or the suffix 
+# of an addr:street value and the full direction strings 
+# they are expanded to
+
+DIRECTION_MAPPING = {
+    "N" : "North", "N." : "North", "N*" : "North", 
+    "S" : "South", "S." : "South", "S*" : "South", 
+    "E" : "East", "E." : "East", "E*" : "East", 
+    "W" : "West", "W." : "West", "W*" : "West"
+}
+
+DIRECTION_ABBRVS = frozenset(DIRECTION_MAPPING)
+
+SUITE_WORDS = frozenset(["Suite", "Ste", "Ste."])
+
+# The same few thousand street names repeat across millions 
+# of address tags, so whole street values are memoized up to 
+# STREET_CACHE_SIZE distinct names
+
+STREET_CACHE_SIZE = 65536
+
+
+def street_type_position(words):
+    """
+    Returns the position of the street type in the words 
+    of a street name, skipping a trailing direction suffix.
+    """
+    if words[-1] in DIRECTION_SUFFIX:
+        return -2
+    return -1
+
+
+@lru_cache(maxsize=STREET_CACHE_SIZE)
+def unexpected_street_type(street_name):
+    """
+    Returns the street type of street_name if it is not 
+    an expected street type, otherwise None.
+    """
+    words = street_name.split(" ")
+    street_type = words[street_type_position(words)]
+    
+    if street_type in EXPECTED_STREET_TYPES:
+        return None
+    return street_type
+
+
+@lru_cache(maxsize=STREET_CACHE_SIZE)
+def update_street_type(street_name):
+    """
+    Returns street_name with its street type replaced 
+    based on STREET_TYPE_MAPPING or ADDL_STREET_TYPE_MAPPING 
+    when the street type is not expected.
+    """
+    words = street_name.split(" ")
+    position = street_type_position(words)
+    
+    if words[position] not in EXPECTED_STREET_TYPES:
+        if words[position] in STREET_TYPE_MAPPING:
+            words[position] = STREET_TYPE_MAPPING[words[position]]
+        elif words[position] in ADDL_STREET_TYPE_MAPPING:
+            words[position] = ADDL_STREET_TYPE_MAPPING[words[position]]
+    
+    return " ".join(words)
+
+
+@lru_cache(maxsize=STREET_CACHE_SIZE)
+def street_directions(street_name):
+    """
+    Returns a tuple of the abbreviated direction prefix and 
+    suffix of street_name (None for either one it lacks).
+    
+    A direction suffix that follows the word or abbreviation 
+    for 'Suite' (ex. 'Suite E') is not a street direction.
+    """
+    words = street_name.split(" ")
+    prefix = words[0] if words[0] in DIRECTION_ABBRVS else None
+    suffix = None
+    if len(words) > 1 and words[-1] in DIRECTION_ABBRVS and words[-2] not in SUITE_WORDS:
+        suffix = words[-1]
+    
+    return (prefix, suffix)
+
+
+@lru_cache(maxsize=STREET_CACHE_SIZE)
+def update_direction(street_name):
+    """
+    Returns street_name with an abbreviated direction 
+    prefix or suffix expanded based on DIRECTION_MAPPING.
+    """
+    prefix, suffix = street_directions(street_name)
+    if prefix is None and suffix is None:
+        return street_name
+    
+    words = street_name.split(" ")
+    if prefix is not None:
+        words[0] = DIRECTION_MAPPING[prefix]
+    if suffix is not None:
+        words[-1] = DIRECTION_MAPPING[suffix]
+    
+    return " ".join(words)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from osmfiles import write_osm_file
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: times an implementation against the one it replaced (run with -s for the numbers)"
+    )
+
+
+@pytest.fixture(scope="session")
+def osm_file(tmp_path_factory):
+    """
+    A synthetic OSM file with 5,000 nodes.
+    """
+    return write_osm_file(str(tmp_path_factory.mktemp("osm") / "small.osm"), 5000)
+
+
+@pytest.fixture(scope="session")
+def large_osm_file(tmp_path_factory):
+    """
+    A synthetic OSM file with 50,000 nodes, for the benchmarks.
+    """
+    return write_osm_file(str(tmp_path_factory.mktemp("osm") / "large.osm"), 50000, seed=2)
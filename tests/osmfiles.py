@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import calendar
+import random
+import struct
+import time
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import quoteattr
+import zlib
+
+
+# Tag values of the generated files, with the abbreviations and 
+# misspellings the audits report and the cleaning rules fix
+
+GENERATED_TAGS = [
+    (0.4, "addr:street", ["Main St", "N Broad St.", "Cary Street", "Monument Ave", "W Grace St", 
+                          "Patterson Ave E", "Parham Rd", "I-95", "Broad Rock Blvd Ste. E", 
+                          "S Laburnum Ave", "Chamberlayne Pkwy", "Oddball Xyz"]), 
+    (0.3, "addr:city", ["Richmond", "richmond", "Glen Allen", "glen Allen", "Midolthian", "Manakin Sabot"]), 
+    (0.2, "addr:state", ["VA", "Virginia", "Va", "va", "NC"]), 
+    (0.05, "is_in:state_code", ["VA", "Virginia", "NC"]), 
+    (0.1, "addr:country", ["US", "USA", "United States", "CA"]), 
+    (0.2, "addr:postcode", ["23220", "23220-1234", "23111;23112", "27000", "23834"]), 
+    (0.1, "tiger:zip_left", ["23220", "23220-1234", "27000"]), 
+    (0.1, "maxspeed", ["25", "25 mph", "35 mph", "45"]), 
+    (0.05, "gnis:county_id", ["087", "041", "760"]), 
+    (0.05, "gnis:County_num", ["087", "041", "760"]), 
+    (0.05, "gnis:county_name", ["Henrico", "Chesterfield", "Richmond (city)"]), 
+    (0.05, "gnis:County", ["Henrico", "Chesterfield", "Richmond (city)"]), 
+    (0.05, "denomination", ["nondenominational", "baptist", "None", "united_methodist"]), 
+    (0.05, "religion", ["Christian", "christian", "jewish"]), 
+    (0.2, "tiger:name_base", ["Foo & <Bar>", "Broad"]), 
+    (0.1, "tiger:name_base:1", ["X"]), 
+    (0.2, "name", ["Some é place", "Other place"]), 
+    (0.05, "name:en", ["Place"])
+]
+
+
+def random_tags(rng):
+    """
+    Returns a shuffled list of (key, value) tags drawn from 
+    GENERATED_TAGS.
+    """
+    tags = [(key, rng.choice(values)) for p, key, values in GENERATED_TAGS if rng.random() < p]
+    rng.shuffle(tags)
+    return tags
+
+
+def write_tags(f, tags):
+    for k, v in tags:
+        f.write('    <tag k={0} v={1}/>\n'.format(quoteattr(k), quoteattr(v)))
+
+
+def write_osm_file(osm_file, n, seed=1):
+    """
+    Writes a synthetic OSM file with n nodes, n // 5 ways, and 
+    n // 50 + 1 relations, and returns its file name.
+    """
+    rng = random.Random(seed)
+    
+    with open(osm_file, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="tests">\n')
+        f.write('  <bounds minlat="37.3" minlon="-77.6" maxlat="37.7" maxlon="-77.2"/>\n')
+        for i in range(1, n + 1):
+            # the attributes are in the order Overpass writes them
+            attrs = 'id="{0}" lat="{1:.7f}" lon="{2:.7f}" version="{3}" timestamp="2019-0{4}-01T12:00:00Z" ' \
+                    'changeset="{5}" uid="{6}" user="u{6}"'.format(
+                        i, 37.3 + rng.random() * 0.4, -77.6 + rng.random() * 0.4, 
+                        rng.randint(1, 5), rng.randint(1, 9), rng.randint(1, 10 ** 6), i % 97)
+            tags = random_tags(rng)
+            if tags:
+                f.write('  <node {0}>\n'.format(attrs))
+                write_tags(f, tags)
+                f.write('  </node>\n')
+            else:
+                f.write('  <node {0}/>\n'.format(attrs))
+        for i in range(1, n // 5 + 1):
+            f.write('  <way id="{0}" version="1" timestamp="2019-01-01T00:00:00Z" changeset="5" uid="1" user="u1">\n'.format(i))
+            for _ in range(rng.randint(2, 6)):
+                f.write('    <nd ref="{0}"/>\n'.format(rng.randint(1, n)))
+            write_tags(f, random_tags(rng))
+            f.write('  </way>\n')
+        for i in range(1, n // 50 + 2):
+            f.write('  <relation id="{0}" version="2" timestamp="2019-01-01T00:00:00Z" changeset="5" uid="1" user="u1">\n'.format(i))
+            f.write('    <member type="way" ref="{0}" role="outer"/>\n'.format(rng.randint(1, n // 5 + 1)))
+            f.write('    <member type="node" ref="{0}" role=""/>\n'.format(rng.randint(1, n)))
+            write_tags(f, random_tags(rng))
+            f.write('  </relation>\n')
+        f.write('</osm>\n')
+    
+    return osm_file
+
+
+# A minimal protobuf encoder for the PBF files of the tests
+
+def varint(value):
+    if value < 0:
+        value += 1 << 64
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if not value:
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
+def zigzag_encode(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def varint_field(number, value):
+    return varint(number << 3) + varint(value)
+
+
+def bytes_field(number, data):
+    return varint((number << 3) | 2) + varint(len(data)) + data
+
+
+def packed_field(number, values):
+    return bytes_field(number, b''.join(varint(value) for value in values)) if values else b''
+
+
+def delta_encode(values):
+    out = []
+    previous = 0
+    for value in values:
+        out.append(zigzag_encode(value - previous))
+        previous = value
+    return out
+
+
+def timestamp_seconds(timestamp):
+    return calendar.timegm(time.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ"))
+
+
+def coordinate_units(coordinate):
+    # units of the default granularity of 100 nanodegrees
+    return int(round(float(coordinate) * 1e7))
+
+
+class StringTable:
+    """
+    Collects the strings of a block and gives each one its 
+    index in the block's string table.
+    """
+    
+    def __init__(self):
+        self.strings = [""]
+        self.index = {"": 0}
+    
+    def __call__(self, s):
+        if s not in self.index:
+            self.index[s] = len(self.strings)
+            self.strings.append(s)
+        return self.index[s]
+    
+    def encode(self):
+        return b''.join(bytes_field(1, s.encode("utf-8")) for s in self.strings)
+
+
+def encode_info(element, strings):
+    a = element.attrib
+    return (varint_field(1, int(a['version'])) + varint_field(2, timestamp_seconds(a['timestamp']))
+            + varint_field(3, int(a['changeset'])) + varint_field(4, int(a['uid']))
+            + varint_field(5, strings(a['user'])))
+
+
+def encode_tags(element, strings):
+    tags = list(element.iter('tag'))
+    return (packed_field(2, [strings(t.attrib['k']) for t in tags])
+            + packed_field(3, [strings(t.attrib['v']) for t in tags]))
+
+
+def encode_dense_nodes(nodes, strings):
+    keys_vals = []
+    for node in nodes:
+        for t in node.iter('tag'):
+            keys_vals += [strings(t.attrib['k']), strings(t.attrib['v'])]
+        keys_vals.append(0)
+    attribs = [node.attrib for node in nodes]
+    dense_info = (packed_field(1, [int(a['version']) for a in attribs])
+                  + packed_field(2, delta_encode([timestamp_seconds(a['timestamp']) for a in attribs]))
+                  + packed_field(3, delta_encode([int(a['changeset']) for a in attribs]))
+                  + packed_field(4, delta_encode([int(a['uid']) for a in attribs]))
+                  + packed_field(5, delta_encode([strings(a['user']) for a in attribs])))
+    return bytes_field(2, packed_field(1, delta_encode([int(a['id']) for a in attribs]))
+                       + bytes_field(5, dense_info)
+                       + packed_field(8, delta_encode([coordinate_units(a['lat']) for a in attribs]))
+                       + packed_field(9, delta_encode([coordinate_units(a['lon']) for a in attribs]))
+                       + packed_field(10, keys_vals))
+
+
+def encode_node(node, strings):
+    a = node.attrib
+    return bytes_field(1, varint_field(1, zigzag_encode(int(a['id']))) + encode_tags(node, strings)
+                       + bytes_field(4, encode_info(node, strings))
+                       + varint_field(8, zigzag_encode(coordinate_units(a['lat'])))
+                       + varint_field(9, zigzag_encode(coordinate_units(a['lon']))))
+
+
+def encode_way(way, strings):
+    refs = [int(nd.attrib['ref']) for nd in way.iter('nd')]
+    return bytes_field(3, varint_field(1, int(way.attrib['id'])) + encode_tags(way, strings)
+                       + bytes_field(4, encode_info(way, strings)) + packed_field(8, delta_encode(refs)))
+
+
+def encode_relation(relation, strings):
+    members = list(relation.iter('member'))
+    return bytes_field(4, varint_field(1, int(relation.attrib['id'])) + encode_tags(relation, strings)
+                       + bytes_field(4, encode_info(relation, strings))
+                       + packed_field(8, [strings(m.attrib['role']) for m in members])
+                       + packed_field(9, delta_encode([int(m.attrib['ref']) for m in members]))
+                       + packed_field(10, [("node", "way", "relation").index(m.attrib['type']) for m in members]))
+
+
+def encode_block(elements, dense):
+    strings = StringTable()
+    if elements[0].tag == "node" and dense:
+        group = encode_dense_nodes(elements, strings)
+    else:
+        encode = {"node": encode_node, "way": encode_way, "relation": encode_relation}[elements[0].tag]
+        group = b''.join(encode(element, strings) for element in elements)
+    return bytes_field(1, strings.encode()) + bytes_field(2, group)
+
+
+def encode_blob(kind, data, compress):
+    if compress:
+        blob = varint_field(2, len(data)) + bytes_field(3, zlib.compress(data))
+    else:
+        blob = bytes_field(1, data)
+    header = bytes_field(1, kind.encode()) + varint_field(3, len(blob))
+    return struct.pack('>I', len(header)) + header + blob
+
+
+def write_pbf_file(osm_file, pbf_file, block_size=1000):
+    """
+    Converts the OSM file to a PBF file with blocks of at most 
+    block_size elements of one type, alternating dense and 
+    plain nodes and compressed and raw blobs.
+    """
+    features = b''.join(bytes_field(4, feature) for feature in (b"OsmSchema-V0.6", b"DenseNodes"))
+    
+    with open(pbf_file, "wb") as output:
+        output.write(encode_blob("OSMHeader", features, True))
+        blocks = 0
+        batch = []
+        
+        def write_batch():
+            nonlocal blocks
+            if batch:
+                output.write(encode_blob("OSMData", encode_block(batch, blocks % 2 == 0), blocks % 3 != 2))
+                blocks += 1
+                del batch[:]
+        
+        for _, element in ET.iterparse(osm_file):
+            if element.tag in ("node", "way", "relation"):
+                if batch and (element.tag != batch[-1].tag or len(batch) >= block_size):
+                    write_batch()
+                batch.append(element)
+        write_batch()
+    
+    return pbf_file
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import auditdata
+from osmfiles import write_osm_file
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs one call on the file given as the first argument in a fresh 
+# interpreter and prints its peak resident set size in KB
+
+PEAK_RSS_SCRIPT = """
+import resource, sys
+sys.path.insert(0, {repo_dir!r})
+import auditdata, cleandata
+osm_file = sys.argv[1]
+{call}
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def peak_rss(call, osm_file):
+    script = PEAK_RSS_SCRIPT.format(repo_dir=REPO_DIR, call=call)
+    output = subprocess.run([sys.executable, "-c", script, osm_file], check=True, 
+                            stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return int(output.split()[-1])
+
+
+@pytest.fixture(scope="module")
+def sized_osm_files(tmp_path_factory):
+    """
+    Two synthetic OSM files, the second five times the size of 
+    the first (about 6 and 30 MB).
+    """
+    directory = tmp_path_factory.mktemp("rss")
+    return (write_osm_file(str(directory / "small.osm"), 20000), 
+            write_osm_file(str(directory / "large.osm"), 100000, seed=2))
+
+
+@pytest.mark.parametrize("call", [
+    "auditdata.run_audits(osm_file)", 
+    "auditdata.audit_streets(osm_file)", 
+    "auditdata.audit_postal_codes(osm_file)", 
+    "cleandata.clean_data(osm_file, osm_file + '.clean')"
+])
+def test_peak_rss_does_not_grow_with_file_size(sized_osm_files, call):
+    small_file, large_file = sized_osm_files
+    small_rss = peak_rss(call, small_file)
+    large_rss = peak_rss(call, large_file)
+    print("{0}: {1} KB -> {2} KB".format(call, small_rss, large_rss))
+    
+    # keeping the parsed elements of the large file would take 
+    # a few hundred MB more than the small one
+    assert large_rss - small_rss < 16 * 1024
+
+
+def test_table_audits_match_streaming_audits(osm_file):
+    pytest.importorskip("pandas")
+    
+    assert auditdata.run_table_audits(auditdata.load_tag_table(osm_file)) == auditdata.run_audits(osm_file)
+
+
+def test_table_audits_of_parquet_export_match_streaming_audits(osm_file, tmp_path):
+    pytest.importorskip("pandas")
+    parquetdata = pytest.importorskip("parquetdata")
+    output_dir = parquetdata.export_parquet(osm_file, str(tmp_path / "parquet"))
+    
+    assert auditdata.run_table_audits(auditdata.load_tag_table(output_dir)) == auditdata.run_audits(osm_file)
+
+
+def test_load_tag_table_without_pandas(osm_file, monkeypatch):
+    monkeypatch.setattr(auditdata, "pd", None)
+    monkeypatch.setattr(auditdata, "np", None)
+    
+    with pytest.raises(ImportError, match="pandas"):
+        auditdata.load_tag_table(osm_file)
+
+
+@pytest.mark.benchmark
+def test_table_audits_speedup(large_osm_file):
+    pytest.importorskip("pandas")
+    start = time.perf_counter()
+    auditdata.run_audits(large_osm_file)
+    streaming = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    tags = auditdata.load_tag_table(large_osm_file)
+    loading = time.perf_counter() - start
+    start = time.perf_counter()
+    auditdata.run_table_audits(tags)
+    table = time.perf_counter() - start
+    print("run_audits: {0:.3f} s, load_tag_table: {1:.3f} s, run_table_audits: {2:.3f} s".format(
+        streaming, loading, table))
+    
+    assert table < streaming
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import json
+import shutil
+import time
+
+import pytest
+
+import builddb
+
+
+@pytest.fixture
+def copied_osm_file(osm_file, tmp_path):
+    """
+    A copy of the synthetic OSM file in its own directory, for 
+    the JSON data files process_map writes next to it.
+    """
+    return shutil.copy(osm_file, str(tmp_path / "map.osm"))
+
+
+def read_json_lines(json_file):
+    with open(json_file, "rb") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_serializer_backends_write_the_same_documents(copied_osm_file):
+    pytest.importorskip("orjson")
+    documents = {}
+    for backend in ["json", "orjson"]:
+        documents[backend] = read_json_lines(shutil.move(
+            builddb.process_map(copied_osm_file, backend=backend, block_size=4096), 
+            "{0}.{1}".format(copied_osm_file, backend)))
+    
+    assert documents["orjson"] == documents["json"]
+    assert documents["json"] == list(builddb.iter_shaped_elements(copied_osm_file))
+
+
+def test_pretty_serializers_write_valid_json():
+    pytest.importorskip("orjson")
+    document = {"id": "1", "name": {"en": "Café"}, "node_refs": ["1", "2"]}
+    for backend in ["json", "orjson"]:
+        line = builddb.get_serializer(backend, pretty=True)(document)
+        
+        assert line.endswith(b"\n")
+        assert json.loads(line) == document
+
+
+def test_unknown_serializer_backend():
+    with pytest.raises(ValueError):
+        builddb.get_serializer("yaml")
+
+
+@pytest.mark.benchmark
+def test_serializer_backends_throughput(large_osm_file):
+    pytest.importorskip("orjson")
+    documents = list(builddb.iter_shaped_elements(large_osm_file))
+    rates = {}
+    for backend in ["json", "orjson"]:
+        serialize = builddb.get_serializer(backend)
+        start = time.perf_counter()
+        for document in documents:
+            serialize(document)
+        rates[backend] = len(documents) / (time.perf_counter() - start)
+        print("{0}: {1:,.0f} documents/s".format(backend, rates[backend]))
+    
+    assert rates["orjson"] > rates["json"]
+
+
+def build_nested_dict(keys, value, node_dict=None):
+    """
+    The recursive nesting shape_element used before 
+    add_nested_value, kept as the reference for its output.
+    """
+    sub_dict = {}
+    if len(keys) == 1:
+        sub_dict[keys[0]] = value
+    elif node_dict is not None and keys[0] in node_dict.keys():
+        if isinstance(node_dict[keys[0]], dict):
+            sub_dict[keys[0]] = {**node_dict[keys[0]], **build_nested_dict(keys[1:], value, node_dict[keys[0]])}
+        else:
+            sub_dict[keys[0]] = [node_dict[keys[0]], build_nested_dict(keys[1:], value)]
+    else:
+        sub_dict[keys[0]] = build_nested_dict(keys[1:], value)
+    return sub_dict
+
+
+def nest_tags_recursive(tags):
+    node = {}
+    for k, v in tags:
+        keys = k.split(":")
+        if len(keys) == 1:
+            node[k] = v
+        elif keys[0] in node.keys():
+            if isinstance(node[keys[0]], dict):
+                node[keys[0]] = {**node[keys[0]], **build_nested_dict(keys[1:], v, node[keys[0]])}
+            else:
+                node[keys[0]] = [node[keys[0]], build_nested_dict(keys[1:], v)]
+        else:
+            node[keys[0]] = build_nested_dict(keys[1:], v)
+    return node
+
+
+def nest_tags(tags):
+    node = {}
+    for k, v in tags:
+        builddb.add_nested_value(node, k.split(":"), v)
+    return node
+
+
+def element_tags(osm_file):
+    return [[(tag.attrib['k'], tag.attrib['v']) for tag in element.iter("tag")]
+            for element in builddb.get_element(osm_file)]
+
+
+@pytest.mark.parametrize("tags", [
+    [("name", "Main"), ("name:en", "Main")], 
+    [("name:en", "Main"), ("name", "Main")], 
+    [("name", "Main"), ("name:en", "Main"), ("name:en:old", "Old"), ("name:fr", "Principale")], 
+    [("tiger:name_base", "Broad"), ("tiger:name_base:1", "Grace"), ("tiger:name_base:1:x", "X")], 
+    [("a:b:c:d:e", "1"), ("a:b:c:d:f", "2"), ("a:b:x", "3"), ("a:b", "4"), ("a:b:y", "5")], 
+    [("a", "1"), ("a:b", "2"), ("a:c", "3")], 
+    [("addr:street", "Main Street"), ("addr:street", "Broad Street")]
+])
+def test_add_nested_value_matches_recursive_nesting(tags):
+    assert nest_tags(tags) == nest_tags_recursive(tags)
+
+
+def test_add_nested_value_matches_recursive_nesting_on_file(osm_file):
+    for tags in element_tags(osm_file):
+        assert nest_tags(tags) == nest_tags_recursive(tags)
+
+
+@pytest.mark.benchmark
+def test_add_nested_value_throughput(large_osm_file):
+    tags = element_tags(large_osm_file)
+    tags += [[(k, v) for k, v in element] + [("tiger:a:b:c:" + k, v) for k, v in element] for element in tags]
+    rates = {}
+    for name, nest in [("recursive", nest_tags_recursive), ("iterative", nest_tags)]:
+        start = time.perf_counter()
+        for element in tags:
+            nest(element)
+        rates[name] = len(tags) / (time.perf_counter() - start)
+        print("{0}: {1:,.0f} elements/s".format(name, rates[name]))
+    
+    assert rates["iterative"] > rates["recursive"]
+
+
+def element_document(element_type, element_id, version, name):
+    return {"element_type": element_type, "id": str(element_id), "version": version, "name": name}
+
+
+def stored_documents(collection):
+    return {(document["element_type"], document["id"]): (document["version"], document["name"])
+            for document in collection.find({}, {"_id": 0})}
+
+
+@pytest.fixture
+def loaded_collection():
+    """
+    A mongomock collection loaded the way upload_data_into_mongo 
+    loads a JSON data file written before versions were ints, 
+    with one element uploaded twice.
+    """
+    mongomock = pytest.importorskip("mongomock")
+    pytest.importorskip("numpy")
+    collection = mongomock.MongoClient().osm.richmond
+    collection.insert_many([
+        element_document("node", 1, "2", "stale"), 
+        element_document("node", 2, "3", "newer"), 
+        element_document("node", 3, "1", "same"), 
+        element_document("way", 1, "4", "duplicate"), 
+        element_document("way", 1, "5", "latest"), 
+        element_document("relation", -1, "1", "negative id")
+    ])
+    builddb.create_mongo_indexes(collection)
+    return collection
+
+
+def reload_batch():
+    return [
+        element_document("node", 1, 3, "updated"), 
+        element_document("node", 2, 2, "older"), 
+        element_document("node", 3, 1, "same"), 
+        element_document("node", 4, 1, "new"), 
+        element_document("way", 1, "6", "string version"), 
+        element_document("relation", -1, 2, "negative id updated")
+    ]
+
+
+def test_reload_writes_only_new_and_newer_elements(loaded_collection):
+    result = builddb.reload_documents(loaded_collection, reload_batch(), batch_size=2)
+    
+    assert result == {"written": 4, "skipped": 2}
+    assert stored_documents(loaded_collection) == {
+        ("node", "1"): (3, "updated"), 
+        ("node", "2"): (3, "newer"), 
+        ("node", "3"): (1, "same"), 
+        ("node", "4"): (1, "new"), 
+        ("way", "1"): (6, "string version"), 
+        ("relation", "-1"): (2, "negative id updated")
+    }
+    assert builddb.reload_documents(loaded_collection, reload_batch()) == {"written": 0, "skipped": 6}
+
+
+def test_reload_keeps_newer_elements_with_a_stale_snapshot(loaded_collection, tmp_path):
+    snapshot_file = str(tmp_path / "versions.npz")
+    builddb.reload_documents(loaded_collection, reload_batch(), snapshot_file=snapshot_file)
+    loaded_collection.replace_one({"element_type": "node", "id": "1"}, element_document("node", 1, 9, "edited"))
+    
+    result = builddb.reload_documents(loaded_collection, [element_document("node", 1, 5, "stale snapshot")], 
+                                      snapshot_file=snapshot_file)
+    
+    assert result == {"written": 0, "skipped": 0}
+    assert stored_documents(loaded_collection)[("node", "1")] == (9, "edited")
+
+
+def test_reload_makes_the_element_index_unique(loaded_collection):
+    builddb.reload_documents(loaded_collection, reload_batch())
+    indexes = [info for info in loaded_collection.index_information().values()
+               if list(info["key"]) == builddb.ELEMENT_ID_INDEX]
+    
+    assert len(indexes) == 1
+    assert indexes[0].get("unique")
+    assert len(loaded_collection.index_information()) == 3
+    
+    builddb.create_mongo_indexes(loaded_collection)
+    assert len(loaded_collection.index_information()) == 3
+
+
+def test_reload_ignores_a_snapshot_of_a_dropped_collection(loaded_collection, tmp_path):
+    snapshot_file = str(tmp_path / "versions.npz")
+    builddb.reload_documents(loaded_collection, reload_batch(), snapshot_file=snapshot_file)
+    loaded_collection.drop()
+    
+    result = builddb.reload_documents(loaded_collection, reload_batch(), snapshot_file=snapshot_file)
+    
+    assert result == {"written": 6, "skipped": 0}
+    assert len(stored_documents(loaded_collection)) == 6
+
+
+def test_reload_deletes_missing_elements(loaded_collection):
+    result = builddb.reload_documents(loaded_collection, reload_batch()[:4], delete_missing=True)
+    
+    assert result == {"written": 4, "skipped": 2}
+    assert sorted(stored_documents(loaded_collection)) == [("node", "1"), ("node", "2"), ("node", "3"), ("node", "4")]
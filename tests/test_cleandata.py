@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import copy
+import time
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import cleandata
+from osmstream import get_element
+
+
+def clean_element_chained(element):
+    """
+    Cleans the element with the update and include functions 
+    chained the way clean_data applied them before the 
+    compiled cleaning rules, and returns the include flag.
+    """
+    element = cleandata.update_state(cleandata.update_city(
+        cleandata.update_street_direction(cleandata.update_street(element))))
+    element = cleandata.add_county_number(cleandata.add_county_name(element))
+    element = cleandata.update_max_speed(cleandata.update_postal_code(cleandata.update_country(element)))
+    element = cleandata.update_religion(cleandata.update_denomination(element))
+    return (cleandata.state_include(element) and cleandata.country_include(element)
+            and cleandata.postal_code_include(element))
+
+
+def read_elements(osm_file):
+    return [copy.deepcopy(element) for element in get_element(osm_file)]
+
+
+def test_compiled_rules_match_chained_functions(osm_file):
+    for element in read_elements(osm_file):
+        expected = copy.deepcopy(element)
+        expected_flag = clean_element_chained(expected)
+        
+        assert cleandata.apply_cleaning_rules(element) == expected_flag
+        assert ET.tostring(element) == ET.tostring(expected)
+
+
+@pytest.mark.benchmark
+def test_compiled_rules_throughput(large_osm_file):
+    elements = read_elements(large_osm_file)
+    for name, clean in [("chained", clean_element_chained), ("compiled", cleandata.apply_cleaning_rules)]:
+        copies = [copy.deepcopy(element) for element in elements]
+        start = time.perf_counter()
+        for element in copies:
+            clean(element)
+        print("{0}: {1:,.0f} elements/s".format(name, len(copies) / (time.perf_counter() - start)))
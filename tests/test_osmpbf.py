@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import json
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import osmpbf
+from builddb import shape_element
+from osmfiles import delta_encode, varint, write_pbf_file, zigzag_encode
+from osmstream import get_element, iter_tags
+
+VARINTS = [0, 1, 127, 128, 300, 16383, 16384, 2 ** 31, 2 ** 35 + 7, 2 ** 63, 2 ** 64 - 1]
+
+SIGNED_VALUES = [0, 1, -1, 63, -64, 64, -65, 2 ** 31 - 1, -2 ** 31, 2 ** 40 + 3, -2 ** 40 - 3]
+
+
+@pytest.fixture(scope="module")
+def pbf_file(osm_file, tmp_path_factory):
+    return write_pbf_file(osm_file, str(tmp_path_factory.mktemp("pbf") / "small.osm.pbf"), block_size=700)
+
+
+def test_read_varint():
+    buf = b"".join(varint(value) for value in VARINTS)
+    pos = 0
+    for value in VARINTS:
+        decoded, end = osmpbf.read_varint(buf, pos)
+        
+        assert decoded == value
+        assert end - pos == len(varint(value))
+        pos = end
+
+
+def test_signed():
+    assert [osmpbf.signed(varint_value) for varint_value in [5, 2 ** 64 - 1, 2 ** 64 - 1000, 2 ** 63]] == \
+        [5, -1, -1000, -2 ** 63]
+
+
+def test_zigzag():
+    assert [osmpbf.zigzag(zigzag_encode(value)) for value in SIGNED_VALUES] == SIGNED_VALUES
+
+
+def test_packed_varints():
+    assert osmpbf.packed_varints(b"") == []
+    assert osmpbf.packed_varints(bytes([1, 2, 127])) == [1, 2, 127]
+    assert osmpbf.packed_varints(b"".join(varint(value) for value in VARINTS)) == VARINTS
+
+
+def test_packed_deltas():
+    values = [9000000000, 9000000001, 8999999990, 1, -5, 2 ** 40]
+    buf = b"".join(varint(value) for value in delta_encode(values))
+    
+    assert osmpbf.packed_deltas(buf) == values
+
+
+def test_format_coordinate():
+    assert osmpbf.format_coordinate(-772956150 * 100) == "-77.2956150"
+    assert osmpbf.format_coordinate(5 * 100) == "0.0000005"
+    assert osmpbf.format_coordinate(-5 * 100) == "-0.0000005"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pbf_elements_match_xml_elements(osm_file, pbf_file, workers):
+    xml_elements = list(get_element(osm_file))
+    pbf_elements = list(osmpbf.get_pbf_element(pbf_file, workers=workers))
+    
+    assert len(pbf_elements) == len(xml_elements)
+    for xml_element, pbf_element in zip(xml_elements, pbf_elements):
+        # the last element of the file is followed by '</osm>'
+        xml_element.tail = pbf_element.tail = None
+        
+        assert ET.tostring(pbf_element) == ET.tostring(xml_element)
+
+
+def test_pbf_documents_match_xml_documents(osm_file, pbf_file):
+    for xml_element, pbf_element in zip(get_element(osm_file), osmpbf.get_pbf_element(pbf_file, workers=1)):
+        # compared as JSON to check the key order too
+        assert json.dumps(shape_element(pbf_element)) == json.dumps(shape_element(xml_element))
+
+
+def test_pbf_tags_match_xml_tags(osm_file, pbf_file):
+    assert list(osmpbf.iter_pbf_tags(pbf_file, workers=1)) == list(iter_tags(osm_file))
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import math
+import shutil
+
+import numpy as np
+import pytest
+
+import osmspatial
+from osmstream import get_element
+
+
+@pytest.fixture(scope="module")
+def spatial_index(osm_file, tmp_path_factory):
+    copied_file = shutil.copy(osm_file, str(tmp_path_factory.mktemp("spatial") / "map.osm"))
+    return osmspatial.load_spatial_index(copied_file)
+
+
+@pytest.fixture(scope="module")
+def nodes(osm_file):
+    return {int(node.attrib['id']): (float(node.attrib['lat']), float(node.attrib['lon']))
+            for node in get_element(osm_file, tags=('node',))}
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * osmspatial.EARTH_RADIUS * math.asin(math.sqrt(min(a, 1)))
+
+
+def test_query_bbox_matches_full_scan(spatial_index, nodes):
+    ids, _ = osmspatial.query_bbox(spatial_index, 37.4, -77.5, 37.45, -77.42)
+    
+    assert sorted(ids.tolist()) == sorted(
+        node_id for node_id, (lat, lon) in nodes.items() if 37.4 <= lat <= 37.45 and -77.5 <= lon <= -77.42)
+
+
+def test_query_radius_matches_full_scan(spatial_index, nodes):
+    ids, _, meters = osmspatial.query_radius(spatial_index, 37.5, -77.4, 2000)
+    expected = {node_id for node_id, (lat, lon) in nodes.items() if haversine(37.5, -77.4, lat, lon) <= 2000}
+    
+    assert set(ids.tolist()) == expected
+    assert np.all(np.diff(meters) >= 0)
+
+
+@pytest.mark.parametrize("lat, lon, k", [(37.5, -77.4, 1), (37.5, -77.4, 25), (37.31, -77.59, 10), (40.0, -70.0, 3)])
+def test_query_nearest_matches_full_scan(spatial_index, nodes, lat, lon, k):
+    ids, _, meters = osmspatial.query_nearest(spatial_index, lat, lon, k)
+    expected = sorted(haversine(lat, lon, *location) for location in nodes.values())[:k]
+    
+    assert len(ids) == k
+    assert meters == pytest.approx(expected, abs=0.05)
+
+
+@pytest.mark.parametrize("k", [0, -1])
+def test_query_nearest_without_nodes(spatial_index, k):
+    ids, offsets, meters = osmspatial.query_nearest(spatial_index, 37.5, -77.4, k)
+    empty_ids, empty_offsets, empty_meters = osmspatial.query_radius(spatial_index, 0.0, 0.0, 1.0)
+    
+    assert len(ids) == len(offsets) == len(meters) == 0
+    assert (ids.dtype, offsets.dtype, meters.dtype) == (empty_ids.dtype, empty_offsets.dtype, empty_meters.dtype)